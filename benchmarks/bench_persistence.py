@@ -0,0 +1,70 @@
+"""Per-update overhead of conversation persistence backends.
+
+Drives full registrations through the bot with each PERSISTENCE_BACKEND
+and reports the time per update, so the cost of persistence can be compared
+with the in-memory path.
+
+    python benchmarks/bench_persistence.py --users 200 --concurrency 20
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_telegram import FakeTelegramAPI  # noqa: E402
+from harness import CONVERSATION, TOKEN, UNLIMITED_ENV, register_user, start_bot, stop_bot  # noqa: E402
+
+
+async def measure(backend: str, users: int, concurrency: int, interval: float):
+    workdir = tempfile.mkdtemp(prefix=f'bench_{backend}_')
+    os.chdir(workdir)
+
+    api = FakeTelegramAPI(TOKEN)
+    await api.start()
+    bot, app = await start_bot(
+        api, PERSISTENCE_BACKEND=backend, PERSISTENCE_INTERVAL=interval,
+        PERSISTENCE_PATH=os.path.join(workdir, 'state.db' if backend == 'sqlite' else 'state.pickle'),
+        **UNLIMITED_ENV
+    )
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_user(user_id: int):
+        async with semaphore:
+            await register_user(api, user_id)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_user(1000 + i) for i in range(users)))
+    elapsed = time.perf_counter() - started
+
+    flush_started = time.perf_counter()
+    await stop_bot(bot, app)
+    flush = time.perf_counter() - flush_started
+    await api.stop()
+
+    updates = users * (len(CONVERSATION) + 1)
+    print(
+        f"{backend:7} {updates} updates in {elapsed:.2f}s  "
+        f"{elapsed / updates * 1e6:.0f} us/update  shutdown flush {flush * 1000:.0f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=5.0, help='PERSISTENCE_INTERVAL seconds')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    for backend in ('memory', 'pickle', 'sqlite'):
+        asyncio.run(measure(backend, args.users, args.concurrency, args.interval))
+
+
+if __name__ == '__main__':
+    main()
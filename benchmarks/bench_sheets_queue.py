@@ -0,0 +1,78 @@
+"""Compare per-row Sheets appends with the batched write-behind queue.
+
+Uses an in-memory worksheet that sleeps for a fixed round-trip time per API
+request, so the numbers reflect request count rather than network noise.
+
+    python benchmarks/bench_sheets_queue.py --registrations 500 --latency 0.15
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_sheets import FakeWorksheet  # noqa: E402
+from google_sheets import GoogleSheetsManager  # noqa: E402
+
+
+def make_registration(i: int) -> dict:
+    return {
+        'name': f'Worker {i}',
+        'age': '25',
+        'phone': f'+380{i:09d}',
+        'telegram_username': f'user{i}',
+        'telegram_id': str(i),
+    }
+
+
+async def per_row(manager: GoogleSheetsManager, count: int):
+    async def register(i):
+        data = make_registration(i)
+        data['registration_date'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        await manager._run('append_row', manager.worksheet.append_row, [
+            data['registration_date'], data['name'], data['age'], data['phone'],
+            data['telegram_username'], data['telegram_id'], 'Новый', ''
+        ])
+    await asyncio.gather(*(register(i) for i in range(count)))
+
+
+async def batched(manager: GoogleSheetsManager, count: int):
+    await asyncio.gather(*(manager.add_registration(make_registration(i)) for i in range(count)))
+    await manager.close()
+
+
+async def run(mode: str, count: int, latency: float):
+    manager = GoogleSheetsManager()
+    manager.connection.worksheet = FakeWorksheet(latency)
+
+    started = time.perf_counter()
+    await (per_row if mode == 'per-row' else batched)(manager, count)
+    elapsed = time.perf_counter() - started
+
+    assert manager.worksheet.data_rows == count
+    print(
+        f"{mode:8} {count} rows in {elapsed:.2f}s "
+        f"({count / elapsed:.0f} rows/s, {manager.worksheet.requests} API requests)"
+    )
+    manager.executor.shutdown(wait=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--registrations', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.15, help='seconds per Sheets request')
+    args = parser.parse_args()
+
+    # Keep the benchmark's journal away from the real registrations.db
+    os.chdir(tempfile.mkdtemp(prefix='bench_sheets_'))
+
+    asyncio.run(run('per-row', args.registrations, args.latency))
+    asyncio.run(run('batched', args.registrations, args.latency))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Memory per bot: N tenants in one process vs. one process per bot.
+
+Starts N fake Bot API servers (one per token), then serves all N bots from
+a single ``python main.py`` with TENANTS_FILE, and again as N separate
+``python main.py`` processes. Once every bot has answered /help, resident
+memory is read from /proc (Linux) and reported in total and per bot.
+
+    python benchmarks/bench_tenants.py --bots 1 5 20
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_telegram import FakeTelegramAPI  # noqa: E402
+from harness import free_port  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def resident_bytes(pid: int) -> int:
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def bot_env(token: str, api: FakeTelegramAPI) -> dict:
+    return {'BOT_TOKEN': token, 'TELEGRAM_API_URL': api.base_url, 'STATUS_SYNC_INTERVAL': '0'}
+
+
+async def wait_until_serving(apis: List[FakeTelegramAPI]):
+    for api in apis:
+        await api.push(api.message_update(1, '/help'))
+    for api in apis:
+        await api.next_reply(1, timeout=120)
+
+
+def spawn(env: dict, workdir: str) -> subprocess.Popen:
+    env = dict(os.environ, PORT=str(free_port()), LOG_LEVEL='WARNING', PYTHONPATH=ROOT, **env)
+    env.pop('GOOGLE_SHEETS_CREDENTIALS', None)
+    return subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'main.py')], cwd=workdir, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def stop(processes: List[subprocess.Popen]):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.wait(timeout=60)
+
+
+async def measure(bots: int):
+    apis = [FakeTelegramAPI(f'{100000 + i}:TENANT{i}') for i in range(bots)]
+    for api in apis:
+        await api.start()
+
+    # All bots as tenants of one process
+    workdir = tempfile.mkdtemp(prefix=f'bench_tenants{bots}_')
+    tenants = {f'bot{i}': bot_env(api.token, api) for i, api in enumerate(apis)}
+    tenants_file = os.path.join(workdir, 'tenants.json')
+    with open(tenants_file, 'w') as f:
+        json.dump(tenants, f)
+    process = spawn({'TENANTS_FILE': tenants_file}, workdir)
+    try:
+        await wait_until_serving(apis)
+        shared = resident_bytes(process.pid)
+    finally:
+        stop([process])
+
+    # One process per bot, each in its own directory like separate containers
+    processes = []
+    try:
+        for i, api in enumerate(apis):
+            workdir = tempfile.mkdtemp(prefix=f'bench_single{i}_')
+            processes.append(spawn(bot_env(api.token, api), workdir))
+        await wait_until_serving(apis)
+        separate = sum(resident_bytes(process.pid) for process in processes)
+    finally:
+        stop(processes)
+
+    for api in apis:
+        await api.stop()
+
+    print(f"bots={bots:<3}  one process {shared / 1e6:7.1f} MB ({shared / bots / 1e6:5.1f} MB/bot)  "
+          f"process per bot {separate / 1e6:7.1f} MB ({separate / bots / 1e6:5.1f} MB/bot)")
+    return shared
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bots', type=int, nargs='+', default=[1, 5, 20])
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    results = {bots: asyncio.run(measure(bots)) for bots in args.bots}
+    counts = sorted(results)
+    if len(counts) > 1 and counts[-1] > counts[0]:
+        marginal = (results[counts[-1]] - results[counts[0]]) / (counts[-1] - counts[0])
+        print(f"each extra tenant adds {marginal / 1e6:.1f} MB to the shared process")
+
+
+if __name__ == '__main__':
+    main()
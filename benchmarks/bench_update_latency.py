@@ -0,0 +1,67 @@
+"""Update-to-reply latency of the bot in polling and webhook mode.
+
+Runs WorkerRegistrationBot against a local fake Bot API (see
+fake_telegram.py), sends /start for a number of users and measures the time
+until the language picker arrives.
+
+    python benchmarks/bench_update_latency.py --users 200
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_telegram import FakeTelegramAPI  # noqa: E402
+from harness import TOKEN, UNLIMITED_ENV, percentile, start_bot, stop_bot  # noqa: E402
+
+
+async def measure(mode: str, users: int, concurrency: int):
+    api = FakeTelegramAPI(TOKEN)
+    await api.start()
+    bot, app = await start_bot(api, mode, PERSISTENCE_BACKEND='memory', **UNLIMITED_ENV)
+
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_user(user_id: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await api.push(api.message_update(user_id, '/start'))
+            await api.next_reply(user_id)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_user(1000 + i) for i in range(users)))
+    elapsed = time.perf_counter() - started
+
+    await stop_bot(bot, app, mode)
+    await api.stop()
+
+    print(
+        f"{mode:8} {users} updates in {elapsed:.2f}s ({users / elapsed:.0f}/s)  "
+        f"p50 {percentile(latencies, 0.5) * 1000:.1f} ms  "
+        f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='updates in flight at once (1 = pure latency)')
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix='bench_latency_'))
+    logging.disable(logging.INFO)
+
+    for mode in ('polling', 'webhook'):
+        asyncio.run(measure(mode, args.users, args.concurrency))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Micro-benchmarks for the registration validators.
+
+Times the original per-call regex lookups against ValidatorEngine's
+precompiled single-pass checks, and the bulk column API.
+
+    python benchmarks/bench_validators.py --number 100000
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from validators import ValidatorEngine  # noqa: E402
+
+PHONES = ['+380501234567', '050 123-45-67', '+79161234567', '12345', '0 50 123 45 67']
+NAMES = ['Иван Петров', "Олена О'Коннор", 'A', 'John-Paul Smith', 'Bad<name>']
+AGES = ['18', '25', '15', '41', 'abc']
+
+
+def legacy_phone(phone: str):
+    """The pre-engine path: validate, then strip again to normalize"""
+    stripped = phone.strip().replace(" ", "").replace("-", "")
+    if stripped.startswith("+7") or stripped.startswith("8"):
+        return False, stripped
+    if not (re.fullmatch(r"\+380\d{9}", stripped) or re.fullmatch(r"0\d{9}", stripped)):
+        return False, stripped
+    stripped = phone.strip().replace(" ", "").replace("-", "")
+    if re.fullmatch(r"0\d{9}", stripped):
+        return True, "+38" + stripped
+    return True, stripped
+
+
+def legacy_name(name: str):
+    name = name.strip()
+    return len(name) >= 2 and bool(re.fullmatch(r"[a-zA-Zа-яА-ЯёЁіІїЇєЄ\s\-']+", name))
+
+
+def legacy_age(age_text: str):
+    try:
+        return 16 <= int(age_text) <= 40
+    except ValueError:
+        return False
+
+
+def bench(label: str, func, values, number: int):
+    per_loop = timeit.timeit(lambda: [func(value) for value in values], number=number)
+    per_call_ns = per_loop / (number * len(values)) * 1e9
+    print(f"{label:<28} {per_call_ns:8.0f} ns/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=100000, help='iterations per case')
+    parser.add_argument('--column', type=int, default=10000, help='values in the bulk column case')
+    args = parser.parse_args()
+
+    engine = ValidatorEngine()
+
+    bench('phone (legacy)', legacy_phone, PHONES, args.number)
+    bench('phone (engine)', engine.check_phone, PHONES, args.number)
+    bench('name (legacy)', legacy_name, NAMES, args.number)
+    bench('name (engine)', engine.check_name, NAMES, args.number)
+    bench('age (legacy)', legacy_age, AGES, args.number)
+    bench('age (engine)', engine.check_age, AGES, args.number)
+
+    column = (PHONES * (args.column // len(PHONES) + 1))[:args.column]
+    repeats = max(1, args.number // 1000)
+    elapsed = timeit.timeit(lambda: engine.validate_column('phone', column), number=repeats)
+    print(f"{'phone column (bulk)':<28} {elapsed / (repeats * len(column)) * 1e9:8.0f} ns/value "
+          f"({len(column)} values)")
+
+
+if __name__ == '__main__':
+    main()
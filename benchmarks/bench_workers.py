@@ -0,0 +1,147 @@
+"""Registration throughput with 1..N worker processes.
+
+Starts the update dispatcher with n worker processes against the fake Bot
+API, runs full registrations for many concurrent users and reports
+throughput for each worker count. One worker also goes through the
+dispatcher, so every count runs the same code. ``--handler-cost`` adds CPU
+work per update and Telegram's limits are lifted, so the scaling of the
+bot itself, not of the fake API or of per-chat pacing, is what gets measured.
+On Linux it also reports the CPU spent per update by the dispatcher and by
+the workers, which bounds the throughput more cores could reach.
+
+    python benchmarks/bench_workers.py --workers 1 2 4 --users 400
+"""
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_telegram import FakeTelegramAPI  # noqa: E402
+from harness import CONVERSATION, TOKEN, UNLIMITED_ENV, free_port, register_user  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ``python main.py`` would serve one worker in-process from __main__, which
+# the hook below does not patch; this runs the dispatcher for any count
+LAUNCHER = "from config import Config; from workers import run_workers; run_workers(Config())"
+
+# Burns CPU inside every handler call of each worker process
+HANDLER_COST_HOOK = """
+import time, main
+for name in ('start', 'lang_choice', 'get_name', 'get_age', 'get_phone', 'confirm_registration'):
+    original = getattr(main.WorkerRegistrationBot, name)
+    def wrapped(self, update, context, _original=original):
+        # CPU time, so workers sharing a core do not count each other's work
+        deadline = time.process_time() + {cost}
+        while time.process_time() < deadline:
+            pass
+        return _original(self, update, context)
+    setattr(main.WorkerRegistrationBot, name, wrapped)
+"""
+
+
+def cpu_seconds(pid: int) -> float:
+    """User plus system CPU of one process, 0 where /proc is not available"""
+    try:
+        with open(f'/proc/{pid}/stat') as stat:
+            fields = stat.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return 0.0
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def child_pids(pid: int) -> list:
+    children = []
+    for entry in os.listdir('/proc') if os.path.isdir('/proc') else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                parent = int(stat.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if parent == pid:
+            children.append(int(entry))
+    return children
+
+
+def cpu_split(pid: int):
+    return cpu_seconds(pid), sum(cpu_seconds(child) for child in child_pids(pid))
+
+
+async def measure(workers: int, users: int, concurrency: int, handler_cost: float):
+    workdir = tempfile.mkdtemp(prefix=f'bench_workers{workers}_')
+    api = FakeTelegramAPI(TOKEN)
+    await api.start()
+
+    if handler_cost:
+        with open(os.path.join(workdir, 'sitecustomize.py'), 'w') as hook:
+            hook.write(HANDLER_COST_HOOK.format(cost=handler_cost))
+
+    env = dict(os.environ,
+               BOT_TOKEN=TOKEN, WORKERS=str(workers), PORT=str(free_port()),
+               TELEGRAM_API_URL=api.base_url, PERSISTENCE_BACKEND='sqlite',
+               PYTHONPATH=os.pathsep.join([workdir, ROOT]),
+               **{key: str(value) for key, value in UNLIMITED_ENV.items()})
+    env.pop('GOOGLE_SHEETS_CREDENTIALS', None)
+    process = subprocess.Popen(
+        [sys.executable, '-c', LAUNCHER], cwd=workdir, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    # Wait until every worker answers
+    for user_id in range(workers * 10):
+        await api.push(api.message_update(1 + user_id, '/help'))
+    for user_id in range(workers * 10):
+        await api.next_reply(1 + user_id, timeout=60)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_user(user_id: int):
+        async with semaphore:
+            await register_user(api, user_id, timeout=60)
+
+    dispatcher_before, workers_before = cpu_split(process.pid)
+    started = time.perf_counter()
+    await asyncio.gather(*(one_user(100000 + i) for i in range(users)))
+    elapsed = time.perf_counter() - started
+    dispatcher_after, workers_after = cpu_split(process.pid)
+
+    process.terminate()
+    process.wait(timeout=60)
+    await api.stop()
+
+    updates = users * (len(CONVERSATION) + 1)
+    print(f"workers={workers}  {updates} updates in {elapsed:.2f}s  {updates / elapsed:.0f} updates/s")
+    if workers_after:
+        print(f"           CPU per update: dispatcher "
+              f"{(dispatcher_after - dispatcher_before) / updates * 1000:.2f}ms, "
+              f"workers {(workers_after - workers_before) / updates * 1000:.2f}ms")
+    return updates / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--users', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--handler-cost', type=float, default=0.005,
+                        help='seconds of CPU burned per handler call')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    baseline = None
+    for workers in args.workers:
+        throughput = asyncio.run(measure(workers, args.users, args.concurrency, args.handler_cost))
+        baseline = baseline or throughput / workers
+        print(f"           scaling efficiency {throughput / (baseline * workers):.0%}")
+
+
+if __name__ == '__main__':
+    main()
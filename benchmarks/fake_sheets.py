@@ -0,0 +1,66 @@
+"""In-memory stand-in for a gspread Worksheet with injected latency and errors."""
+import random
+import threading
+import time
+from typing import List, Optional
+
+
+class FakeSheetsError(Exception):
+    """Raised by FakeWorksheet for an injected failure"""
+
+
+class FakeWorksheet:
+    """Sleeps ``latency`` seconds per API request and fails a fraction
+    ``error_rate`` of them, so benchmarks exercise retries and the circuit
+    breaker without a network."""
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rows: List[list] = [['Дата регистрации', 'Имя', 'Возраст', 'Телефон',
+                                  'Telegram Username', 'Telegram ID', 'Статус', 'Комментарии']]
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _request(self):
+        time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors += 1
+                raise FakeSheetsError("injected Sheets failure")
+
+    @property
+    def data_rows(self) -> int:
+        return len(self.rows) - 1
+
+    def append_row(self, row, **kwargs):
+        self._request()
+        with self._lock:
+            self.rows.append(list(row))
+
+    def append_rows(self, rows, **kwargs):
+        self._request()
+        with self._lock:
+            self.rows.extend(list(row) for row in rows)
+
+    def col_values(self, col: int) -> list:
+        self._request()
+        with self._lock:
+            return [row[col - 1] if len(row) >= col else '' for row in self.rows]
+
+    def get(self, range_name: str) -> list:
+        # Only the "A<start>:A" form used for stats catch-up is supported
+        self._request()
+        start = int(range_name.split(':')[0][1:])
+        with self._lock:
+            return [[row[0]] for row in self.rows[start - 1:]]
+
+    def batch_get(self, ranges: list) -> list:
+        # "<col>2:<col>" forms only, e.g. "D2:D" or "A2:F"
+        self._request()
+        spans = [(ord(r[0]) - ord('A'), ord(r.split(':')[1][0]) - ord('A') + 1) for r in ranges]
+        with self._lock:
+            return [[row[first:last] for row in self.rows[1:]] for first, last in spans]
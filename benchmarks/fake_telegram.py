@@ -0,0 +1,203 @@
+"""Local stand-in for the Telegram Bot API used by the benchmarks.
+
+Implements just enough of the API for WorkerRegistrationBot: getMe,
+getUpdates (long polling), setWebhook/deleteWebhook, sendMessage,
+editMessageText and answerCallbackQuery. Updates can be delivered through
+getUpdates or pushed to a webhook URL, and every outgoing message is
+recorded so callers can await a reply for a given chat.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, Optional
+from urllib.parse import parse_qsl
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from web_server import Request, WebServer  # noqa: E402
+
+BOT_ID = 100000
+
+
+class FakeTelegramAPI:
+    def __init__(self, token: str, api_latency: float = 0.0):
+        self.token = token
+        self.api_latency = api_latency
+        self.server = WebServer('127.0.0.1', 0)
+        self.webhook_url: Optional[str] = None
+        self.webhook_secret: Optional[str] = None
+        self.requests: Dict[str, int] = defaultdict(int)
+
+        self._pending: Deque[dict] = deque()
+        self._pending_event = asyncio.Event()
+        self._replies: Dict[int, asyncio.Queue] = defaultdict(asyncio.Queue)
+        self._update_id = 0
+        self._message_id = 0
+        self._http: Optional[httpx.AsyncClient] = None
+
+        for method in ('getMe', 'getUpdates', 'setWebhook', 'deleteWebhook', 'sendMessage',
+                       'editMessageText', 'answerCallbackQuery', 'getWebhookInfo'):
+            self.server.route('POST', f'/bot{token}/{method}', self._make_handler(method))
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.server.port}/bot'
+
+    async def start(self):
+        await self.server.start()
+        self._http = httpx.AsyncClient(timeout=10)
+
+    async def stop(self):
+        await self.server.stop()
+        if self._http is not None:
+            await self._http.aclose()
+
+    # --- Building and delivering updates ---------------------------------
+
+    def _next_update_id(self) -> int:
+        self._update_id += 1
+        return self._update_id
+
+    def _next_message_id(self) -> int:
+        self._message_id += 1
+        return self._message_id
+
+    @staticmethod
+    def _user(user_id: int) -> dict:
+        return {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}', 'username': f'user{user_id}'}
+
+    def message_update(self, user_id: int, text: str) -> dict:
+        message = {
+            'message_id': self._next_message_id(),
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': self._user(user_id),
+            'text': text,
+        }
+        if text.startswith('/'):
+            command = text.split()[0]
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+        return {'update_id': self._next_update_id(), 'message': message}
+
+    def callback_update(self, user_id: int, data: str, message_id: int) -> dict:
+        return {
+            'update_id': self._next_update_id(),
+            'callback_query': {
+                'id': str(self._update_id),
+                'from': self._user(user_id),
+                'chat_instance': str(user_id),
+                'data': data,
+                'message': {
+                    'message_id': message_id,
+                    'date': int(time.time()),
+                    'chat': {'id': user_id, 'type': 'private'},
+                    'from': {'id': BOT_ID, 'is_bot': True, 'first_name': 'Bot'},
+                    'text': '...',
+                },
+            },
+        }
+
+    async def push(self, update: dict):
+        """Deliver an update through the webhook if one is set, else via getUpdates"""
+        if self.webhook_url:
+            headers = {'X-Telegram-Bot-Api-Secret-Token': self.webhook_secret} if self.webhook_secret else {}
+            await self._http.post(self.webhook_url, json=update, headers=headers)
+        else:
+            self._pending.append(update)
+            self._pending_event.set()
+
+    async def next_reply(self, chat_id: int, timeout: float = 10.0) -> dict:
+        """Wait for the next message the bot sends (or edits) in ``chat_id``"""
+        return await asyncio.wait_for(self._replies[chat_id].get(), timeout=timeout)
+
+    # --- Bot API methods --------------------------------------------------
+
+    def _make_handler(self, method: str):
+        async def handler(request: Request):
+            self.requests[method] += 1
+            params = self._parse_params(request)
+            if self.api_latency:
+                await asyncio.sleep(self.api_latency)
+            result = await getattr(self, '_' + method)(params)
+            body = json.dumps({'ok': True, 'result': result}).encode()
+            return 200, 'application/json', body
+        return handler
+
+    @staticmethod
+    def _parse_params(request: Request) -> dict:
+        if not request.body:
+            return {}
+        if request.headers.get('content-type', '').startswith('application/json'):
+            return json.loads(request.body)
+        params = {}
+        for key, value in parse_qsl(request.body.decode()):
+            try:
+                params[key] = json.loads(value)
+            except ValueError:
+                params[key] = value
+        return params
+
+    async def _getMe(self, params):
+        return {'id': BOT_ID, 'is_bot': True, 'first_name': 'Bot', 'username': 'fake_bot',
+                'can_join_groups': True, 'can_read_all_group_messages': False,
+                'supports_inline_queries': False}
+
+    async def _getUpdates(self, params):
+        offset = int(params.get('offset') or 0)
+        while self._pending and self._pending[0]['update_id'] < offset:
+            self._pending.popleft()
+        if not self._pending:
+            self._pending_event.clear()
+            try:
+                await asyncio.wait_for(self._pending_event.wait(), timeout=float(params.get('timeout') or 0))
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get('limit') or 100)
+        return [update for update in list(self._pending)[:limit] if update['update_id'] >= offset]
+
+    async def _setWebhook(self, params):
+        self.webhook_url = params.get('url')
+        self.webhook_secret = params.get('secret_token')
+        return True
+
+    async def _deleteWebhook(self, params):
+        self.webhook_url = None
+        return True
+
+    async def _getWebhookInfo(self, params):
+        return {'url': self.webhook_url or '', 'has_custom_certificate': False, 'pending_update_count': 0}
+
+    async def _sendMessage(self, params):
+        chat_id = int(params['chat_id'])
+        message = {
+            'message_id': self._next_message_id(),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': BOT_ID, 'is_bot': True, 'first_name': 'Bot'},
+            'text': params.get('text', ''),
+        }
+        markup = params.get('reply_markup')
+        if isinstance(markup, dict) and 'inline_keyboard' in markup:
+            message['reply_markup'] = markup
+        self._replies[chat_id].put_nowait(message)
+        return message
+
+    async def _editMessageText(self, params):
+        chat_id = int(params['chat_id'])
+        message = {
+            'message_id': int(params['message_id']),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': BOT_ID, 'is_bot': True, 'first_name': 'Bot'},
+            'text': params.get('text', ''),
+        }
+        self._replies[chat_id].put_nowait(message)
+        return message
+
+    async def _answerCallbackQuery(self, params):
+        return True
@@ -0,0 +1,110 @@
+"""Helpers shared by the benchmarks: start the bot against the fake Bot API
+and drive users through the registration conversation."""
+import os
+import socket
+import sys
+import time
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_telegram import FakeTelegramAPI  # noqa: E402
+
+TOKEN = '123456:BENCHMARK'
+
+# (step name, what the user sends) after /start; "lang" is a button press
+CONVERSATION = [
+    ('lang', 'ru'),
+    ('name', 'Иван Петренко'),
+    ('age', '25'),
+    ('phone', '+380661234567'),
+    ('confirm', 'да'),
+]
+
+
+# Outbound pacing and per-user flood limits lifted, so a benchmark measures
+# the bot itself rather than Telegram's limits
+UNLIMITED_ENV = {
+    'RATE_LIMIT_GLOBAL': 1000000,
+    'RATE_LIMIT_PER_CHAT': 1000000,
+    'RATE_LIMIT_CHAT_BURST': 1000000,
+    'THROTTLE_LIMIT': 1000000,
+    'THROTTLE_STATE_LIMITS': '',
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def start_bot(api: FakeTelegramAPI, mode: str = 'polling', **env):
+    """Start WorkerRegistrationBot against ``api``; ``env`` overrides config variables"""
+    os.environ.update({
+        'BOT_TOKEN': TOKEN,
+        'RUN_MODE': mode,
+        'PORT': str(free_port()),
+        'WEBHOOK_URL': 'http://127.0.0.1',
+    })
+    os.environ.update({key: str(value) for key, value in env.items()})
+    from main import WorkerRegistrationBot
+
+    bot = WorkerRegistrationBot()
+    bot.config.WEBHOOK_URL = f'http://127.0.0.1:{bot.config.PORT}'
+    app = bot.build_application(base_url=api.base_url)
+
+    if mode == 'webhook':
+        await bot.start_webhook(app)
+    else:
+        await app.initialize()
+        await bot.post_init(app)
+        await app.updater.start_polling(poll_interval=0, timeout=10)
+        await app.start()
+    return bot, app
+
+
+async def stop_bot(bot, app, mode: str = 'polling'):
+    if mode == 'webhook':
+        await bot.stop_webhook(app)
+        return
+    await app.updater.stop()
+    await app.stop()
+    await bot.post_stop(app)
+    await bot.shutdown(app)
+    await app.shutdown()
+
+
+async def register_user(api: FakeTelegramAPI, user_id: int,
+                        timings: Optional[Dict[str, List[float]]] = None, timeout: float = 30.0,
+                        steps: Optional[List[tuple]] = None):
+    """Run one user from /start to confirmation, recording per-step latency.
+
+    ``steps`` replaces CONVERSATION, e.g. a prefix of it to leave the user
+    mid-conversation.
+    """
+    def record(step: str, started: float):
+        if timings is not None:
+            timings.setdefault(step, []).append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await api.push(api.message_update(user_id, '/start'))
+    picker = await api.next_reply(user_id, timeout)
+    record('start', started)
+
+    for step, text in CONVERSATION if steps is None else steps:
+        started = time.perf_counter()
+        if step == 'lang':
+            await api.push(api.callback_update(user_id, text, picker['message_id']))
+        elif step == 'phone':
+            # A distinct number per user, so the duplicate check never rejects one
+            await api.push(api.message_update(user_id, f'+38066{user_id % 10 ** 7:07d}'))
+        else:
+            await api.push(api.message_update(user_id, text))
+        await api.next_reply(user_id, timeout)
+        record(step, started)
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] if ordered else 0.0
@@ -0,0 +1,156 @@
+"""Load test: many fake users registering at once.
+
+Drives WorkerRegistrationBot through complete conversations (/start, language
+button, name, age, phone, "да") for N users with a bounded number in flight,
+against the fake Bot API and a fake worksheet with injected latency and
+errors. Reports throughput, per-step latency percentiles, what reached the
+sheet, and memory held per open conversation.
+
+    python benchmarks/load_test.py --users 2000 --concurrency 500 \\
+        --sheets-latency 0.2 --sheets-error-rate 0.05
+"""
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_sheets import FakeWorksheet  # noqa: E402
+from fake_telegram import FakeTelegramAPI  # noqa: E402
+from harness import CONVERSATION, TOKEN, UNLIMITED_ENV, percentile, register_user, start_bot, stop_bot  # noqa: E402
+
+
+def bot_env(args) -> dict:
+    env = {
+        'PERSISTENCE_BACKEND': args.persistence,
+        'PERSISTENCE_PATH': os.path.join(os.getcwd(), 'state.db'),
+        'SHEETS_RECONCILE_INTERVAL': 1,
+        'SHEETS_BACKOFF_BASE': 0.5,
+        'SHEETS_BACKOFF_MAX': 2,
+    }
+    if not args.telegram_limits:
+        # Per-chat pacing adds ~1s per step once a user's burst is spent,
+        # which would hide the bot's own cost
+        env.update(UNLIMITED_ENV)
+    return env
+
+
+async def throughput(args):
+    api = FakeTelegramAPI(TOKEN, api_latency=args.api_latency)
+    await api.start()
+    bot, app = await start_bot(api, **bot_env(args))
+    worksheet = FakeWorksheet(args.sheets_latency, args.sheets_error_rate, seed=1)
+    bot.sheets_manager.connection.worksheet = worksheet
+
+    timings = {}
+    failures = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one_user(user_id: int):
+        nonlocal failures
+        async with semaphore:
+            try:
+                await register_user(api, user_id, timings, timeout=args.timeout)
+            except asyncio.TimeoutError:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_user(100000 + i) for i in range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    # Let the reconciler replay rows that hit injected errors
+    deadline = time.monotonic() + args.drain
+    while bot.sheets_manager.journal.pending_count() and time.monotonic() < deadline:
+        await asyncio.sleep(0.2)
+    unsynced = bot.sheets_manager.journal.pending_count()
+    await stop_bot(bot, app)
+    await api.stop()
+
+    completed = args.users - failures
+    updates = completed * (len(CONVERSATION) + 1)
+    print(f"{args.users} users, {args.concurrency} concurrent, persistence={args.persistence}")
+    print(f"  {completed} registrations in {elapsed:.2f}s: {completed / elapsed:.1f} registrations/s, "
+          f"{updates / elapsed:.0f} updates/s, {failures} timed out")
+    print(f"  {'step':<8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for step, values in timings.items():
+        print(f"  {step:<8} {percentile(values, 0.5) * 1000:9.1f} {percentile(values, 0.95) * 1000:9.1f} "
+              f"{percentile(values, 0.99) * 1000:9.1f} {max(values) * 1000:9.1f}")
+    print(f"  sheet: {worksheet.data_rows} rows, {worksheet.requests} API requests, "
+          f"{worksheet.errors} injected errors, {unsynced} rows still unsynced")
+
+
+async def memory(args):
+    """Heap growth per conversation left open at the confirmation step"""
+    api = FakeTelegramAPI(TOKEN)
+    await api.start()
+    bot, app = await start_bot(api, **bot_env(args))
+    bot.sheets_manager.connection.worksheet = FakeWorksheet()
+    up_to_confirm = [step for step in CONVERSATION if step[0] != 'confirm']
+
+    # Warm up code paths and caches before the baseline
+    await register_user(api, 1, steps=up_to_confirm)
+    gc.collect()
+    # Deep tracebacks are what lets the fake API's allocations be filtered
+    # out below, and they make tracing slow: about a second per user
+    tracemalloc.start(25)
+    before = tracemalloc.take_snapshot()
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one_user(user_id: int):
+        async with semaphore:
+            await register_user(api, user_id, timeout=args.timeout, steps=up_to_confirm)
+
+    await asyncio.gather(*(one_user(200000 + i) for i in range(args.memory_users)))
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    # Leave out what the fake API and the harness allocate for each user
+    exclude = [tracemalloc.Filter(False, os.path.join(os.path.dirname(os.path.abspath(__file__)), '*'),
+                                  all_frames=True)]
+    stats = after.filter_traces(exclude).compare_to(before.filter_traces(exclude), 'filename')
+    grown = sum(stat.size_diff for stat in stats)
+    print(f"  memory: {grown / 1024:.0f} KiB for {args.memory_users} open conversations, "
+          f"{grown / args.memory_users:.0f} bytes each")
+    for stat in stats[:5]:
+        print(f"    {stat.size_diff / 1024:8.1f} KiB  {stat.traceback[0].filename}")
+
+    await stop_bot(bot, app)
+    await api.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=200, help='users in flight at once')
+    parser.add_argument('--api-latency', type=float, default=0.0, help='seconds per Bot API call')
+    parser.add_argument('--sheets-latency', type=float, default=0.2, help='seconds per Sheets request')
+    parser.add_argument('--sheets-error-rate', type=float, default=0.0, help='fraction of Sheets requests that fail')
+    parser.add_argument('--persistence', choices=('memory', 'sqlite', 'pickle'), default='memory')
+    parser.add_argument('--telegram-limits', action='store_true',
+                        help="keep the real outbound rate limits instead of lifting them")
+    parser.add_argument('--memory-users', type=int, default=100,
+                        help='open conversations for the memory measurement (0 to skip; ~1 s each)')
+    parser.add_argument('--timeout', type=float, default=60.0, help='seconds to wait for each reply')
+    parser.add_argument('--drain', type=float, default=10.0,
+                        help='seconds to wait for unsynced rows after the run')
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix='load_test_'))
+    # Injected Sheets failures are expected; keep their log lines out of the report
+    logging.disable(logging.ERROR)
+
+    asyncio.run(throughput(args))
+    if args.memory_users:
+        asyncio.run(memory(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+"""Command-line tools for moving registrations in and out of the bot's storage.
+
+    python cli.py export -o registrations.jsonl            # journal -> JSONL
+    python cli.py export --source sheet -o backup.parquet  # sheet -> Parquet
+    python cli.py validate registrations.csv --rejects bad.jsonl
+    python cli.py import registrations.csv                 # file -> journal
+    python cli.py push --chunk 500                         # unsynced journal rows -> sheet
+
+Every command streams rows through generators, so memory use does not grow
+with the size of the file.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from journal import COLUMNS, RegistrationJournal
+from shards import INDEX_HEADERS, INDEX_TITLE, create_layout
+from sheets_connection import SheetsConnection
+from validators import ValidatorEngine
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class Progress:
+    """Prints a row count and throughput to stderr at most every ``interval`` seconds"""
+
+    def __init__(self, label: str, interval: float = 1.0):
+        self.label = label
+        self.interval = interval
+        self.count = 0
+        self.started = time.perf_counter()
+        self._last_report = self.started
+
+    def update(self, rows: int = 1):
+        self.count += rows
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self._print(now, end='\r')
+
+    def done(self, **extra):
+        self._print(time.perf_counter(), end='\n', **extra)
+
+    def _print(self, now: float, end: str, **extra):
+        elapsed = max(now - self.started, 1e-9)
+        details = ''.join(f", {key} {value}" for key, value in extra.items())
+        print(
+            f"{self.label}: {self.count} rows in {elapsed:.1f}s "
+            f"({self.count / elapsed:.0f} rows/s){details}",
+            file=sys.stderr, end=end, flush=True
+        )
+
+
+def chunked(rows: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def detect_format(path: str, explicit: Optional[str]) -> str:
+    if explicit:
+        return explicit
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    return extension if extension in FORMATS else 'csv'
+
+
+def validator_engine() -> ValidatorEngine:
+    # Built from the same variables as Config, without requiring BOT_TOKEN
+    return ValidatorEngine(
+        min_age=int(os.getenv("MIN_AGE", "16")),
+        max_age=int(os.getenv("MAX_AGE", "40")),
+        max_name_length=int(os.getenv("MAX_NAME_LENGTH", "50"))
+    )
+
+
+def sheets_layout():
+    """The bot's worksheet layout: one tab, or monthly shards (SHEETS_SHARDING=month)"""
+    sharding = os.getenv('SHEETS_SHARDING', 'none').lower()
+    connection = SheetsConnection(
+        credentials_json=os.getenv('GOOGLE_SHEETS_CREDENTIALS'),
+        sheet_name=os.getenv('GOOGLE_SHEET_NAME', 'Worker Registrations'),
+        admin_email=os.getenv('ADMIN_EMAIL'),
+        **({'worksheet_title': INDEX_TITLE, 'headers': INDEX_HEADERS} if sharding == 'month' else {})
+    )
+    layout = create_layout(sharding, connection)
+    if not connection.configured:
+        raise SystemExit("Google Sheets is not configured (GOOGLE_SHEETS_CREDENTIALS)")
+    connection.connect()
+    return layout
+
+
+# Readers
+
+def read_file(path: str, fmt: str) -> Iterator[Dict]:
+    if fmt == 'jsonl':
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif fmt == 'parquet':
+        if not PARQUET_AVAILABLE:
+            raise SystemExit("Parquet support needs pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(path).iter_batches():
+            yield from batch.to_pylist()
+    else:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            yield from csv.DictReader(f)
+
+
+def read_sheet(chunk_size: int) -> Iterator[Dict]:
+    """Registrations from every worksheet (shard), fetched ``chunk_size`` rows per request"""
+    for worksheet in sheets_layout().worksheets():
+        start = 2  # row 1 is the header
+        while True:
+            end = start + chunk_size - 1
+            rows = worksheet.get(f'A{start}:H{end}')
+            for row in rows:
+                yield dict(zip(COLUMNS, row + [''] * (len(COLUMNS) - len(row))))
+            if len(rows) < chunk_size:
+                break
+            start = end + 1
+
+
+# Writers
+
+def write_rows(rows: Iterable[Dict], output: str, fmt: str, progress: Progress, chunk_size: int):
+    if fmt == 'parquet':
+        write_parquet(rows, output, progress, chunk_size)
+        return
+
+    f = sys.stdout if output == '-' else open(output, 'w', encoding='utf-8', newline='')
+    try:
+        if fmt == 'jsonl':
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False))
+                f.write('\n')
+                progress.update()
+        else:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction='ignore')
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+                progress.update()
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+
+def write_parquet(rows: Iterable[Dict], output: str, progress: Progress, chunk_size: int):
+    if not PARQUET_AVAILABLE:
+        raise SystemExit("Parquet support needs pyarrow (pip install pyarrow)")
+    if output == '-':
+        raise SystemExit("Parquet output needs a file path (-o)")
+    schema = pa.schema([(column, pa.string()) for column in COLUMNS])
+    with pq.ParquetWriter(output, schema) as writer:
+        # One row group per chunk keeps only chunk_size rows in memory
+        for chunk in chunked(rows, chunk_size):
+            columns = {column: [str(row.get(column) or '') for row in chunk] for column in COLUMNS}
+            writer.write_table(pa.table(columns, schema=schema))
+            progress.update(len(chunk))
+
+
+# Commands
+
+def cmd_export(args) -> int:
+    fmt = detect_format(args.output, args.format)
+    journal = None
+    if args.source == 'sheet':
+        rows = read_sheet(args.chunk)
+    else:
+        journal = RegistrationJournal(args.journal)
+        rows = journal.iter_rows(args.chunk)
+    progress = Progress('export')
+    try:
+        write_rows(rows, args.output, fmt, progress, args.chunk)
+    finally:
+        if journal is not None:
+            journal.close()
+    progress.done()
+    return 0
+
+
+def valid_date(value) -> bool:
+    """Empty (stamped on import) or the bot's 'YYYY-MM-DD HH:MM:SS', which sharding relies on"""
+    if not value:
+        return True
+    try:
+        datetime.strptime(str(value), DATE_FORMAT)
+    except ValueError:
+        return False
+    return True
+
+
+def checked_rows(rows: Iterable[Dict], engine: ValidatorEngine) -> Iterator[tuple]:
+    """(row, normalized_row, errors) for every input row"""
+    for row in rows:
+        result = engine.validate_records([row])[0]
+        errors = result['errors']
+        if not valid_date(row.get('registration_date')):
+            errors = errors + ['registration_date']
+        normalized = dict(row)
+        if not errors:
+            normalized.update({key: str(value) for key, value in result['normalized'].items()})
+        yield row, normalized, errors
+
+
+def cmd_validate(args, import_rows: bool = False) -> int:
+    engine = validator_engine()
+    rows = checked_rows(read_file(args.file, detect_format(args.file, args.format)), engine)
+    rejects = open(args.rejects, 'w', encoding='utf-8') if args.rejects else None
+    journal = RegistrationJournal(args.journal) if import_rows else None
+    progress = Progress('import' if import_rows else 'validate')
+    invalid = 0
+    imported = 0
+    skipped = 0
+
+    def valid_rows():
+        nonlocal invalid
+        for row, normalized, errors in rows:
+            progress.update()
+            if errors:
+                invalid += 1
+                if rejects:
+                    rejects.write(json.dumps({'row': row, 'errors': errors}, ensure_ascii=False) + '\n')
+                continue
+            yield normalized
+
+    try:
+        if journal is None:
+            for _ in valid_rows():
+                pass
+        else:
+            for chunk in chunked(valid_rows(), args.chunk):
+                added = journal.add_many(chunk)
+                imported += added
+                skipped += len(chunk) - added
+    finally:
+        if rejects:
+            rejects.close()
+        if journal is not None:
+            journal.close()
+
+    if import_rows:
+        progress.done(invalid=invalid, imported=imported, already_journaled=skipped)
+    else:
+        progress.done(invalid=invalid)
+    return 1 if invalid and not import_rows else 0
+
+
+def cmd_push(args) -> int:
+    journal = RegistrationJournal(args.journal)
+    layout = sheets_layout()
+    progress = Progress('push')
+    try:
+        while True:
+            claimed = journal.claim_unsynced(args.chunk)
+            if not claimed:
+                break
+            ids = [row_id for row_id, _ in claimed]
+            try:
+                layout.append_rows([[data[column] for column in COLUMNS] for _, data in claimed])
+            except Exception as e:
+                journal.release(ids)
+                logger.error("Failed to append %s rows to Google Sheets: %s", len(ids), e)
+                return 1
+            journal.mark_synced(ids)
+            progress.update(len(ids))
+    finally:
+        progress.done(pending=journal.pending_count())
+        journal.close()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Import, export and sync worker registrations")
+    parser.add_argument('--journal', default=os.getenv('JOURNAL_PATH', 'registrations.db'),
+                        help='path of the local registration journal')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help='write all registrations to a file')
+    export.add_argument('-o', '--output', default='-', help="output file, '-' for stdout")
+    export.add_argument('--format', choices=FORMATS, help='defaults to the output file extension')
+    export.add_argument('--source', choices=('journal', 'sheet'), default='journal')
+    export.add_argument('--chunk', type=int, default=1000, help='rows read per request')
+    export.set_defaults(handler=cmd_export)
+
+    for name, import_rows in (('validate', False), ('import', True)):
+        command = commands.add_parser(
+            name, help='add valid rows to the journal' if import_rows else 'check a file against the validators'
+        )
+        command.add_argument('file')
+        command.add_argument('--format', choices=FORMATS, help='defaults to the file extension')
+        command.add_argument('--rejects', help='write invalid rows and their errors to this JSONL file')
+        command.add_argument('--chunk', type=int, default=1000, help='rows per journal transaction')
+        command.set_defaults(handler=lambda args, import_rows=import_rows: cmd_validate(args, import_rows))
+
+    push = commands.add_parser('push', help='append unsynced journal rows to Google Sheets')
+    push.add_argument('--chunk', type=int, default=500, help='rows per append_rows request')
+    push.set_defaults(handler=cmd_push)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
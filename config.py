@@ -1,31 +1,107 @@
 import os
-from typing import Optional, List
+from collections import ChainMap
+from typing import Optional, List, Mapping
 
 class Config:
     """Configuration class for the bot"""
     
-    def __init__(self):
+    def __init__(self, overrides: Optional[Mapping[str, str]] = None):
+        # In multi-tenant mode each tenant's settings take precedence over
+        # the process environment
+        self.env = ChainMap(dict(overrides or {}), os.environ)
+        getenv = self.env.get
+
         # Bot token (required)
-        self.BOT_TOKEN = os.getenv("BOT_TOKEN")
+        self.BOT_TOKEN = getenv("BOT_TOKEN")
         if not self.BOT_TOKEN:
             raise ValueError("BOT_TOKEN environment variable is required")
         
         # Admin chat IDs (список админов)
-        admin_ids_str = os.getenv("ADMIN_CHAT_IDS", "")
+        admin_ids_str = getenv("ADMIN_CHAT_IDS", "")
         self.ADMIN_CHAT_IDS = [int(id.strip()) for id in admin_ids_str.split(",") if id.strip().isdigit()]
         
+        # Admin notifications: "immediate" or "digest" (N registrations or T seconds)
+        self.NOTIFY_MODE = getenv("NOTIFY_MODE", "immediate").lower()
+        self.DIGEST_SIZE = int(getenv("DIGEST_SIZE", "10"))
+        self.DIGEST_INTERVAL = float(getenv("DIGEST_INTERVAL", "300"))
+        
+        # Repeat registrations (same Telegram id or phone): "reject", "merge" or "allow"
+        self.DUPLICATE_POLICY = getenv("DUPLICATE_POLICY", "reject").lower()
+        
+        # Optional directory of <lang>.json files overriding or adding bot texts
+        self.LOCALES_DIR = getenv("LOCALES_DIR", "")
+        
         # Google Sheets configuration
-        self.GOOGLE_SHEETS_CREDENTIALS = os.getenv("GOOGLE_SHEETS_CREDENTIALS")
-        self.GOOGLE_SHEET_NAME = os.getenv("GOOGLE_SHEET_NAME", "Worker Registrations")
-        self.ADMIN_EMAIL = os.getenv("ADMIN_EMAIL")
+        self.GOOGLE_SHEETS_CREDENTIALS = getenv("GOOGLE_SHEETS_CREDENTIALS")
+        self.GOOGLE_SHEET_NAME = getenv("GOOGLE_SHEET_NAME", "Worker Registrations")
+        self.ADMIN_EMAIL = getenv("ADMIN_EMAIL")
         
         # Bot settings
-        self.MAX_NAME_LENGTH = int(os.getenv("MAX_NAME_LENGTH", "50"))
-        self.MIN_AGE = int(os.getenv("MIN_AGE", "16"))
-        self.MAX_AGE = int(os.getenv("MAX_AGE", "40"))
+        self.MAX_NAME_LENGTH = int(getenv("MAX_NAME_LENGTH", "50"))
+        self.MIN_AGE = int(getenv("MIN_AGE", "16"))
+        self.MAX_AGE = int(getenv("MAX_AGE", "40"))
         
-        # Logging level
-        self.LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+        # Run mode: "polling" (default) or "webhook"
+        self.RUN_MODE = getenv("RUN_MODE", "polling").lower()
+        self.WEBHOOK_URL = getenv("WEBHOOK_URL", "").rstrip("/")
+        self.WEBHOOK_PATH = "/" + getenv("WEBHOOK_PATH", "telegram").strip("/")
+        self.WEBHOOK_SECRET = getenv("WEBHOOK_SECRET")
+
+        # Custom Bot API server (e.g. a local telegram-bot-api instance)
+        self.TELEGRAM_API_URL = getenv("TELEGRAM_API_URL") or None
+
+        # Worker processes; updates are partitioned across them by user id
+        self.WORKERS = int(getenv("WORKERS", "1"))
+
+        # Outbound Bot API limits (messages per second)
+        self.RATE_LIMIT_GLOBAL = float(getenv("RATE_LIMIT_GLOBAL", "30"))
+        self.RATE_LIMIT_PER_CHAT = float(getenv("RATE_LIMIT_PER_CHAT", "1"))
+        self.RATE_LIMIT_CHAT_BURST = float(getenv("RATE_LIMIT_CHAT_BURST", "3"))
+
+        # HTTP server for health checks (and webhook updates)
+        self.PORT = int(getenv("PORT", "8080"))
+
+        # Conversation state persistence: "sqlite" (default), "pickle" or "memory"
+        self.PERSISTENCE_BACKEND = getenv("PERSISTENCE_BACKEND", "sqlite").lower()
+        self.PERSISTENCE_PATH = getenv("PERSISTENCE_PATH", "bot_state.db")
+        self.PERSISTENCE_INTERVAL = float(getenv("PERSISTENCE_INTERVAL", "5"))
+
+        # Abandoned conversations: idle seconds before one is dropped (default and
+        # per state, e.g. "name=1800,confirm=600") and a cap on live conversations
+        self.SESSION_TIMEOUT = float(getenv("SESSION_TIMEOUT", "3600"))
+        self.SESSION_STATE_TIMEOUTS = getenv("SESSION_STATE_TIMEOUTS", "")
+        self.SESSION_MAX = int(getenv("SESSION_MAX", "10000"))
+        self.SESSION_SWEEP_INTERVAL = float(getenv("SESSION_SWEEP_INTERVAL", "60"))
+
+        # Anti-flood: updates a user may send per THROTTLE_WINDOW seconds, by
+        # default and per conversation state ("idle" = no conversation, e.g.
+        # "idle=5,confirm=10"); over the limit updates are dropped silently
+        # ("drop") or with one cooldown reply per window ("reply")
+        self.THROTTLE_WINDOW = float(getenv("THROTTLE_WINDOW", "60"))
+        self.THROTTLE_LIMIT = int(getenv("THROTTLE_LIMIT", "30"))
+        self.THROTTLE_STATE_LIMITS = getenv("THROTTLE_STATE_LIMITS", "idle=10")
+        self.THROTTLE_MODE = getenv("THROTTLE_MODE", "reply").lower()
+
+        # Status updates: seconds between reads of the sheet's status and
+        # comment columns (0 turns it off), concurrent sends, and where the
+        # last seen statuses are kept across restarts
+        self.STATUS_SYNC_INTERVAL = float(getenv("STATUS_SYNC_INTERVAL", "300"))
+        self.STATUS_SYNC_CONCURRENCY = int(getenv("STATUS_SYNC_CONCURRENCY", "10"))
+        self.STATUS_SNAPSHOT = getenv("STATUS_SNAPSHOT", "status_snapshot.json")
+
+        # Health probes: /healthz fails once the event loop woke a task more
+        # than HEALTH_MAX_LOOP_LAG seconds late, /readyz once no getUpdates
+        # call succeeded for READY_MAX_POLL_AGE seconds; answers are cached
+        # for HEALTH_CACHE_TTL seconds
+        self.HEALTH_MAX_LOOP_LAG = float(getenv("HEALTH_MAX_LOOP_LAG", "5"))
+        self.READY_MAX_POLL_AGE = float(getenv("READY_MAX_POLL_AGE", "60"))
+        self.HEALTH_CACHE_TTL = float(getenv("HEALTH_CACHE_TTL", "2"))
+
+        # Logging: level, "json" or "text" records, and the share of
+        # high-volume info events (e.g. every /start) that is kept
+        self.LOG_LEVEL = getenv("LOG_LEVEL", "INFO").upper()
+        self.LOG_FORMAT = getenv("LOG_FORMAT", "json").lower()
+        self.LOG_SAMPLE_RATE = float(getenv("LOG_SAMPLE_RATE", "1.0"))
         
         # Validate configuration
         self._validate_config()
@@ -40,6 +116,51 @@ class Config:
         
         if self.MAX_NAME_LENGTH < 2:
             raise ValueError("MAX_NAME_LENGTH must be at least 2")
+
+        if self.RUN_MODE not in ("polling", "webhook"):
+            raise ValueError("RUN_MODE must be 'polling' or 'webhook'")
+
+        if self.NOTIFY_MODE not in ("immediate", "digest"):
+            raise ValueError("NOTIFY_MODE must be 'immediate' or 'digest'")
+
+        if self.DUPLICATE_POLICY not in ("reject", "merge", "allow"):
+            raise ValueError("DUPLICATE_POLICY must be 'reject', 'merge' or 'allow'")
+
+        if self.THROTTLE_MODE not in ("drop", "reply"):
+            raise ValueError("THROTTLE_MODE must be 'drop' or 'reply'")
+
+        if self.THROTTLE_WINDOW <= 0 or self.THROTTLE_LIMIT < 1:
+            raise ValueError("THROTTLE_WINDOW must be positive and THROTTLE_LIMIT at least 1")
+
+        if self.STATUS_SYNC_INTERVAL < 0 or self.STATUS_SYNC_CONCURRENCY < 1:
+            raise ValueError("STATUS_SYNC_INTERVAL must not be negative and STATUS_SYNC_CONCURRENCY at least 1")
+
+        if self.HEALTH_MAX_LOOP_LAG <= 0 or self.READY_MAX_POLL_AGE <= 0 or self.HEALTH_CACHE_TTL < 0:
+            raise ValueError("HEALTH_MAX_LOOP_LAG and READY_MAX_POLL_AGE must be positive, HEALTH_CACHE_TTL not negative")
+
+        if self.LOG_LEVEL not in ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"):
+            raise ValueError("LOG_LEVEL must be DEBUG, INFO, WARNING, ERROR or CRITICAL")
+
+        if self.LOG_FORMAT not in ("json", "text"):
+            raise ValueError("LOG_FORMAT must be 'json' or 'text'")
+
+        if self.WORKERS < 1:
+            raise ValueError("WORKERS must be at least 1")
+
+        if self.WORKERS > 1 and self.PERSISTENCE_BACKEND != "sqlite":
+            raise ValueError("WORKERS > 1 requires PERSISTENCE_BACKEND=sqlite")
+
+        if self.SESSION_TIMEOUT <= 0 or self.SESSION_SWEEP_INTERVAL <= 0:
+            raise ValueError("SESSION_TIMEOUT and SESSION_SWEEP_INTERVAL must be positive")
+
+        if self.SESSION_MAX < 1:
+            raise ValueError("SESSION_MAX must be at least 1")
+
+        if self.PERSISTENCE_BACKEND not in ("sqlite", "pickle", "memory"):
+            raise ValueError("PERSISTENCE_BACKEND must be 'sqlite', 'pickle' or 'memory'")
+
+        if self.RUN_MODE == "webhook" and not self.WEBHOOK_URL:
+            raise ValueError("WEBHOOK_URL is required in webhook mode")
     
     @property
     def is_sheets_configured(self) -> bool:
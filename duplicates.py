@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+from typing import Dict, Iterable, Optional, Tuple
+
+from validators import normalize_phone
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 2
+
+
+def phone_key(phone) -> str:
+    """Index key for a phone number: +380 form when valid, stripped otherwise"""
+    return normalize_phone(str(phone or ''))[1]
+
+
+class DuplicateIndex:
+    """In-memory lookup of registered phones and Telegram ids.
+
+    Maps each normalized phone and each ``telegram_id`` to the journal row
+    that registered it (``None`` for rows that only exist in the sheet), and
+    each phone to the Telegram id that owns it, so a new registration is
+    checked in O(1). ``last_row_id`` is the highest
+    journal id already indexed: catching up reads only rows after it, which
+    also picks up registrations written by other worker processes.
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = None):
+        self.snapshot_path = snapshot_path
+        self.by_phone: Dict[str, Optional[int]] = {}
+        self.by_telegram_id: Dict[str, Optional[int]] = {}
+        self.phone_owners: Dict[str, str] = {}
+        self.last_row_id = 0
+        self.sheet_loaded = False
+        self.loaded = False
+
+    def add(self, phone, telegram_id, row_id: Optional[int] = None):
+        key = phone_key(phone)
+        if key:
+            self.by_phone[key] = row_id
+            if telegram_id:
+                self.phone_owners[key] = str(telegram_id)
+        if telegram_id:
+            self.by_telegram_id[str(telegram_id)] = row_id
+        if row_id is not None and row_id > self.last_row_id:
+            self.last_row_id = row_id
+
+    def add_journal_rows(self, rows: Iterable[Tuple[int, str, str]]):
+        for row_id, phone, telegram_id in rows:
+            self.add(phone, telegram_id, row_id)
+
+    def add_sheet_rows(self, phones: Iterable, telegram_ids: Iterable):
+        """Index sheet rows; ``phones`` and ``telegram_ids`` are aligned per row"""
+        # Journal rows already indexed win over their copies in the sheet
+        for phone, telegram_id in zip(phones, telegram_ids):
+            key = phone_key(phone)
+            telegram_id = str(telegram_id or '')
+            if key and key not in self.by_phone:
+                self.by_phone[key] = None
+                if telegram_id:
+                    self.phone_owners[key] = telegram_id
+            if telegram_id and telegram_id not in self.by_telegram_id:
+                self.by_telegram_id[telegram_id] = None
+        self.sheet_loaded = True
+
+    def find(self, phone, telegram_id) -> Optional[Tuple[str, Optional[int]]]:
+        """Return ``(field, row_id)`` of an existing registration, or None.
+
+        ``('phone', ...)`` means the phone belongs to another account (or to a
+        sheet row without a Telegram id) and wins over a Telegram id match;
+        ``('telegram_id', ...)`` is the account's own earlier registration.
+        """
+        key = phone_key(phone)
+        telegram_id = str(telegram_id or '')
+        if key in self.by_phone and self.phone_owners.get(key) != telegram_id:
+            return 'phone', self.by_phone[key]
+        if telegram_id and telegram_id in self.by_telegram_id:
+            return 'telegram_id', self.by_telegram_id[telegram_id]
+        if key in self.by_phone:
+            return 'phone', self.by_phone[key]
+        return None
+
+    def forget_phones(self, telegram_id, keep=None):
+        """Drop the phones ``telegram_id`` owns other than ``keep``, after it merged in a new one"""
+        telegram_id = str(telegram_id)
+        keep = phone_key(keep)
+        for key in [key for key, owner in self.phone_owners.items() if owner == telegram_id and key != keep]:
+            del self.phone_owners[key]
+            self.by_phone.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self.by_telegram_id)
+
+    def load_snapshot(self) -> bool:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if snapshot.get('version') != SNAPSHOT_VERSION:
+                return False
+            self.by_phone = snapshot['phones']
+            self.by_telegram_id = snapshot['telegram_ids']
+            self.phone_owners = snapshot['phone_owners']
+            self.last_row_id = snapshot['last_row_id']
+            self.sheet_loaded = snapshot['sheet_loaded']
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable duplicate index snapshot %s: %s", self.snapshot_path, e)
+            return False
+        self.loaded = True
+        return True
+
+    def save_snapshot(self):
+        if not self.snapshot_path or not self.loaded:
+            return
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'last_row_id': self.last_row_id,
+            'sheet_loaded': self.sheet_loaded,
+            'phones': self.by_phone,
+            'telegram_ids': self.by_telegram_id,
+            'phone_owners': self.phone_owners,
+        }
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+        os.replace(tmp_path, self.snapshot_path)
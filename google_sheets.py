@@ -1,197 +1,651 @@
 import os
 import asyncio
 import logging
-from datetime import datetime, timedelta
-from typing import Dict
-import json
-
-try:
-    import gspread
-    from google.oauth2.service_account import Credentials
-    GSPREAD_AVAILABLE = True
-except ImportError:
-    GSPREAD_AVAILABLE = False
-    logging.warning("gspread not available - Google Sheets integration disabled")
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Mapping, Optional, Set, Tuple
+
+from duplicates import DuplicateIndex
+from journal import RegistrationJournal
+from metrics import LatencyStats, MetricsRegistry
+from search_index import RegistrationSearchIndex
+from shards import INDEX_HEADERS, INDEX_TITLE, create_layout
+from sheets_connection import CircuitBreaker, SheetsClientPool, SheetsConnection
+from stats import RegistrationStatsIndex
 
 logger = logging.getLogger(__name__)
 
+
+_CLOSE = object()
+
+
+class RegistrationQueue:
+    """Write-behind queue that groups registrations into batched appends.
+
+    A batch is flushed when it reaches ``batch_size`` rows or when the oldest
+    queued row has waited ``flush_interval`` seconds, whichever comes first.
+    """
+
+    def __init__(self, flush: Callable[[List], Awaitable[None]],
+                 batch_size: int = 50, flush_interval: float = 2.0):
+        self.flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.latency = LatencyStats()
+        self.flushed_rows = 0
+        self.flushed_batches = 0
+        self.last_batch_size = 0
+
+    async def put(self, item):
+        if self._worker is None or self._worker.done():
+            self._queue = self._queue or asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        await self._queue.put(item)
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def _run(self):
+        closing = False
+        while not closing:
+            item = await self._queue.get()
+            if item is _CLOSE:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _CLOSE:
+                    closing = True
+                    break
+                batch.append(item)
+            await self._flush_batch(batch)
+
+    async def _flush_batch(self, batch: List):
+        started = time.perf_counter()
+        try:
+            await self.flush(batch)
+        except Exception as e:
+            logger.error("Failed to flush registration batch: %s", e)
+        finally:
+            self.latency.observe('flush', time.perf_counter() - started)
+            self.flushed_rows += len(batch)
+            self.flushed_batches += 1
+            self.last_batch_size = len(batch)
+
+    async def close(self):
+        """Flush whatever is still queued and stop the worker"""
+        if self._worker is None or self._worker.done():
+            return
+        await self._queue.put(_CLOSE)
+        await self._worker
+        self._worker = None
+
+    def stats(self) -> Dict:
+        flush = self.latency.summary().get('flush', {})
+        return {
+            'depth': self.depth,
+            'last_batch_size': self.last_batch_size,
+            'avg_batch_size': round(self.flushed_rows / self.flushed_batches, 1) if self.flushed_batches else 0,
+            'flushed_rows': self.flushed_rows,
+            'flush_p50_ms': flush.get('p50_ms', 0.0),
+            'flush_p99_ms': flush.get('p99_ms', 0.0),
+        }
+
+
+CIRCUIT_STATES = ('closed', 'half_open', 'open')
+
+
 class GoogleSheetsManager:
-    def __init__(self):
-        self.gc = None
-        self.sheet = None
-        self.worksheet = None
-        self.initialized = False
+    def __init__(self, metrics: Optional[MetricsRegistry] = None, env: Optional[Mapping[str, str]] = None,
+                 executor: Optional[ThreadPoolExecutor] = None, clients: Optional[SheetsClientPool] = None):
+        # Tenants in multi-tenant mode pass their own settings, a shared
+        # executor and a shared client pool
+        env = os.environ if env is None else env
+        # "month" keeps one worksheet per month behind an index worksheet
+        sharding = env.get('SHEETS_SHARDING', 'none').lower()
+        self.connection = SheetsConnection(
+            credentials_json=env.get('GOOGLE_SHEETS_CREDENTIALS'),
+            sheet_name=env.get('GOOGLE_SHEET_NAME', 'Worker Registrations'),
+            admin_email=env.get('ADMIN_EMAIL'),
+            refresh_margin=float(env.get('SHEETS_TOKEN_REFRESH_MARGIN', '300')),
+            clients=clients,
+            **({'worksheet_title': INDEX_TITLE, 'headers': INDEX_HEADERS} if sharding == 'month' else {})
+        )
+        self.layout = create_layout(sharding, self.connection)
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(env.get('SHEETS_FAILURE_THRESHOLD', '3')),
+            base_delay=float(env.get('SHEETS_BACKOFF_BASE', '5')),
+            max_delay=float(env.get('SHEETS_BACKOFF_MAX', '300'))
+        )
+        self._connect_task: Optional[asyncio.Task] = None
+
+        # gspread is synchronous, so every call goes through a bounded pool
+        # instead of blocking the bot's event loop
+        self.max_workers = int(env.get('SHEETS_MAX_WORKERS', '4'))
+        self.timeout = float(env.get('SHEETS_TIMEOUT', '15'))
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix='sheets'
+        )
+        self.latency = LatencyStats()
+
+        self.queue = RegistrationQueue(
+            self._flush_registrations,
+            batch_size=int(env.get('SHEETS_BATCH_SIZE', '50')),
+            flush_interval=float(env.get('SHEETS_FLUSH_INTERVAL', '2'))
+        )
+
+        # Every registration lands in the local journal first; Sheets is a
+        # replica that the queue and the reconciler keep up to date
+        self.journal = RegistrationJournal(
+            env.get('JOURNAL_PATH', 'registrations.db'),
+            lease=float(env.get('JOURNAL_CLAIM_LEASE', '120'))
+        )
+        self.journal_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='journal')
+        self.reconcile_interval = float(env.get('SHEETS_RECONCILE_INTERVAL', '60'))
+        # Written by older versions when Sheets was down; imported once
+        self.legacy_csv = env.get('LEGACY_CSV', 'registrations.csv')
+        self._in_flight: Set[int] = set()
+        self._reconciler: Optional[asyncio.Task] = None
+        # Last unsynced row count from the journal thread, for callers that
+        # cannot wait for a query (metrics scrapes, /stats, usage)
+        self.unsynced = 0
+
+        self.duplicates = DuplicateIndex(env.get('DUPLICATES_SNAPSHOT') or None)
+        self._duplicates_sheet_task: Optional[asyncio.Task] = None
+        self._background: Set[asyncio.Task] = set()
+        self.search = RegistrationSearchIndex()
+        self._search_sheet_task: Optional[asyncio.Task] = None
+
+        self.stats = RegistrationStatsIndex(ttl=float(env.get('STATS_CACHE_TTL', '60')))
+        # Serializes our own appends with stats catch-up reads so the row
+        # offset never counts a freshly appended batch twice
+        self._append_lock = asyncio.Lock()
+
+        self.metrics = metrics or MetricsRegistry()
+        self._call_seconds = self.metrics.histogram(
+            'storage_call_seconds', 'Latency of blocking Sheets and journal calls', ('backend', 'operation')
+        )
+        self._call_errors = self.metrics.counter(
+            'storage_call_errors_total', 'Failed or timed out Sheets and journal calls', ('backend', 'operation')
+        )
+        self._fallbacks = self.metrics.counter(
+            'sheets_fallback_rows_total', 'Rows left in the local journal instead of reaching Sheets', ('reason',)
+        )
+        self.metrics.gauge('sheets_queue_depth', 'Rows waiting in the write-behind queue',
+                           callback=lambda: self.queue.depth)
+        self.metrics.gauge('journal_unsynced_rows', 'Journal rows not yet in Google Sheets',
+                           callback=lambda: self.unsynced)
+        self.metrics.gauge(
+            'sheets_circuit_state', 'Circuit breaker state (1 for the current one)', ('state',),
+            callback=lambda: {(state,): int(state == self.breaker.state) for state in CIRCUIT_STATES}
+        )
+
+    async def _run(self, operation: str, func, *args, **kwargs):
+        """Run a blocking call in the executor with a timeout and record its latency"""
+        return await self._run_in(self.executor, operation, func, *args, **kwargs)
 
-    async def _initialize(self):
+    async def _run_journal(self, operation: str, func, *args, **kwargs):
+        """Run a journal call on its dedicated single writer thread"""
+        return await self._run_in(self.journal_executor, operation, func, *args, **kwargs)
+
+    async def _run_in(self, executor: ThreadPoolExecutor, operation: str, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        failed = True
         try:
-            creds_json = os.getenv('GOOGLE_SHEETS_CREDENTIALS')
-            if not creds_json:
-                logger.warning("Google Sheets credentials not found in environment")
-                return
+            result = await asyncio.wait_for(
+                loop.run_in_executor(executor, lambda: func(*args, **kwargs)),
+                timeout=self.timeout
+            )
+            failed = False
+            return result
+        finally:
+            backend = 'journal' if executor is self.journal_executor else 'sheets'
+            self._observe(backend, operation, time.perf_counter() - started, failed)
 
+    async def _run_to_completion(self, operation: str, func, *args):
+        """Like ``_run``, but a Sheets call still running at the timeout is waited for.
+
+        A gspread request cannot be cancelled and usually lands anyway, so for
+        writes the caller needs the real outcome, not a guess.
+        """
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        failed = True
+        future = loop.run_in_executor(self.executor, lambda: func(*args))
+        try:
             try:
-                creds_dict = json.loads(creds_json)
-            except json.JSONDecodeError:
-                logger.error("Invalid JSON in GOOGLE_SHEETS_CREDENTIALS")
-                return
+                result = await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                logger.warning("%s still running after %ss, waiting for its outcome", operation, self.timeout)
+                result = await future
+            failed = False
+            return result
+        finally:
+            self._observe('sheets', operation, time.perf_counter() - started, failed)
 
-            scope = [
-                'https://spreadsheets.google.com/feeds',
-                'https://www.googleapis.com/auth/drive'
-            ]
+    def _observe(self, backend: str, operation: str, elapsed: float, failed: bool):
+        self.latency.observe(operation, elapsed, error=failed)
+        self._call_seconds.observe(elapsed, backend, operation)
+        if failed:
+            self._call_errors.inc(backend, operation)
 
-            credentials = Credentials.from_service_account_info(creds_dict, scopes=scope)
-            self.gc = gspread.authorize(credentials)
+    def get_latency_stats(self) -> Dict:
+        """p50/p99 latency per Sheets operation"""
+        return self.latency.summary()
 
-            sheet_name = os.getenv('GOOGLE_SHEET_NAME', 'Worker Registrations')
-            try:
-                self.sheet = self.gc.open(sheet_name)
-            except gspread.SpreadsheetNotFound:
-                self.sheet = self.gc.create(sheet_name)
-                admin_email = os.getenv('ADMIN_EMAIL')
-                if admin_email:
-                    self.sheet.share(admin_email, perm_type='user', role='writer')
+    @property
+    def worksheet(self):
+        return self.connection.worksheet
 
-            try:
-                self.worksheet = self.sheet.worksheet('Registrations')
-            except gspread.WorksheetNotFound:
-                self.worksheet = self.sheet.add_worksheet(title='Registrations', rows=1000, cols=10)
-                headers = [
-                    'Дата регистрации', 'Имя', 'Возраст', 'Телефон',
-                    'Telegram Username', 'Telegram ID', 'Статус', 'Комментарии'
-                ]
-                self.worksheet.append_row(headers)
-
-            self.initialized = True
-            logger.info("Google Sheets integration initialized successfully")
+    async def _ensure_connection(self) -> bool:
+        """Connect through the circuit breaker; never raises"""
+        if self.connection.ready:
+            return True
+        if not self.connection.configured or not self.breaker.allow():
+            return False
+        try:
+            await self._run('connect', self.connection.connect)
+            self.breaker.record_success()
+            return True
+        except Exception as e:
+            self.breaker.record_failure()
+            logger.error("Failed to initialize Google Sheets: %s", e)
+            return False
+
+    def _connect_in_background(self):
+        """Connect without holding up the caller, then replay whatever is waiting"""
+        if self._connect_task is not None and not self._connect_task.done():
+            return
+
+        async def connect_and_reconcile():
+            if await self._ensure_connection():
+                await self.reconcile()
+
+        self._connect_task = asyncio.create_task(connect_and_reconcile())
 
+    def _record_sheets_error(self, error: Exception):
+        self.breaker.record_failure()
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+        if status == 404:
+            # The spreadsheet or tab was removed; reopen it on the next attempt
+            self.connection.reset()
+
+    async def start(self):
+        """Import the legacy CSV fallback and start replaying unsynced rows"""
+        if self._reconciler is not None:
+            return
+        try:
+            if self.legacy_csv:
+                imported = await self._run_journal('journal_import', self.journal.import_csv, self.legacy_csv)
+                if imported:
+                    self.stats.invalidate(full=True)
         except Exception as e:
-            logger.error(f"Failed to initialize Google Sheets: {e}")
-            self.initialized = False
+            logger.error("Failed to import %s into the journal: %s", self.legacy_csv, e)
+        self._reconciler = asyncio.create_task(self._reconcile_loop())
 
     async def add_registration(self, data: Dict) -> bool:
-        if not self.initialized and GSPREAD_AVAILABLE:
-            await self._initialize()
+        data['registration_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            row_id = await self._run_journal('journal_add', self.journal.add, data)
+        except Exception as e:
+            logger.error("Failed to save registration to the local journal: %s", e)
+            return False
+        self.unsynced += 1
+
+        if self.stats.loaded:
+            self.stats.add(data['registration_date'])
+        if self.duplicates.loaded:
+            self.duplicates.add(data['phone'], data['telegram_id'], row_id)
+        if self.search.loaded:
+            self.search.add(row_id, data)
+
+        await self.start()
+
+        # Never authorize on the user's path: the row is already durable, so
+        # a cold or broken connection is dealt with in the background
+        if self.connection.ready:
+            await self._enqueue(row_id, data)
+        else:
+            self._fallbacks.inc('not_connected')
+            self._connect_in_background()
+        return True
+
+    async def find_duplicate(self, data: Dict) -> Optional[Tuple[str, Optional[int]]]:
+        """Look up an earlier registration with the same Telegram id or phone.
 
-        if not self.initialized or not self.worksheet:
-            return await self._save_to_local_file(data)
+        Returns ``(field, journal_row_id)`` or None. The index is loaded on
+        first use and caught up from the journal on every call, which costs
+        one primary-key range query and covers other worker processes.
+        """
+        if not await self._catch_up_duplicates():
+            return None
 
+        # Rows entered into the sheet by hand are indexed once, off the user's path
+        if not self.duplicates.sheet_loaded and self.connection.ready:
+            if self._duplicates_sheet_task is None or self._duplicates_sheet_task.done():
+                self._duplicates_sheet_task = asyncio.create_task(self._load_sheet_duplicates())
+
+        return self.duplicates.find(data['phone'], data['telegram_id'])
+
+    async def _catch_up_duplicates(self) -> bool:
+        try:
+            if not self.duplicates.loaded:
+                if not await self._run_journal('duplicates_snapshot', self.duplicates.load_snapshot):
+                    self.duplicates.loaded = True
+            rows = await self._run_journal(
+                'journal_keys', lambda: list(self.journal.iter_keys(self.duplicates.last_row_id))
+            )
+            self.duplicates.add_journal_rows(rows)
+        except Exception as e:
+            logger.error("Failed to load the duplicate index: %s", e)
+            return False
+        return True
+
+    async def warm_up(self) -> bool:
+        """Connect and load the duplicate index ahead of the first registration.
+
+        Runs in the background once the bot is up, so importing gspread,
+        authorizing and opening the current worksheet happen before a user
+        confirms instead of on their request. Returns whether Sheets is ready.
+        """
+        await self._catch_up_duplicates()
+        await self.get_search_index()
+        if not await self._ensure_connection():
+            return False
+        try:
+            await self._run('open_current_shard', self.layout.prepare)
+        except Exception as e:
+            self._record_sheets_error(e)
+            logger.error("Failed to open the current worksheet: %s", e)
+            return False
+        if not self.duplicates.sheet_loaded:
+            await self._load_sheet_duplicates()
+        if not self.search.sheet_loaded:
+            await self._load_sheet_search()
+        return True
+
+    async def get_search_index(self) -> RegistrationSearchIndex:
+        """Admin search index, caught up with rows journaled by any process"""
+        try:
+            entries = await self._run_journal(
+                'journal_entries', lambda: list(self.journal.iter_entries(self.search.last_row_id))
+            )
+            self.search.add_many(entries)
+            self.search.loaded = True
+        except Exception as e:
+            logger.error("Failed to update the search index: %s", e)
+        # Rows that exist only in the sheet are read once, off the admin's path
+        if not self.search.sheet_loaded and self.connection.ready:
+            if self._search_sheet_task is None or self._search_sheet_task.done():
+                self._search_sheet_task = asyncio.create_task(self._load_sheet_search())
+        return self.search
+
+    async def _load_sheet_search(self):
+        if not self.breaker.allow():
+            return
+        try:
+            rows = await self._run('get_registration_rows', self.layout.registration_rows)
+        except Exception as e:
+            self._record_sheets_error(e)
+            logger.error("Failed to read registrations from Google Sheets for search: %s", e)
+            return
+        self.breaker.record_success()
+        self.search.add_sheet_rows(rows)
+
+    async def _load_sheet_duplicates(self):
+        if not self.breaker.allow():
+            return
+        try:
+            phones, telegram_ids = await self._run('get_duplicate_keys', self.layout.key_columns)
+        except Exception as e:
+            self._record_sheets_error(e)
+            logger.error("Failed to read phones and Telegram ids from Google Sheets: %s", e)
+            return
+        self.breaker.record_success()
+        self.duplicates.add_sheet_rows(phones, telegram_ids)
+
+    async def read_statuses(self) -> Optional[Dict[str, List[list]]]:
+        """Telegram id, status and comment columns per worksheet; None while Sheets is unavailable"""
+        if not await self._ensure_connection() or not self.breaker.allow():
+            return None
+        try:
+            columns = await self._run('get_status_columns', self.layout.status_columns)
+        except Exception as e:
+            self._record_sheets_error(e)
+            logger.error("Failed to read statuses from Google Sheets: %s", e)
+            return None
+        self.breaker.record_success()
+        return columns
+
+    async def get_languages(self, telegram_ids: List[str]) -> Dict[str, str]:
+        """Language each user registered in, from the journal"""
+        return await self._run_journal('journal_languages', self.journal.languages, telegram_ids)
+
+    async def merge_registration(self, match: Tuple[str, Optional[int]], data: Dict) -> bool:
+        """Overwrite the user's earlier registration with new details instead of adding a row"""
+        field, row_id = match
+        if field != 'telegram_id':
+            # The row belongs to another account: rewriting it would hand that
+            # person's row, and their status updates, to this user
+            raise ValueError("Only a registration with the same Telegram id can be merged")
+        data['registration_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if row_id is None:
+            previous = {'telegram_id': data['telegram_id'], 'registration_date': '', 'synced': True}
+        else:
+            try:
+                previous = await self._run_journal('journal_update', self.journal.update, row_id, data)
+            except Exception as e:
+                logger.error("Failed to merge registration into journal row %s: %s", row_id, e)
+                return False
+            if previous is None:
+                return await self.add_registration(data)
+
+        # The number the account used before is free again
+        self.duplicates.forget_phones(data['telegram_id'], keep=data['phone'])
+        self.duplicates.add(data['phone'], data['telegram_id'], row_id)
+        if row_id is not None and self.search.loaded:
+            self.search.add(row_id, data)
+        # Unsynced rows reach the sheet with the new values; synced rows are
+        # rewritten in place in the background
+        if previous['synced'] or row_id in self._in_flight:
+            task = asyncio.create_task(
+                self._update_sheet_row(previous['telegram_id'], data, previous['registration_date'])
+            )
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+        return True
+
+    async def _update_sheet_row(self, telegram_id: str, data: Dict, registration_date: str = ''):
+        if not await self._ensure_connection() or not self.breaker.allow():
+            logger.warning("Google Sheets unavailable, merged registration of %s not rewritten", telegram_id)
+            return
         try:
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            row = [
-                timestamp,
+            found = await self._run('find', self.layout.find_row, str(telegram_id), registration_date)
+            if found is None:
+                logger.warning("No sheet row for Telegram id %s, merged registration not rewritten", telegram_id)
+                return
+            # The row keeps its place (and shard); only its details change
+            worksheet, row = found
+            await self._run(
+                'update_row', worksheet.update,
+                values=[[data['registration_date'], data['name'], data['age'],
+                         data['phone'], data['telegram_username']]],
+                range_name=f'A{row}:E{row}'
+            )
+        except Exception as e:
+            self._record_sheets_error(e)
+            logger.error("Failed to rewrite merged registration of %s: %s", telegram_id, e)
+            return
+        self.breaker.record_success()
+
+    async def _enqueue(self, row_id: int, data: Dict):
+        # The reconciler may pick up a freshly journaled row before its own
+        # add_registration call gets here, so the in-flight set decides
+        if row_id in self._in_flight:
+            return
+        self._in_flight.add(row_id)
+        await self.queue.put((row_id, data))
+
+    async def _flush_registrations(self, batch: List[Tuple[int, Dict]]):
+        """Append a batch of journaled registrations with a single Sheets request"""
+        ids = [row_id for row_id, _ in batch]
+        rows = [
+            [
+                data['registration_date'],
                 data['name'],
                 data['age'],
                 data['phone'],
                 data['telegram_username'],
                 data['telegram_id'],
-                'Новый',
-                ''
+                data.get('status') or 'Новый',
+                data.get('comments') or ''
             ]
-            self.worksheet.append_row(row)
-            data['registration_date'] = timestamp
-            return True
-        except Exception as e:
-            logger.error(f"Failed to add registration to Google Sheets: {e}")
-            return await self._save_to_local_file(data)
-
-    async def _save_to_local_file(self, data: Dict) -> bool:
-        try:
-            import csv
-            from pathlib import Path
-
-            file_path = Path('registrations.csv')
-            file_exists = file_path.exists()
-
-            with open(file_path, 'a', newline='', encoding='utf-8') as csvfile:
-                fieldnames = [
-                    'registration_date', 'name', 'age', 'phone',
-                    'telegram_username', 'telegram_id', 'status', 'comments'
-                ]
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                if not file_exists:
-                    writer.writeheader()
-
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                row_data = {
-                    'registration_date': timestamp,
-                    'name': data['name'],
-                    'age': data['age'],
-                    'phone': data['phone'],
-                    'telegram_username': data['telegram_username'],
-                    'telegram_id': data['telegram_id'],
-                    'status': 'Новый',
-                    'comments': ''
-                }
-                writer.writerow(row_data)
-                data['registration_date'] = timestamp
-                return True
-        except Exception as e:
-            logger.error(f"Failed to save to local file: {e}")
-            return False
+            for _, data in batch
+        ]
+        try:
+            if not self.connection.ready or not self.breaker.allow():
+                reason = 'not_connected' if not self.connection.ready else 'circuit_open'
+                self._fallbacks.inc(reason, amount=len(ids))
+                await self._run_journal('journal_release', self.journal.release, ids)
+                return
+            try:
+                async with self._append_lock:
+                    # Releasing rows whose append merely timed out would have
+                    # the reconciler append them a second time
+                    appended = await self._run_to_completion('append_rows', self.layout.append_rows, rows)
+                    if self.stats.source == 'sheet':
+                        self.stats.offset += appended.get(self.stats.partition, 0)
+            except Exception as e:
+                self._record_sheets_error(e)
+                self._fallbacks.inc('error', amount=len(ids))
+                logger.error("Failed to sync %s registrations to Google Sheets, will retry: %s", len(batch), e)
+                await self._run_journal('journal_release', self.journal.release, ids)
+                return
+            self.breaker.record_success()
+            await self._run_journal('journal_mark_synced', self.journal.mark_synced, ids)
+            await self.pending_rows()
+        finally:
+            self._in_flight.difference_update(ids)
 
-    async def get_registration_stats(self) -> Dict:
-        if not self.initialized and GSPREAD_AVAILABLE:
-            await self._initialize()
+    async def reconcile(self) -> int:
+        """Queue journal rows that have not reached Google Sheets yet"""
+        if not await self._ensure_connection():
+            return 0
+        if self.breaker.state == 'open':
+            return 0
 
-        if not self.initialized or not self.worksheet:
-            return await self._get_local_stats()
+        rows = await self._run_journal(
+            'journal_claim_unsynced', self.journal.claim_unsynced,
+            self.queue.batch_size * 10, set(self._in_flight)
+        )
+        for row_id, data in rows:
+            await self._enqueue(row_id, data)
+        if rows:
+            logger.info("Replaying %s unsynced registrations to Google Sheets", len(rows))
+        return len(rows)
 
-        try:
-            records = self.worksheet.get_all_records()
-            now = datetime.now()
-            today = now.date()
-            week_start = today - timedelta(days=today.weekday())
-            month_start = today.replace(day=1)
+    async def _reconcile_loop(self):
+        while True:
+            try:
+                await self.pending_rows()
+                await self.reconcile()
+                if self.connection.ready:
+                    await self._run('refresh_token', self.connection.refresh_if_needed)
+            except Exception as e:
+                logger.error("Registration reconciliation failed: %s", e)
+            await asyncio.sleep(self.reconcile_interval)
 
-            stats = {'total': 0, 'today': 0, 'this_week': 0, 'this_month': 0}
-            for record in records:
-                try:
-                    reg_date = datetime.strptime(record['Дата регистрации'], '%Y-%m-%d %H:%M:%S').date()
-                    stats['total'] += 1
-                    if reg_date == today:
-                        stats['today'] += 1
-                    if reg_date >= week_start:
-                        stats['this_week'] += 1
-                    if reg_date >= month_start:
-                        stats['this_month'] += 1
-                except (ValueError, KeyError):
-                    continue
-            return stats
-        except Exception as e:
-            logger.error(f"Failed to get stats from Google Sheets: {e}")
-            return await self._get_local_stats()
+    async def record_abandoned(self, records: List[Dict]):
+        """Store compact records of expired conversations in the journal"""
+        await self._run_journal('record_abandoned', self.journal.add_abandoned, records)
+
+    async def get_abandoned_stats(self) -> Dict[str, int]:
+        return await self._run_journal('abandoned_stats', self.journal.abandoned_counts)
+
+    async def pending_rows(self) -> int:
+        """Journal rows not yet in Google Sheets, counted off the event loop"""
+        self.unsynced = await self._run_journal('journal_pending', self.journal.pending_count)
+        return self.unsynced
 
-    async def _get_local_stats(self) -> Dict:
+    def get_queue_stats(self) -> Dict:
+        """Write-behind queue depth, batch sizes and flush latency"""
+        stats = self.queue.stats()
+        stats['unsynced'] = self.unsynced
+        stats['circuit'] = self.breaker.state
+        return stats
+
+    async def close(self):
+        """Flush pending registrations and release the executors"""
+        for task in (self._reconciler, self._connect_task, self._duplicates_sheet_task, self._search_sheet_task):
+            if task is not None:
+                task.cancel()
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        self._reconciler = None
+        self._connect_task = None
+        await self.queue.close()
+        if self._owns_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        self.journal_executor.shutdown(wait=True)
         try:
-            import csv
-            from pathlib import Path
+            self.duplicates.save_snapshot()
+        except OSError as e:
+            logger.error("Failed to save the duplicate index snapshot: %s", e)
+        self.journal.close()
 
-            file_path = Path('registrations.csv')
-            if not file_path.exists():
-                return {'total': 0, 'today': 0, 'this_week': 0, 'this_month': 0}
+    async def get_registration_stats(self, refresh: bool = False) -> Dict:
+        source = 'sheet' if await self._ensure_connection() else 'journal'
+        if refresh:
+            self.stats.invalidate(full=True)
 
-            now = datetime.now()
-            today = now.date()
-            week_start = today - timedelta(days=today.weekday())
-            month_start = today.replace(day=1)
-
-            stats = {'total': 0, 'today': 0, 'this_week': 0, 'this_month': 0}
-            with open(file_path, 'r', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    try:
-                        reg_date = datetime.strptime(row['registration_date'], '%Y-%m-%d %H:%M:%S').date()
-                        stats['total'] += 1
-                        if reg_date == today:
-                            stats['today'] += 1
-                        if reg_date >= week_start:
-                            stats['this_week'] += 1
-                        if reg_date >= month_start:
-                            stats['this_month'] += 1
-                    except (ValueError, KeyError):
-                        continue
-            return stats
+        try:
+            if (not self.stats.loaded or self.stats.source != source
+                    or (source == 'sheet' and self.stats.partition != self.layout.current_partition())):
+                await self._load_stats(source)
+            elif self.stats.expired and source == 'sheet':
+                await self._catch_up_stats()
         except Exception as e:
-            logger.error(f"Failed to get local stats: {e}")
-            return {'total': 0, 'today': 0, 'this_week': 0, 'this_month': 0}
+            logger.error("Failed to refresh registration stats: %s", e)
+            if not self.stats.loaded:
+                return {'total': 0, 'today': 0, 'this_week': 0, 'this_month': 0}
+        return self.stats.snapshot()
+
+    async def _load_stats(self, source: str):
+        """Cold start: read only the date column once (of the current shards)"""
+        if source == 'sheet':
+            async with self._append_lock:
+                partition, dates, offset, older_rows = await self._run(
+                    'col_values', self.layout.load_dates, datetime.now().date()
+                )
+                pending = await self._run_journal(
+                    'journal_dates', lambda: list(self.journal.iter_dates(unsynced_only=True))
+                )
+                # Row 1 is the header; offset counts it so catch-up starts below it
+                self.stats.load(dates, source, offset=offset, partition=partition, base_total=older_rows)
+                self.stats.add_many(pending)
+        else:
+            dates = await self._run_journal('journal_dates', lambda: list(self.journal.iter_dates()))
+            self.stats.load(dates, source)
+
+    async def _catch_up_stats(self):
+        """Count rows added to the sheet by someone other than this bot"""
+        async with self._append_lock:
+            worksheet = await self._run('open_shard', self.layout.worksheet, self.stats.partition)
+            new_rows = await self._run('get_new_dates', worksheet.get, f'A{self.stats.offset + 1}:A')
+            self.stats.add_many(row[0] for row in new_rows if row)
+            self.stats.offset += len(new_rows)
+            self.stats.invalidate()
@@ -0,0 +1,91 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from telegram.request import HTTPXRequest
+
+ProbeResult = Tuple[int, Dict]
+
+
+class LoopLagMonitor:
+    """How late the event loop wakes a task that sleeps ``interval`` seconds.
+
+    A handler blocking the loop (e.g. a synchronous gspread call) shows up
+    as lag on the next wake-up; the worst lag of the last ``window`` seconds
+    is what liveness is judged on.
+    """
+
+    def __init__(self, interval: float = 0.5, window: float = 10.0):
+        self.interval = interval
+        self._lags: deque = deque(maxlen=max(1, int(window / interval)))
+        self._task: Optional[asyncio.Task] = None
+        self.last_tick: Optional[float] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last_tick = time.monotonic()
+            self._lags.append(max(0.0, self.last_tick - expected))
+
+    @property
+    def lag(self) -> float:
+        """Worst lag within the window, including a wake-up that is overdue right now"""
+        overdue = 0.0
+        if self.last_tick is not None:
+            overdue = max(0.0, time.monotonic() - self.last_tick - self.interval)
+        return max(max(self._lags, default=0.0), overdue)
+
+
+class CachedProbe:
+    """Runs ``probe`` at most once per ``ttl`` seconds; probes in between get the last result"""
+
+    def __init__(self, probe: Callable[[], Awaitable[ProbeResult]], ttl: float = 2.0):
+        self.probe = probe
+        self.ttl = ttl
+        self._result: Optional[ProbeResult] = None
+        self._checked = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> ProbeResult:
+        if self._result is not None and time.monotonic() - self._checked < self.ttl:
+            return self._result
+        async with self._lock:
+            # Concurrent probes wait for the one refresh instead of each running it
+            if self._result is None or time.monotonic() - self._checked >= self.ttl:
+                self._result = await self.probe()
+                self._checked = time.monotonic()
+            return self._result
+
+
+class TrackedRequest(HTTPXRequest):
+    """HTTPXRequest that records when Telegram last answered successfully.
+
+    Used as the Updater's getUpdates request, so ``last_success`` is the
+    time of the last successful poll.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_success: Optional[float] = None
+
+    async def do_request(self, *args, **kwargs) -> Tuple[int, bytes]:
+        code, payload = await super().do_request(*args, **kwargs)
+        if 200 <= code < 300:
+            self.last_success = time.monotonic()
+        return code, payload
+
+
+def seconds_since(moment: Optional[float]) -> Optional[float]:
+    return None if moment is None else round(time.monotonic() - moment, 3)
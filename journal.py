@@ -0,0 +1,351 @@
+import csv
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Same columns, in the same order, as the Registrations worksheet
+COLUMNS = [
+    'registration_date', 'name', 'age', 'phone',
+    'telegram_username', 'telegram_id', 'status', 'comments'
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS registrations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    registration_date TEXT NOT NULL,
+    name TEXT NOT NULL,
+    age TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    telegram_username TEXT,
+    telegram_id TEXT,
+    status TEXT NOT NULL DEFAULT 'Новый',
+    comments TEXT NOT NULL DEFAULT '',
+    synced INTEGER NOT NULL DEFAULT 0,
+    synced_at TEXT,
+    claimed_by TEXT,
+    claimed_until REAL NOT NULL DEFAULT 0,
+    lang TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_registrations_unsynced
+    ON registrations (synced, id);
+CREATE INDEX IF NOT EXISTS idx_registrations_telegram_id
+    ON registrations (telegram_id);
+CREATE TABLE IF NOT EXISTS abandoned_sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ended_at TEXT NOT NULL,
+    telegram_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    duration REAL NOT NULL,
+    idle REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class RegistrationJournal:
+    """Durable local store for registrations (SQLite in WAL mode).
+
+    Every registration is written here first. Rows keep ``synced = 0`` until
+    they have been appended to Google Sheets, so nothing is lost when Sheets
+    is unreachable and nothing is sent twice once it comes back.
+
+    Several bot processes may share one journal. A process claims the rows it
+    is about to send for ``lease`` seconds, so other processes skip them; a
+    claim left by a crashed process simply expires.
+    """
+
+    def __init__(self, path: str = 'registrations.db', lease: float = 120.0):
+        self.path = path
+        self.lease = lease
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # FULL fsyncs the WAL on every commit, so a queued row survives a crash
+        self._conn.execute('PRAGMA synchronous=FULL')
+        self._conn.execute('PRAGMA busy_timeout=5000')
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(registrations)')}
+        if 'claimed_by' not in columns:
+            self._conn.execute('ALTER TABLE registrations ADD COLUMN claimed_by TEXT')
+        if 'claimed_until' not in columns:
+            self._conn.execute('ALTER TABLE registrations ADD COLUMN claimed_until REAL NOT NULL DEFAULT 0')
+        if 'lang' not in columns:
+            self._conn.execute("ALTER TABLE registrations ADD COLUMN lang TEXT NOT NULL DEFAULT ''")
+
+    def add(self, data: Dict) -> int:
+        """Insert a registration, already claimed by this process"""
+        values = [str(data.get(column) or '') for column in COLUMNS]
+        values[COLUMNS.index('status')] = data.get('status') or 'Новый'
+        with self._lock:
+            cursor = self._conn.execute(
+                f"INSERT INTO registrations ({', '.join(COLUMNS)}, lang, claimed_by, claimed_until) "
+                f"VALUES ({', '.join('?' for _ in COLUMNS)}, ?, ?, ?)",
+                values + [data.get('lang') or '', self.owner, time.time() + self.lease]
+            )
+            return cursor.lastrowid
+
+    def add_many(self, rows: List[Dict]) -> int:
+        """Insert unsynced, unclaimed registrations in one transaction (bulk import).
+
+        Rows with both a telegram_id and a registration_date are skipped when
+        that pair is already journaled, so importing the same file twice adds
+        nothing the second time; rows without them cannot be told apart and
+        are always inserted. Rows without a date are stamped with the current
+        time. Returns the number of rows inserted.
+        """
+        date_index = COLUMNS.index('registration_date')
+        id_index = COLUMNS.index('telegram_id')
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        values = []
+        keys = []
+        for data in rows:
+            row = [str(data.get(column) or '') for column in COLUMNS]
+            row[COLUMNS.index('status')] = data.get('status') or 'Новый'
+            keys.append((row[id_index], row[date_index]) if row[id_index] and row[date_index] else None)
+            row[date_index] = row[date_index] or now
+            values.append(row)
+        telegram_ids = list({key[0] for key in keys if key is not None})
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Checked inside the transaction so concurrent imports cannot both insert
+                seen = set()
+                for start in range(0, len(telegram_ids), 500):
+                    chunk = telegram_ids[start:start + 500]
+                    seen.update(self._conn.execute(
+                        "SELECT telegram_id, registration_date FROM registrations "
+                        f"WHERE telegram_id IN ({', '.join('?' for _ in chunk)})",
+                        chunk
+                    ).fetchall())
+                fresh = []
+                for row, key in zip(values, keys):
+                    if key is None or key not in seen:
+                        seen.add(key)
+                        fresh.append(row)
+                values = fresh
+                self._conn.executemany(
+                    f"INSERT INTO registrations ({', '.join(COLUMNS)}) "
+                    f"VALUES ({', '.join('?' for _ in COLUMNS)})",
+                    values
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return len(values)
+
+    def claim_unsynced(self, limit: int, exclude: Iterable[int] = ()) -> List[Tuple[int, Dict]]:
+        """Claim the oldest rows not yet in Google Sheets and not claimed elsewhere.
+
+        Rows in ``exclude`` (already in flight in this process) are skipped.
+        """
+        exclude = set(exclude)
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._conn.execute(
+                    f"SELECT id, {', '.join(COLUMNS)} FROM registrations "
+                    "WHERE synced = 0 AND (claimed_until < ? OR claimed_by = ?) "
+                    "ORDER BY id LIMIT ?",
+                    (now, self.owner, limit + len(exclude))
+                ).fetchall()
+                rows = [row for row in rows if row[0] not in exclude][:limit]
+                self._conn.executemany(
+                    'UPDATE registrations SET claimed_by = ?, claimed_until = ? WHERE id = ?',
+                    [(self.owner, now + self.lease, row[0]) for row in rows]
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return [(row[0], dict(zip(COLUMNS, row[1:]))) for row in rows]
+
+    def release(self, ids: List[int]):
+        """Give up this process's claim so any process can retry the rows"""
+        if not ids:
+            return
+        with self._lock:
+            self._conn.executemany(
+                'UPDATE registrations SET claimed_until = 0 WHERE id = ? AND claimed_by = ?',
+                [(row_id, self.owner) for row_id in ids]
+            )
+
+    def mark_synced(self, ids: List[int]):
+        if not ids:
+            return
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.executemany(
+                    'UPDATE registrations SET synced = 1, synced_at = ? WHERE id = ?',
+                    [(now, row_id) for row_id in ids]
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def update(self, row_id: int, data: Dict) -> Optional[Dict]:
+        """Overwrite a registration's details; returns the previous row or None if missing"""
+        fields = ['registration_date', 'name', 'age', 'phone', 'telegram_username', 'lang']
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute(
+                    f"SELECT {', '.join(COLUMNS)}, synced FROM registrations WHERE id = ?",
+                    (row_id,)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute('ROLLBACK')
+                    return None
+                self._conn.execute(
+                    f"UPDATE registrations SET {', '.join(f'{field} = ?' for field in fields)} WHERE id = ?",
+                    [str(data.get(field) or '') for field in fields] + [row_id]
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        previous = dict(zip(COLUMNS, row[:-1]))
+        previous['synced'] = bool(row[-1])
+        return previous
+
+    def iter_keys(self, after_id: int = 0) -> Iterator[Tuple[int, str, str]]:
+        """(id, phone, telegram_id) of every row after ``after_id``"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, phone, telegram_id FROM registrations WHERE id > ? ORDER BY id',
+                (after_id,)
+            ).fetchall()
+        yield from rows
+
+    def iter_rows(self, batch_size: int = 1000) -> Iterator[Dict]:
+        """Every registration in id order, read one page at a time"""
+        for _, data in self.iter_entries(0, batch_size):
+            yield data
+
+    def iter_entries(self, after_id: int = 0, batch_size: int = 1000) -> Iterator[Tuple[int, Dict]]:
+        """(id, registration) of every row after ``after_id``, one page at a time"""
+        last_id = after_id
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, {', '.join(COLUMNS)} FROM registrations "
+                    "WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row[0], dict(zip(COLUMNS, row[1:]))
+            last_id = rows[-1][0]
+
+    def languages(self, telegram_ids: Iterable[str], chunk_size: int = 500) -> Dict[str, str]:
+        """Language each of ``telegram_ids`` last registered in, where it was recorded"""
+        telegram_ids = list(dict.fromkeys(str(telegram_id) for telegram_id in telegram_ids))
+        languages = {}
+        for start in range(0, len(telegram_ids), chunk_size):
+            chunk = telegram_ids[start:start + chunk_size]
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT telegram_id, lang FROM registrations "
+                    f"WHERE lang != '' AND telegram_id IN ({', '.join('?' for _ in chunk)}) ORDER BY id",
+                    chunk
+                ).fetchall()
+            languages.update(rows)
+        return languages
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                'SELECT COUNT(*) FROM registrations WHERE synced = 0'
+            ).fetchone()[0]
+
+    def iter_dates(self, unsynced_only: bool = False) -> Iterator[str]:
+        query = 'SELECT registration_date FROM registrations'
+        if unsynced_only:
+            query += ' WHERE synced = 0'
+        with self._lock:
+            rows = self._conn.execute(query).fetchall()
+        for (value,) in rows:
+            yield value
+
+    def add_abandoned(self, records: List[Dict]) -> int:
+        """Record conversations ended for inactivity or evicted, for funnel analytics"""
+        ended_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            self._conn.executemany(
+                'INSERT INTO abandoned_sessions (ended_at, telegram_id, state, reason, duration, idle) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(ended_at, str(r['telegram_id']), r['state'], r['reason'], r['duration'], r['idle'])
+                 for r in records]
+            )
+        return len(records)
+
+    def abandoned_counts(self) -> Dict[str, int]:
+        """Abandoned conversations per state they were left in"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT state, COUNT(*) FROM abandoned_sessions GROUP BY state'
+            ).fetchall()
+        return dict(rows)
+
+    def import_csv(self, csv_path: str = 'registrations.csv') -> int:
+        """One-time import of the legacy CSV fallback file as unsynced rows"""
+        file_path = Path(csv_path)
+        if not file_path.exists():
+            return 0
+
+        with open(file_path, 'r', encoding='utf-8') as csvfile:
+            rows = [
+                [row.get(column) or '' for column in COLUMNS]
+                for row in csv.DictReader(csvfile)
+            ]
+
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Checked inside the transaction so concurrent workers import once
+                done = self._conn.execute(
+                    "SELECT value FROM meta WHERE key = 'csv_imported'"
+                ).fetchone()
+                if done:
+                    self._conn.execute('ROLLBACK')
+                    return 0
+                self._conn.executemany(
+                    f"INSERT INTO registrations ({', '.join(COLUMNS)}) "
+                    f"VALUES ({', '.join('?' for _ in COLUMNS)})",
+                    rows
+                )
+                self._conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('csv_imported', ?)",
+                    (datetime.now().isoformat(),)
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        logger.info("Imported %s rows from %s into the local journal", len(rows), csv_path)
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,166 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+# Per-update context, set by the handler wrapper and copied into every task
+# the handler starts, so background work logs with the same identifiers
+telegram_id_var: ContextVar[Optional[int]] = ContextVar('telegram_id', default=None)
+state_var: ContextVar[Optional[str]] = ContextVar('state', default=None)
+correlation_id_var: ContextVar[Optional[str]] = ContextVar('correlation_id', default=None)
+# Set once per tenant in multi-tenant mode, before its bot starts any task
+tenant_var: ContextVar[Optional[str]] = ContextVar('tenant', default=None)
+
+CONTEXT_FIELDS = ('tenant', 'telegram_id', 'state', 'correlation_id')
+
+_listener: Optional[QueueListener] = None
+
+
+@contextmanager
+def log_context(telegram_id: Optional[int] = None, state: Optional[str] = None,
+                correlation_id: Optional[str] = None):
+    tokens = (
+        telegram_id_var.set(telegram_id),
+        state_var.set(state),
+        correlation_id_var.set(correlation_id),
+    )
+    try:
+        yield
+    finally:
+        for var, token in zip((telegram_id_var, state_var, correlation_id_var), tokens):
+            var.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copies the current update's context onto the record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.tenant = tenant_var.get()
+        record.telegram_id = telegram_id_var.get()
+        record.state = state_var.get()
+        record.correlation_id = correlation_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of records logged with ``extra={'sampled': True}``.
+
+    Only INFO and below are sampled; warnings and errors always pass.
+    """
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1.0 or record.levelno > logging.INFO or not getattr(record, 'sampled', False):
+            return True
+        return random.random() < self.rate
+
+
+class _WorkerFilter(logging.Filter):
+    def __init__(self, worker: int):
+        super().__init__()
+        self.worker = worker
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.worker = self.worker
+        return True
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler renders the message before enqueueing it; records here
+    stay in-process, so the message, its args and any traceback are
+    formatted off the event loop.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        worker = getattr(record, 'worker', None)
+        if worker is not None:
+            entry['worker'] = worker
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The original plain format, with the update context appended when set"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        context = ' '.join(
+            f"{field}={getattr(record, field)}" for field in ('worker',) + CONTEXT_FIELDS
+            if getattr(record, field, None) is not None
+        )
+        return f"{text} [{context}]" if context else text
+
+
+def setup_logging(level: str = 'INFO', fmt: str = 'json', sample_rate: float = 1.0,
+                  worker: Optional[int] = None) -> QueueListener:
+    """Route all logging through a queue drained by a background thread.
+
+    Callers only append the record to a queue; formatting and the write to
+    stderr happen on the listener thread.
+    """
+    global _listener
+    stop_logging()
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sample_rate))
+    handler.addFilter(ContextFilter())
+    if worker is not None:
+        handler.addFilter(_WorkerFilter(worker))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    # httpx logs every Bot API request at INFO, i.e. several lines per update
+    logging.getLogger('httpx').setLevel(logging.DEBUG if root.level <= logging.DEBUG else logging.WARNING)
+
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -1,116 +1,158 @@
+import time
+# Taken before the imports below so the startup breakdown includes them
+PROCESS_STARTED = time.perf_counter()
+
 import os
 import asyncio
+import json
 import logging
-from telegram import Update, ReplyKeyboardRemove, InlineKeyboardButton, InlineKeyboardMarkup
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Optional
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update, ReplyKeyboardRemove
 from telegram.ext import (
-    Application, CommandHandler, MessageHandler, CallbackQueryHandler,
-    ConversationHandler, ContextTypes, filters
+    Application, ApplicationHandlerStop, CommandHandler, MessageHandler, CallbackQueryHandler,
+    ConversationHandler, ContextTypes, TypeHandler, filters
 )
 from google_sheets import GoogleSheetsManager
-from validators import validate_age, validate_phone, validate_name
+from health import CachedProbe, LoopLagMonitor, TrackedRequest, seconds_since
+from validators import ValidatorEngine
 from config import Config
+from messages import LANGUAGE_PROMPT, TEXTS, MessageCatalog, load_locales
+from logging_setup import log_context, setup_logging
+from metrics import MetricsRegistry, StartupTimeline
+from persistence import create_persistence
+from notifications import AdminNotifier, format_search_page
+from rate_limiter import OutboundRateLimiter
+from search_index import parse_query
+from sheets_connection import SheetsClientPool
+from sessions import SessionManager, parse_state_timeouts
+from status_sync import StatusSync
+from throttle import SlidingWindowThrottle, parse_state_limits
+from web_server import Request, WebServer
 
-from keep_alive import keep_alive  # импорт в конце
-
-# Запускаем веб-сервер
-keep_alive()
-
-# Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
 # Conversation states
 LANG_CHOICE, NAME, AGE, PHONE, CONFIRM = range(5)
-
-# Multi-language text definitions
-TEXTS = {
-    "ua": {
-        "welcome": "👋 Вітаємо! Я допоможу вам зареєструватися в нашій системі.",
-        "name": "Введіть ваше повне ім'я:",
-        "age": "Скільки вам років? (від 16 до 40):",
-        "phone": "Введіть номер телефону:\n🇺🇦 +380661234567",
-        "invalid_phone": "❌ Невірний формат номера.\nПриклади:\n🇺🇦 +380661234567\nСпробуйте ще раз:",
-        "invalid_age": "❌ Вік має бути числом від 16 до 40 років. Спробуйте ще раз:",
-        "invalid_name": "❌ Ім'я має містити мінімум 2 символи та тільки букви. Спробуйте ще раз:",
-        "age_accepted": "✅ Вік прийнято!",
-        "name_accepted": "✅ Чудово, {name}!",
-        "confirm": "📋 Будь ласка, перевірте введені дані:\n\n👤 Ім'я: {name}\n🎂 Вік: {age} років\n📞 Телефон: {phone}\n\nВсе вірно? Надішліть 'так' для підтвердження або 'ні' для повторного введення.",
-        "confirm_yes": ["так", "yes", "y", "+"],
-        "confirm_no": ["ні", "no", "n", "-"],
-        "success": "✅ Реєстрація успішно завершена!\n\nВаші дані збережено в системі. Найближчим часом з вами зв'яжеться наш HR-менеджер.\n\nДякуємо за реєстрацію! 🎉",
-        "error": "❌ Сталася помилка при збереженні даних. Будь ласка, спробуйте пізніше або зверніться до адміністратора.",
-        "restart": "🔄 Добре, почнемо спочатку.\nВведіть ваше повне ім'я:",
-        "confirm_help": "❓ Будь ласка, дайте відповідь 'так' для підтвердження або 'ні' для повторного введення:",
-        "cancel": "❌ Реєстрацію скасовано.\nЯкщо передумаєте, використовуйте команду /start для початку реєстрації.",
-        "help": "🤖 <b>Бот реєстрації співробітників</b>\n\n<b>Доступні команди:</b>\n/start - Почати реєстрацію\n/cancel - Скасувати поточну реєстрацію\n/help - Показати це повідомлення\n\n<b>Процес реєстрації:</b>\n1️⃣ Оберіть мову\n2️⃣ Введіть повне ім'я\n3️⃣ Вкажіть вік (16-40 років)\n4️⃣ Введіть номер телефону\n5️⃣ Підтвердьте дані\n\n❓ Якщо у вас виникли питання, зверніться до адміністратора."
-    },
-    "ru": {
-        "welcome": "👋 Добро пожаловать! Я помогу вам зарегистрироваться в нашей системе.",
-        "name": "Введите ваше полное имя:",
-        "age": "Сколько вам лет? (от 16 до 40):",
-        "phone": "Введите номер телефона:\n🇺🇦 +380661234567",
-        "invalid_phone": "❌ Некорректный формат номера.\nПримеры:\n🇺🇦 +380661234567\nПопробуйте снова:",
-        "invalid_age": "❌ Возраст должен быть числом от 16 до 40 лет. Попробуйте еще раз:",
-        "invalid_name": "❌ Имя должно содержать минимум 2 символа и только буквы. Попробуйте еще раз:",
-        "age_accepted": "✅ Возраст принят!",
-        "name_accepted": "✅ Отлично, {name}!",
-        "confirm": "📋 Пожалуйста, проверьте введенные данные:\n\n👤 Имя: {name}\n🎂 Возраст: {age} лет\n📞 Телефон: {phone}\n\nВсе верно? Отправьте 'да' для подтверждения или 'нет' для повторного ввода.",
-        "confirm_yes": ["да", "yes", "y", "+"],
-        "confirm_no": ["нет", "no", "n", "-"],
-        "success": "✅ Регистрация успешно завершена!\n\nВаши данные сохранены в системе. В ближайшее время с вами свяжется наш HR-менеджер.\n\nСпасибо за регистрацию! 🎉",
-        "error": "❌ Произошла ошибка при сохранении данных. Пожалуйста, попробуйте позже или обратитесь к администратору.",
-        "restart": "🔄 Хорошо, давайте начнем заново.\nВведите ваше полное имя:",
-        "confirm_help": "❓ Пожалуйста, ответьте 'да' для подтверждения или 'нет' для повторного ввода:",
-        "cancel": "❌ Регистрация отменена.\nЕсли передумаете, используйте команду /start для начала регистрации.",
-        "help": "🤖 <b>Бот регистрации сотрудников</b>\n\n<b>Доступные команды:</b>\n/start - Начать регистрацию\n/cancel - Отменить текущую регистрацию\n/help - Показать это сообщение\n\n<b>Процесс регистрации:</b>\n1️⃣ Выберите язык\n2️⃣ Введите полное имя\n3️⃣ Укажите возраст (16-40 лет)\n4️⃣ Введите номер телефона\n5️⃣ Подтвердите данные\n\n❓ Если у вас возникли вопросы, обратитесь к администратору."
-    },
-    "en": {
-        "welcome": "👋 Welcome! I'll help you register in our system.",
-        "name": "Please enter your full name:",
-        "age": "How old are you? (16 to 70 years):",
-        "phone": "Enter your phone number:\n🇺🇦 +380661234567",
-        "invalid_phone": "❌ Invalid phone format.\nExamples:\n🇺🇦 +380661234567\nTry again:",
-        "invalid_age": "❌ Age must be a number between 16 and 40. Try again:",
-        "invalid_name": "❌ Name must contain at least 2 characters and only letters. Try again:",
-        "age_accepted": "✅ Age accepted!",
-        "name_accepted": "✅ Great, {name}!",
-        "confirm": "📋 Please verify your information:\n\n👤 Name: {name}\n🎂 Age: {age} years\n📞 Phone: {phone}\n\nIs everything correct? Send 'yes' to confirm or 'no' to re-enter.",
-        "confirm_yes": ["yes", "y", "+", "да", "так"],
-        "confirm_no": ["no", "n", "-", "нет", "ні"],
-        "success": "✅ Registration completed successfully!\n\nYour information has been saved. Our HR manager will contact you soon.\n\nThank you for registering! 🎉",
-        "error": "❌ An error occurred while saving data. Please try again later or contact the administrator.",
-        "restart": "🔄 Alright, let's start over.\nEnter your full name:",
-        "confirm_help": "❓ Please answer 'yes' to confirm or 'no' to re-enter:",
-        "cancel": "❌ Registration cancelled.\nIf you change your mind, use /start to begin registration.",
-        "help": "🤖 <b>Worker Registration Bot</b>\n\n<b>Available commands:</b>\n/start - Start registration\n/cancel - Cancel current registration\n/help - Show this message\n\n<b>Registration process:</b>\n1️⃣ Choose language\n2️⃣ Enter full name\n3️⃣ Specify age (16-70 years)\n4️⃣ Enter phone number\n5️⃣ Confirm information\n\n❓ If you have questions, contact the administrator."
-    }
+STATE_NAMES = {
+    LANG_CHOICE: "lang_choice", NAME: "name", AGE: "age", PHONE: "phone", CONFIRM: "confirm",
+    ConversationHandler.END: "end",
 }
 
+SEARCH_PAGE_SIZE = 10
+# Telegram's limit on callback_data
+CALLBACK_DATA_MAX_BYTES = 64
+
 class WorkerRegistrationBot:
-    def __init__(self):
-        self.config = Config()
-        self.sheets_manager = GoogleSheetsManager()
+    def __init__(self, serve_http: bool = True, startup: Optional[StartupTimeline] = None,
+                 sync_statuses: bool = True, config: Optional[Config] = None,
+                 sheets_executor: Optional[ThreadPoolExecutor] = None,
+                 sheets_clients: Optional[SheetsClientPool] = None):
+        self.config = config or Config()
+        self.serve_http = serve_http
+        self.startup = startup or StartupTimeline()
+        self._warm_up_task: Optional[asyncio.Task] = None
+        self.rate_limiter = OutboundRateLimiter(
+            # Telegram's global limit is per bot, so workers split it
+            global_rate=self.config.RATE_LIMIT_GLOBAL / self.config.WORKERS,
+            chat_rate=self.config.RATE_LIMIT_PER_CHAT,
+            chat_burst=self.config.RATE_LIMIT_CHAT_BURST
+        )
+        self.notifier = AdminNotifier(
+            self.config.ADMIN_CHAT_IDS,
+            mode=self.config.NOTIFY_MODE,
+            digest_size=self.config.DIGEST_SIZE,
+            digest_interval=self.config.DIGEST_INTERVAL
+        )
+        self.validators = ValidatorEngine.from_config(self.config)
+        self.throttle = SlidingWindowThrottle(
+            window=self.config.THROTTLE_WINDOW,
+            default_limit=self.config.THROTTLE_LIMIT,
+            state_limits=parse_state_limits(self.config.THROTTLE_STATE_LIMITS)
+        )
+        texts = load_locales(self.config.LOCALES_DIR, TEXTS) if self.config.LOCALES_DIR else TEXTS
+        self.messages = MessageCatalog(
+            texts, constants={'min_age': self.config.MIN_AGE, 'max_age': self.config.MAX_AGE}
+        )
+        self.metrics = MetricsRegistry()
+        self._handler_seconds = self.metrics.histogram(
+            "bot_handler_seconds", "Time spent in each update handler", ("handler",)
+        )
+        self._handler_errors = self.metrics.counter(
+            "bot_handler_errors_total", "Handlers that raised", ("handler",)
+        )
+        self._funnel = self.metrics.counter(
+            "bot_conversation_transitions_total", "Conversations entering each state", ("state",)
+        )
+        self._rejected = self.metrics.counter(
+            "bot_input_rejected_total", "Answers that kept the user in the same state", ("state",)
+        )
+        self._throttled = self.metrics.counter(
+            "bot_updates_throttled_total", "Updates stopped by the per-user flood limit", ("state", "action")
+        )
+        self._registrations = self.metrics.counter(
+            "bot_registrations_total", "Confirmed registrations by outcome", ("result",)
+        )
+        self.metrics.gauge("bot_outbound_queued", "Bot API calls waiting for the rate limiter",
+                           callback=lambda: self.rate_limiter.stats()["queued"])
+        self.metrics.gauge(
+            "bot_admin_notifications", "Admin notifications by delivery result", ("result",),
+            callback=lambda: {("sent",): self.notifier.sent, ("failed",): self.notifier.failed}
+        )
+        self._sessions_ended = self.metrics.counter(
+            "bot_sessions_ended_total", "Conversations dropped for inactivity or evicted", ("state", "reason")
+        )
+        self.metrics.gauge("bot_live_sessions", "Conversations currently tracked",
+                           callback=lambda: self.sessions.live if self.sessions else 0)
+        self.metrics.gauge("bot_session_bytes", "Approximate bytes held per live conversation",
+                           callback=lambda: self.sessions.bytes_per_session() if self.sessions else 0)
+        self.metrics.gauge("bot_startup_phase_seconds", "Duration of each startup phase", ("phase",),
+                           callback=lambda: {(phase,): value for phase, value in self.startup.phases.items()})
+        self.metrics.gauge(
+            "bot_startup_milestone_seconds", "Seconds from process start to each startup milestone", ("milestone",),
+            callback=lambda: {(name,): value for name, value in self.startup.milestones.items()}
+        )
+        self.metrics.gauge(
+            "bot_status_notifications", "Status change messages to candidates by delivery result", ("result",),
+            callback=lambda: {("sent",): self.status_sync.sent, ("failed",): self.status_sync.failed}
+        )
+        self.sessions: Optional[SessionManager] = None
+        self.sheets_manager = GoogleSheetsManager(
+            metrics=self.metrics, env=self.config.env, executor=sheets_executor, clients=sheets_clients
+        )
+        # With several workers only one of them polls the sheet for status changes
+        self.status_sync = StatusSync(
+            self.sheets_manager, self.messages,
+            interval=self.config.STATUS_SYNC_INTERVAL if sync_statuses else 0,
+            concurrency=self.config.STATUS_SYNC_CONCURRENCY,
+            snapshot_path=self.config.STATUS_SNAPSHOT or None
+        )
+        self.web_server = WebServer(port=self.config.PORT)
+        # Probes are answered from cache, so frequent polling costs nothing
+        self.loop_lag = LoopLagMonitor()
+        self.poll_request: Optional[TrackedRequest] = None
+        self._last_webhook_update: Optional[float] = None
+        self._liveness = CachedProbe(self.check_liveness, ttl=self.config.HEALTH_CACHE_TTL)
+        self._readiness = CachedProbe(self.check_readiness, ttl=self.config.HEALTH_CACHE_TTL)
+        self.metrics.gauge("bot_event_loop_lag_seconds", "Worst event loop wake-up delay of the last 10 seconds",
+                           callback=lambda: round(self.loop_lag.lag, 4))
+        self.web_server.route("GET", "/", self.health)
+        self.web_server.route("GET", "/health", self.health)
+        self.web_server.route("GET", "/healthz", self.health)
+        self.web_server.route("GET", "/readyz", self.ready)
+        self.web_server.route("GET", "/metrics", self.metrics_endpoint)
+        self.application = None
         
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Start the registration process with language selection"""
         user = update.effective_user
-        logger.info(f"User {user.id} started registration")
-        
-        keyboard = [
-            [
-                InlineKeyboardButton("🇺🇦 Українська", callback_data='ua'),
-                InlineKeyboardButton("🇬🇧 English", callback_data='en'),
-                InlineKeyboardButton("🇷🇺 Русский", callback_data='ru')
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        logger.info("User %s started registration", user.id, extra={"sampled": True})
         
         await update.message.reply_text(
-            "🌐 Оберіть мову / Choose language / Выберите язык:",
-            reply_markup=reply_markup
+            LANGUAGE_PROMPT,
+            reply_markup=self.messages.language_keyboard
         )
         return LANG_CHOICE
     
@@ -119,26 +161,25 @@ class WorkerRegistrationBot:
         query = update.callback_query
         await query.answer()
         
-        lang = query.data
+        lang = query.data if query.data in self.messages.languages else self.messages.default_lang
         context.user_data['lang'] = lang
         
-        welcome_text = TEXTS[lang]["welcome"]
-        name_text = TEXTS[lang]["name"]
+        welcome_text = self.messages.text(lang, "welcome")
+        name_text = self.messages.text(lang, "name")
         
         await query.edit_message_text(f"{welcome_text}\n\n{name_text}")
         return NAME
     
     def get_text(self, context: ContextTypes.DEFAULT_TYPE, key: str, **kwargs) -> str:
         """Get localized text"""
-        lang = context.user_data.get('lang', 'ru')  # Default to Russian
-        text = TEXTS[lang].get(key, TEXTS['ru'][key])  # Fallback to Russian
-        return text.format(**kwargs) if kwargs else text
+        lang = context.user_data.get('lang', self.messages.default_lang)
+        return self.messages.text(lang, key, **kwargs)
 
     async def get_name(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Collect user's name"""
-        name = update.message.text.strip()
+        valid, name = self.validators.check_name(update.message.text)
         
-        if not validate_name(name):
+        if not valid:
             error_text = self.get_text(context, "invalid_name")
             await update.message.reply_text(error_text)
             return NAME
@@ -152,14 +193,14 @@ class WorkerRegistrationBot:
 
     async def get_age(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Collect user's age"""
-        age_text = update.message.text.strip()
+        valid, age = self.validators.check_age(update.message.text.strip())
         
-        if not validate_age(age_text):
+        if not valid:
             error_text = self.get_text(context, "invalid_age")
             await update.message.reply_text(error_text)
             return AGE
         
-        context.user_data['age'] = age_text
+        context.user_data['age'] = str(age)
         
         age_accepted_text = self.get_text(context, "age_accepted")
         phone_text = self.get_text(context, "phone")
@@ -169,9 +210,9 @@ class WorkerRegistrationBot:
 
     async def get_phone(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Collect user's phone number"""
-        phone = update.message.text.strip()
+        valid, phone = self.validators.check_phone(update.message.text)
         
-        if not validate_phone(phone):
+        if not valid:
             error_text = self.get_text(context, "invalid_phone")
             await update.message.reply_text(error_text)
             return PHONE
@@ -193,8 +234,8 @@ class WorkerRegistrationBot:
         response = update.message.text.strip().lower()
         lang = context.user_data.get('lang', 'ru')
         
-        confirm_yes = TEXTS[lang]["confirm_yes"]
-        confirm_no = TEXTS[lang]["confirm_no"]
+        confirm_yes = self.messages.answers(lang, "confirm_yes")
+        confirm_no = self.messages.answers(lang, "confirm_no")
         
         if response in confirm_yes:
             try:
@@ -208,13 +249,32 @@ class WorkerRegistrationBot:
                     'phone': data['phone'],
                     'telegram_username': user.username or 'N/A',
                     'telegram_id': str(user.id),
+                    'lang': lang,
                     'registration_date': None  # Will be set by sheets manager
                 }
                 
+                policy = self.config.DUPLICATE_POLICY
+                duplicate = None
+                if policy != "allow":
+                    duplicate = await self.sheets_manager.find_duplicate(registration_data)
+                
+                # Merging only ever rewrites the user's own row; a phone that
+                # another Telegram account registered is rejected under both policies
+                if duplicate and (policy == "reject" or duplicate[0] != "telegram_id"):
+                    self._registrations.inc("duplicate")
+                    duplicate_text = self.get_text(context, "duplicate")
+                    await update.message.reply_text(duplicate_text, reply_markup=ReplyKeyboardRemove())
+                    context.user_data.clear()
+                    return ConversationHandler.END
+                
                 # Save to Google Sheets
-                success = await self.sheets_manager.add_registration(registration_data)
+                if duplicate:
+                    success = await self.sheets_manager.merge_registration(duplicate, registration_data)
+                else:
+                    success = await self.sheets_manager.add_registration(registration_data)
                 
                 if success:
+                    self._registrations.inc("merged" if duplicate else "success")
                     success_text = self.get_text(context, "success")
                     await update.message.reply_text(success_text, reply_markup=ReplyKeyboardRemove())
                     
@@ -222,11 +282,13 @@ class WorkerRegistrationBot:
                     await self.notify_admin(context, registration_data, user)
                     
                 else:
+                    self._registrations.inc("error")
                     error_text = self.get_text(context, "error")
                     await update.message.reply_text(error_text)
                 
             except Exception as e:
-                logger.error(f"Error during registration confirmation: {e}")
+                logger.error("Error during registration confirmation: %s", e)
+                self._registrations.inc("error")
                 error_text = self.get_text(context, "error")
                 await update.message.reply_text(error_text)
             
@@ -250,29 +312,8 @@ class WorkerRegistrationBot:
             return CONFIRM
 
     async def notify_admin(self, context: ContextTypes.DEFAULT_TYPE, data: dict, user):
-        """Send notification to admin about new registration"""
-        if not self.config.ADMIN_CHAT_ID:
-            logger.warning("Admin chat ID not configured")
-            return
-            
-        try:
-            admin_message = (
-                "🆕 <b>Новая регистрация сотрудника</b>\n\n"
-                f"👤 <b>Имя:</b> {data['name']}\n"
-                f"🎂 <b>Возраст:</b> {data['age']} лет\n"
-                f"📞 <b>Телефон:</b> {data['phone']}\n"
-                f"📱 <b>Telegram:</b> @{data['telegram_username']} (ID: {data['telegram_id']})\n"
-                f"📅 <b>Дата регистрации:</b> {data.get('registration_date', 'Сейчас')}"
-            )
-            
-            await context.bot.send_message(
-                chat_id=self.config.ADMIN_CHAT_ID,
-                text=admin_message,
-                parse_mode='HTML'
-            )
-            
-        except Exception as e:
-            logger.error(f"Failed to notify admin: {e}")
+        """Notify admins about a new registration without delaying the user"""
+        self.notifier.notify(data)
 
     async def cancel(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Cancel registration process"""
@@ -286,16 +327,24 @@ class WorkerRegistrationBot:
         help_text = self.get_text(context, "help")
         await update.message.reply_text(help_text, parse_mode='HTML')
 
+    async def reject_non_admin(self, update: Update) -> bool:
+        """Answer non-admins with a refusal; returns True if the user is not an admin"""
+        if update.effective_user.id in self.config.ADMIN_CHAT_IDS:
+            return False
+        if update.callback_query:
+            await update.callback_query.answer("❌ Нет прав", show_alert=True)
+        else:
+            await update.message.reply_text("❌ У вас нет прав для выполнения этой команды.")
+        return True
+
     async def admin_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show registration statistics (admin only)"""
-        user_id = update.effective_user.id
-        
-        if str(user_id) != str(self.config.ADMIN_CHAT_ID):
-            await update.message.reply_text("❌ У вас нет прав для выполнения этой команды.")
+        if await self.reject_non_admin(update):
             return
             
         try:
-            stats = await self.sheets_manager.get_registration_stats()
+            refresh = bool(context.args) and context.args[0].lower() == 'refresh'
+            stats = await self.sheets_manager.get_registration_stats(refresh=refresh)
             
             stats_message = (
                 "📊 <b>Статистика регистраций</b>\n\n"
@@ -304,58 +353,467 @@ class WorkerRegistrationBot:
                 f"📅 <b>За эту неделю:</b> {stats.get('this_week', 0)}\n"
                 f"📅 <b>За этот месяц:</b> {stats.get('this_month', 0)}"
             )
+
+            await self.sheets_manager.pending_rows()
+            queue = self.sheets_manager.get_queue_stats()
+            stats_message += (
+                "\n\n📨 <b>Очередь записи:</b> "
+                f"{queue['depth']} в очереди, не синхронизировано {queue['unsynced']}, "
+                f"Sheets: {queue['circuit']}, "
+                f"средний пакет {queue['avg_batch_size']}, "
+                f"сброс p50/p99 {queue['flush_p50_ms']} / {queue['flush_p99_ms']} мс"
+            )
+
+            outbound = self.rate_limiter.stats()
+            stats_message += (
+                "\n\n📤 <b>Исходящие сообщения:</b> "
+                f"{outbound['queued']} в очереди, 429 RetryAfter: {outbound['retry_after']}"
+            )
+            for priority, values in outbound['wait'].items():
+                stats_message += f"\n• ожидание ({priority}) p50/p99: {values['p50_ms']} / {values['p99_ms']} мс"
+
+            notifications = self.notifier.stats()
+            stats_message += (
+                f"\n\n🔔 <b>Уведомления ({notifications['mode']}):</b> "
+                f"ожидают {notifications['pending']}, отправлено {notifications['sent']}, "
+                f"ошибок {notifications['failed']}"
+            )
+
+            abandoned = await self.sheets_manager.get_abandoned_stats()
+            if self.sessions is not None:
+                stats_message += (
+                    f"\n\n💬 <b>Диалоги:</b> активных {self.sessions.live}, "
+                    f"~{self.sessions.bytes_per_session():.0f} байт каждый"
+                )
+                if abandoned:
+                    stats_message += "\n• брошены на шаге: " + ", ".join(
+                        f"{state} {count}" for state, count in sorted(abandoned.items())
+                    )
+
+            latency = self.sheets_manager.get_latency_stats()
+            if latency:
+                stats_message += "\n\n⏱ <b>Google Sheets (p50 / p99):</b>"
+                for operation, values in latency.items():
+                    stats_message += (
+                        f"\n• {operation}: {values['p50_ms']} / {values['p99_ms']} мс"
+                        f" ({values['count']} вызовов, ошибок: {values['errors']})"
+                    )
             
             await update.message.reply_text(stats_message, parse_mode='HTML')
             
         except Exception as e:
-            logger.error(f"Error getting admin stats: {e}")
+            logger.error("Error getting admin stats: %s", e)
             await update.message.reply_text(
                 "❌ Ошибка при получении статистики."
             )
 
+    async def admin_find(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Search registrations by name prefix, phone or date range (admin only)"""
+        if await self.reject_non_admin(update):
+            return
+        query = " ".join(context.args)
+        if not query:
+            await update.message.reply_text(
+                "Использование:\n/find Иван — по началу имени или фамилии\n"
+                "/find +380501234567 — по телефону\n"
+                "/find 2024-05-01 или /find 2024-05-01..2024-05-31 — по датам"
+            )
+            return
+        text, keyboard = await self.search_page(query, 0)
+        await update.message.reply_text(text, parse_mode='HTML', reply_markup=keyboard)
+
+    async def admin_list(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """List the most recent registrations (admin only)"""
+        if await self.reject_non_admin(update):
+            return
+        text, keyboard = await self.search_page(None, 0)
+        await update.message.reply_text(text, parse_mode='HTML', reply_markup=keyboard)
+
+    async def admin_page(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Turn a page of /find or /list results"""
+        if await self.reject_non_admin(update):
+            return
+        callback = update.callback_query
+        _, page, query = callback.data.split(":", 2)
+        text, keyboard = await self.search_page(query or None, int(page))
+        await callback.answer()
+        await callback.edit_message_text(text, parse_mode='HTML', reply_markup=keyboard)
+
+    async def search_page(self, query: Optional[str], page: int):
+        """Text and navigation keyboard for one page of results; None lists recent registrations"""
+        index = await self.sheets_manager.get_search_index()
+        if query is None:
+            title = "Последние регистрации"
+            total = len(index)
+            pages = max(1, -(-total // SEARCH_PAGE_SIZE))
+            page = min(max(page, 0), pages - 1)
+            records = [index.record(row_id) for row_id in index.recent(page * SEARCH_PAGE_SIZE, SEARCH_PAGE_SIZE)]
+        else:
+            kind, value = parse_query(query)
+            row_ids = index.query(kind, value)
+            title = f"Поиск: {value} ({len(row_ids)})"
+            pages = max(1, -(-len(row_ids) // SEARCH_PAGE_SIZE))
+            page = min(max(page, 0), pages - 1)
+            records = index.page(row_ids, page, SEARCH_PAGE_SIZE)
+
+        text = format_search_page(title, records, page * SEARCH_PAGE_SIZE + 1, page, pages)
+        buttons = []
+        for label, target in (("◀️", page - 1), ("▶️", page + 1)):
+            data = f"page:{target}:{query or ''}"
+            # Queries too long for callback_data only get their first page
+            if 0 <= target < pages and len(data.encode()) <= CALLBACK_DATA_MAX_BYTES:
+                buttons.append(InlineKeyboardButton(label, callback_data=data))
+        return text, InlineKeyboardMarkup([buttons]) if buttons else None
+
+    async def throttle_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Stop updates from users over their flood limit before any handler runs"""
+        user = update.effective_user
+        if user is None or user.id in self.config.ADMIN_CHAT_IDS:
+            return
+        state = None
+        if self.sessions is not None and update.effective_chat is not None:
+            state = self.sessions.state_of((update.effective_chat.id, user.id))
+        state = state or "idle"
+        if self.throttle.allow(user.id, state):
+            return
+
+        reply = self.config.THROTTLE_MODE == "reply" and self.throttle.first_rejection(user.id)
+        self._throttled.inc(state, "replied" if reply else "dropped")
+        if reply:
+            text = self.get_text(context, "throttled")
+            if update.callback_query:
+                await update.callback_query.answer(text)
+            elif update.effective_message:
+                await update.effective_message.reply_text(text)
+        raise ApplicationHandlerStop
+
+    def instrument(self, callback, state: Optional[int] = None):
+        """Wrap a handler to record its latency, errors and conversation transitions.
+
+        Log records emitted while it runs, including from tasks it starts,
+        carry the user's Telegram id, the conversation state and the update id.
+        """
+        name = callback.__name__
+
+        state_name = STATE_NAMES.get(state)
+
+        @wraps(callback)
+        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            started = time.perf_counter()
+            user = update.effective_user
+            try:
+                with log_context(user.id if user else None, state_name, str(update.update_id)):
+                    result = await callback(update, context)
+            except Exception:
+                self._handler_errors.inc(name)
+                raise
+            finally:
+                self._handler_seconds.observe(time.perf_counter() - started, name)
+            self.startup.milestone("first_reply")
+            if result is not None:
+                self.track_session(update, result)
+                if result == state:
+                    self._rejected.inc(STATE_NAMES[state])
+                else:
+                    self._funnel.inc(STATE_NAMES.get(result, str(result)))
+            return result
+
+        return wrapper
+
+    def track_session(self, update: Update, result: int):
+        if self.sessions is None or update.effective_chat is None or update.effective_user is None:
+            return
+        key = (update.effective_chat.id, update.effective_user.id)
+        if result == ConversationHandler.END:
+            self.sessions.finish(key)
+        else:
+            self.sessions.touch(key, STATE_NAMES[result])
+
+    def usage(self) -> dict:
+        """Work done and memory held by this bot, for per-tenant accounting"""
+        handled, handler_seconds = self._handler_seconds.totals().get("", (0, 0.0))
+        storage = self.metrics.get("storage_call_seconds").totals("backend")
+        sheets_calls, sheets_seconds = storage.get("sheets", (0, 0.0))
+        journal_calls, journal_seconds = storage.get("journal", (0, 0.0))
+        live = self.sessions.live if self.sessions else 0
+        return {
+            "updates_handled": handled,
+            "handler_seconds": round(handler_seconds, 3),
+            "sheets_calls": sheets_calls,
+            "sheets_seconds": round(sheets_seconds, 3),
+            "journal_calls": journal_calls,
+            "journal_seconds": round(journal_seconds, 3),
+            "outbound_queued": self.rate_limiter.stats()["queued"],
+            "live_sessions": live,
+            "session_bytes": round(live * self.sessions.bytes_per_session()) if live else 0,
+            "unsynced_rows": self.sheets_manager.unsynced,
+            "status_notifications": self.status_sync.sent,
+        }
+
+    async def record_expired_sessions(self, records: list):
+        for record in records:
+            self._sessions_ended.inc(record["state"], record["reason"])
+        await self.sheets_manager.record_abandoned(records)
+
     def setup_handlers(self, app: Application):
         """Setup all bot handlers"""
+        text_input = filters.TEXT & ~filters.COMMAND
         # Conversation handler for registration
         conv_handler = ConversationHandler(
+            name="registration",
+            persistent=app.persistence is not None,
             entry_points=[
-                CommandHandler("start", self.start),
-                CommandHandler("register", self.start)
+                CommandHandler("start", self.instrument(self.start)),
+                CommandHandler("register", self.instrument(self.start))
             ],
             states={
-                LANG_CHOICE: [CallbackQueryHandler(self.lang_choice)],
-                NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.get_name)],
-                AGE: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.get_age)],
-                PHONE: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.get_phone)],
-                CONFIRM: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.confirm_registration)],
+                LANG_CHOICE: [CallbackQueryHandler(self.instrument(self.lang_choice, LANG_CHOICE))],
+                NAME: [MessageHandler(text_input, self.instrument(self.get_name, NAME))],
+                AGE: [MessageHandler(text_input, self.instrument(self.get_age, AGE))],
+                PHONE: [MessageHandler(text_input, self.instrument(self.get_phone, PHONE))],
+                CONFIRM: [MessageHandler(text_input, self.instrument(self.confirm_registration, CONFIRM))],
             },
-            fallbacks=[CommandHandler("cancel", self.cancel)],
+            fallbacks=[CommandHandler("cancel", self.instrument(self.cancel))],
+        )
+        
+        self.sessions = SessionManager(
+            conv_handler,
+            default_timeout=self.config.SESSION_TIMEOUT,
+            state_timeouts=parse_state_timeouts(self.config.SESSION_STATE_TIMEOUTS),
+            max_sessions=self.config.SESSION_MAX,
+            sweep_interval=self.config.SESSION_SWEEP_INTERVAL,
+            on_expired=self.record_expired_sessions,
+            state_names=STATE_NAMES
         )
         
-        # Add handlers
+        # Runs before every other handler; raising ApplicationHandlerStop
+        # there keeps a flood from reaching them
+        app.add_handler(TypeHandler(Update, self.throttle_update), group=-1)
+
+        # Add handlers; result pages come first so the conversation's
+        # language buttons never swallow their callbacks
+        app.add_handler(CallbackQueryHandler(self.instrument(self.admin_page), pattern=r"^page:"))
         app.add_handler(conv_handler)
-        app.add_handler(CommandHandler("help", self.help_command))
-        app.add_handler(CommandHandler("stats", self.admin_stats))
+        app.add_handler(CommandHandler("help", self.instrument(self.help_command)))
+        app.add_handler(CommandHandler("stats", self.instrument(self.admin_stats)))
+        app.add_handler(CommandHandler("find", self.instrument(self.admin_find)))
+        app.add_handler(CommandHandler("list", self.instrument(self.admin_list)))
+
+    def build_application(self, base_url: Optional[str] = None, external_updates: bool = False) -> Application:
+        """Create the Application for the configured run mode.
+
+        ``external_updates`` builds it without an Updater, for when updates are
+        fed into ``update_queue`` by someone else (webhook or worker process).
+        """
+        base_url = base_url or self.config.TELEGRAM_API_URL
+        builder = (
+            Application.builder()
+            .token(self.config.BOT_TOKEN)
+            .post_init(self.post_init)
+            .post_stop(self.post_stop)
+            .post_shutdown(self.shutdown)
+            .rate_limiter(self.rate_limiter)
+        )
+        if base_url:
+            builder = builder.base_url(base_url)
+        persistence = create_persistence(
+            self.config.PERSISTENCE_BACKEND,
+            self.config.PERSISTENCE_PATH,
+            self.config.PERSISTENCE_INTERVAL
+        )
+        if persistence is not None:
+            builder = builder.persistence(persistence)
+        if external_updates or self.config.RUN_MODE == "webhook":
+            # Updates arrive through our own web server or a dispatcher, not the Updater
+            builder = builder.updater(None)
+        else:
+            # Same pool size as PTB's default getUpdates request; readiness reads its last success
+            self.poll_request = TrackedRequest(connection_pool_size=1)
+            builder = builder.get_updates_request(self.poll_request)
+        app = builder.build()
+        self.setup_handlers(app)
+        return app
+
+    async def health(self, request: Request):
+        """Liveness: fails when the event loop has been blocked"""
+        status, body = await self._liveness.get()
+        return status, "application/json", json.dumps(body).encode()
+
+    async def ready(self, request: Request):
+        """Readiness: fails until the bot runs and while Telegram polling is stalled"""
+        status, body = await self._readiness.get()
+        return status, "application/json", json.dumps(body).encode()
+
+    async def check_liveness(self):
+        lag = self.loop_lag.lag
+        alive = lag < self.config.HEALTH_MAX_LOOP_LAG
+        return (200 if alive else 503), {"status": "ok" if alive else "stalled", "loop_lag_seconds": round(lag, 3)}
+
+    async def check_readiness(self):
+        manager = self.sheets_manager
+        try:
+            unsynced = await manager.pending_rows()
+        except Exception as e:
+            logger.error("Readiness check could not count unsynced rows: %s", e)
+            unsynced = None
+        polling = self.poll_request is not None
+        last_contact = self.poll_request.last_success if polling else self._last_webhook_update
+
+        problems = []
+        if self.application is None or not self.application.running:
+            problems.append("not started")
+        if polling and (last_contact is None or seconds_since(last_contact) > self.config.READY_MAX_POLL_AGE):
+            problems.append("telegram polling stalled")
+        # Registrations still reach the journal while Sheets is down, so that is degraded, not unready
+        sheets_down = manager.connection.configured and (
+            manager.breaker.state != "closed" or not manager.connection.ready
+        )
+        status = "not_ready" if problems else "degraded" if sheets_down else "ready"
+        return (503 if problems else 200), {
+            "status": status,
+            "problems": problems,
+            "sheets": {
+                "configured": manager.connection.configured,
+                "connected": manager.connection.ready,
+                "circuit": manager.breaker.state,
+            },
+            "queue_depth": manager.queue.depth,
+            "unsynced_rows": unsynced,
+            "telegram": {
+                "mode": "polling" if polling else "webhook",
+                "last_success_seconds_ago": seconds_since(last_contact),
+            },
+            "loop_lag_seconds": round(self.loop_lag.lag, 3),
+        }
+
+    async def metrics_endpoint(self, request: Request):
+        """Prometheus scrape endpoint"""
+        return 200, "text/plain; version=0.0.4; charset=utf-8", self.metrics.render().encode()
+
+    async def telegram_webhook(self, request: Request):
+        """Receive an update pushed by Telegram in webhook mode"""
+        secret = self.config.WEBHOOK_SECRET
+        if secret and request.headers.get("x-telegram-bot-api-secret-token") != secret:
+            return 403, "text/plain", b""
+        try:
+            update = Update.de_json(json.loads(request.body), self.application.bot)
+        except (ValueError, TypeError) as e:
+            logger.error("Invalid webhook payload: %s", e)
+            return 400, "text/plain", b""
+        self._last_webhook_update = time.monotonic()
+        await self.application.update_queue.put(update)
+        return 200, "text/plain", b""
+
+    async def post_init(self, app: Application):
+        """Start the web server, background replay of journaled registrations and Sheets warm-up"""
+        self.startup.mark("initialize")
+        self.application = app
+        self.loop_lag.start()
+        self.notifier.start(app.bot)
+        if self.serve_http:
+            if self.config.RUN_MODE == "webhook":
+                self.web_server.route("POST", self.config.WEBHOOK_PATH, self.telegram_webhook)
+            await self.web_server.start()
+        await self.sheets_manager.start()
+        if self.sessions is not None:
+            self.sessions.start(app)
+        self.status_sync.start(app.bot)
+        # Not awaited: updates are served while Sheets connects
+        self._warm_up_task = asyncio.create_task(self.warm_up())
+        self.startup.mark("post_init")
+        logger.info("Bot ready in %.3fs (%s)", self.startup.total, self.startup.summary())
+
+    async def warm_up(self):
+        if await self.sheets_manager.warm_up():
+            self.startup.milestone("sheets_ready")
+            logger.info("Google Sheets ready %.3fs after process start", self.startup.milestones["sheets_ready"])
+
+    async def post_stop(self, app: Application):
+        """Finish outgoing messages while the bot and its rate limiter still run"""
+        await self.status_sync.stop()
+        await self.notifier.close()
+
+    async def shutdown(self, app: Application):
+        """Flush queued registrations before the process exits"""
+        if self._warm_up_task is not None:
+            self._warm_up_task.cancel()
+            await asyncio.gather(self._warm_up_task, return_exceptions=True)
+        if self.serve_http:
+            await self.web_server.stop()
+        if self.sessions is not None:
+            await self.sessions.stop()
+        await self.loop_lag.stop()
+        await self.sheets_manager.close()
+
+    async def serve_webhook(self, app: Application):
+        """Run the application on webhook updates until SIGINT/SIGTERM"""
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError:
+                pass
+
+        try:
+            await self.start_webhook(app)
+            await stop.wait()
+        finally:
+            await self.stop_webhook(app)
+
+    async def start_webhook(self, app: Application):
+        await app.initialize()
+        await self.post_init(app)
+        await app.bot.set_webhook(
+            url=self.config.WEBHOOK_URL + self.config.WEBHOOK_PATH,
+            secret_token=self.config.WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES
+        )
+        await app.start()
+
+    async def stop_webhook(self, app: Application):
+        if app.running:
+            await app.stop()
+        await self.post_stop(app)
+        await self.shutdown(app)
+        await app.shutdown()
 
 def main():
     """Main function to run the bot"""
     try:
+        startup = StartupTimeline(PROCESS_STARTED)
+        startup.mark("imports")
+        tenants_file = os.getenv("TENANTS_FILE")
+        if tenants_file:
+            from tenants import run_tenants
+            run_tenants(tenants_file)
+            return
+        config = Config()
+        setup_logging(config.LOG_LEVEL, config.LOG_FORMAT, config.LOG_SAMPLE_RATE)
+        startup.mark("config")
+        if config.WORKERS > 1:
+            from workers import run_workers
+            run_workers(config)
+            return
+
         # Initialize bot
-        bot = WorkerRegistrationBot()
+        bot = WorkerRegistrationBot(startup=startup, config=config)
         
         # Create application
-        app = Application.builder().token(bot.config.BOT_TOKEN).build()
-        
-        # Setup handlers
-        bot.setup_handlers(app)
+        app = bot.build_application()
+        startup.mark("build")
         
         logger.info("Worker Registration Bot is starting...")
         print("🤖 Worker Registration Bot is running...")
         
         # Run the bot
-        app.run_polling(drop_pending_updates=True)
+        if bot.config.RUN_MODE == "webhook":
+            asyncio.run(bot.serve_webhook(app))
+        else:
+            app.run_polling(drop_pending_updates=True)
         
     except Exception as e:
-        logger.error(f"Failed to start bot: {e}")
+        logger.error("Failed to start bot: %s", e)
         print(f"❌ Error starting bot: {e}")
 
 if __name__ == "__main__":
@@ -0,0 +1,205 @@
+import json
+import logging
+import os
+from string import Formatter
+from types import MappingProxyType
+from typing import Dict, FrozenSet, List, Mapping, Optional, Set
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LANG = "ru"
+
+LANGUAGE_PROMPT = "🌐 Оберіть мову / Choose language / Выберите язык:"
+
+# Button label per language, in picker order
+LANGUAGE_NAMES = {
+    "ua": "🇺🇦 Українська",
+    "en": "🇬🇧 English",
+    "ru": "🇷🇺 Русский",
+}
+
+# Keys holding lists of accepted answers rather than message text
+ANSWER_KEYS = ("confirm_yes", "confirm_no")
+
+# Multi-language text definitions
+TEXTS = {
+    "ua": {
+        "welcome": "👋 Вітаємо! Я допоможу вам зареєструватися в нашій системі.",
+        "name": "Введіть ваше повне ім'я:",
+        "age": "Скільки вам років? (від {min_age} до {max_age}):",
+        "phone": "Введіть номер телефону:\n🇺🇦 +380661234567",
+        "invalid_phone": "❌ Невірний формат номера.\nПриклади:\n🇺🇦 +380661234567\nСпробуйте ще раз:",
+        "invalid_age": "❌ Вік має бути числом від {min_age} до {max_age} років. Спробуйте ще раз:",
+        "invalid_name": "❌ Ім'я має містити мінімум 2 символи та тільки букви. Спробуйте ще раз:",
+        "age_accepted": "✅ Вік прийнято!",
+        "name_accepted": "✅ Чудово, {name}!",
+        "confirm": "📋 Будь ласка, перевірте введені дані:\n\n👤 Ім'я: {name}\n🎂 Вік: {age} років\n📞 Телефон: {phone}\n\nВсе вірно? Надішліть 'так' для підтвердження або 'ні' для повторного введення.",
+        "confirm_yes": ["так", "yes", "y", "+"],
+        "confirm_no": ["ні", "no", "n", "-"],
+        "success": "✅ Реєстрація успішно завершена!\n\nВаші дані збережено в системі. Найближчим часом з вами зв'яжеться наш HR-менеджер.\n\nДякуємо за реєстрацію! 🎉",
+        "duplicate": "ℹ️ Ви вже зареєстровані. Якщо потрібно змінити дані, зверніться до адміністратора.",
+        "throttled": "⏳ Забагато повідомлень. Будь ласка, зачекайте хвилину.",
+        "status_changed": "📌 Статус вашої заявки змінено: {status}",
+        "status_comment": "💬 Коментар: {comment}",
+        "error": "❌ Сталася помилка при збереженні даних. Будь ласка, спробуйте пізніше або зверніться до адміністратора.",
+        "restart": "🔄 Добре, почнемо спочатку.\nВведіть ваше повне ім'я:",
+        "confirm_help": "❓ Будь ласка, дайте відповідь 'так' для підтвердження або 'ні' для повторного введення:",
+        "cancel": "❌ Реєстрацію скасовано.\nЯкщо передумаєте, використовуйте команду /start для початку реєстрації.",
+        "help": "🤖 <b>Бот реєстрації співробітників</b>\n\n<b>Доступні команди:</b>\n/start - Почати реєстрацію\n/cancel - Скасувати поточну реєстрацію\n/help - Показати це повідомлення\n\n<b>Процес реєстрації:</b>\n1️⃣ Оберіть мову\n2️⃣ Введіть повне ім'я\n3️⃣ Вкажіть вік ({min_age}-{max_age} років)\n4️⃣ Введіть номер телефону\n5️⃣ Підтвердьте дані\n\n❓ Якщо у вас виникли питання, зверніться до адміністратора."
+    },
+    "ru": {
+        "welcome": "👋 Добро пожаловать! Я помогу вам зарегистрироваться в нашей системе.",
+        "name": "Введите ваше полное имя:",
+        "age": "Сколько вам лет? (от {min_age} до {max_age}):",
+        "phone": "Введите номер телефона:\n🇺🇦 +380661234567",
+        "invalid_phone": "❌ Некорректный формат номера.\nПримеры:\n🇺🇦 +380661234567\nПопробуйте снова:",
+        "invalid_age": "❌ Возраст должен быть числом от {min_age} до {max_age} лет. Попробуйте еще раз:",
+        "invalid_name": "❌ Имя должно содержать минимум 2 символа и только буквы. Попробуйте еще раз:",
+        "age_accepted": "✅ Возраст принят!",
+        "name_accepted": "✅ Отлично, {name}!",
+        "confirm": "📋 Пожалуйста, проверьте введенные данные:\n\n👤 Имя: {name}\n🎂 Возраст: {age} лет\n📞 Телефон: {phone}\n\nВсе верно? Отправьте 'да' для подтверждения или 'нет' для повторного ввода.",
+        "confirm_yes": ["да", "yes", "y", "+"],
+        "confirm_no": ["нет", "no", "n", "-"],
+        "success": "✅ Регистрация успешно завершена!\n\nВаши данные сохранены в системе. В ближайшее время с вами свяжется наш HR-менеджер.\n\nСпасибо за регистрацию! 🎉",
+        "duplicate": "ℹ️ Вы уже зарегистрированы. Если нужно изменить данные, обратитесь к администратору.",
+        "throttled": "⏳ Слишком много сообщений. Пожалуйста, подождите минуту.",
+        "status_changed": "📌 Статус вашей заявки изменён: {status}",
+        "status_comment": "💬 Комментарий: {comment}",
+        "error": "❌ Произошла ошибка при сохранении данных. Пожалуйста, попробуйте позже или обратитесь к администратору.",
+        "restart": "🔄 Хорошо, давайте начнем заново.\nВведите ваше полное имя:",
+        "confirm_help": "❓ Пожалуйста, ответьте 'да' для подтверждения или 'нет' для повторного ввода:",
+        "cancel": "❌ Регистрация отменена.\nЕсли передумаете, используйте команду /start для начала регистрации.",
+        "help": "🤖 <b>Бот регистрации сотрудников</b>\n\n<b>Доступные команды:</b>\n/start - Начать регистрацию\n/cancel - Отменить текущую регистрацию\n/help - Показать это сообщение\n\n<b>Процесс регистрации:</b>\n1️⃣ Выберите язык\n2️⃣ Введите полное имя\n3️⃣ Укажите возраст ({min_age}-{max_age} лет)\n4️⃣ Введите номер телефона\n5️⃣ Подтвердите данные\n\n❓ Если у вас возникли вопросы, обратитесь к администратору."
+    },
+    "en": {
+        "welcome": "👋 Welcome! I'll help you register in our system.",
+        "name": "Please enter your full name:",
+        "age": "How old are you? ({min_age} to {max_age} years):",
+        "phone": "Enter your phone number:\n🇺🇦 +380661234567",
+        "invalid_phone": "❌ Invalid phone format.\nExamples:\n🇺🇦 +380661234567\nTry again:",
+        "invalid_age": "❌ Age must be a number between {min_age} and {max_age}. Try again:",
+        "invalid_name": "❌ Name must contain at least 2 characters and only letters. Try again:",
+        "age_accepted": "✅ Age accepted!",
+        "name_accepted": "✅ Great, {name}!",
+        "confirm": "📋 Please verify your information:\n\n👤 Name: {name}\n🎂 Age: {age} years\n📞 Phone: {phone}\n\nIs everything correct? Send 'yes' to confirm or 'no' to re-enter.",
+        "confirm_yes": ["yes", "y", "+", "да", "так"],
+        "confirm_no": ["no", "n", "-", "нет", "ні"],
+        "success": "✅ Registration completed successfully!\n\nYour information has been saved. Our HR manager will contact you soon.\n\nThank you for registering! 🎉",
+        "duplicate": "ℹ️ You are already registered. To change your details, please contact the administrator.",
+        "throttled": "⏳ Too many messages. Please wait a minute.",
+        "status_changed": "📌 Your application status has changed: {status}",
+        "status_comment": "💬 Comment: {comment}",
+        "error": "❌ An error occurred while saving data. Please try again later or contact the administrator.",
+        "restart": "🔄 Alright, let's start over.\nEnter your full name:",
+        "confirm_help": "❓ Please answer 'yes' to confirm or 'no' to re-enter:",
+        "cancel": "❌ Registration cancelled.\nIf you change your mind, use /start to begin registration.",
+        "help": "🤖 <b>Worker Registration Bot</b>\n\n<b>Available commands:</b>\n/start - Start registration\n/cancel - Cancel current registration\n/help - Show this message\n\n<b>Registration process:</b>\n1️⃣ Choose language\n2️⃣ Enter full name\n3️⃣ Specify age ({min_age}-{max_age} years)\n4️⃣ Enter phone number\n5️⃣ Confirm information\n\n❓ If you have questions, contact the administrator."
+    }
+}
+
+
+def placeholders(text: str) -> Set[str]:
+    return {field for _, field, _, _ in Formatter().parse(text) if field}
+
+
+def load_locales(locales_dir: str, texts: Dict) -> Dict:
+    """Merge ``<lang>.json`` files from ``locales_dir`` over the built-in texts.
+
+    A file may override some keys of an existing language or add a new one;
+    an optional ``language_name`` key sets its picker button label.
+    """
+    merged = {lang: dict(table) for lang, table in texts.items()}
+    for filename in sorted(os.listdir(locales_dir)):
+        lang, extension = os.path.splitext(filename)
+        if extension != ".json":
+            continue
+        with open(os.path.join(locales_dir, filename), "r", encoding="utf-8") as f:
+            merged.setdefault(lang, {}).update(json.load(f))
+    return merged
+
+
+def validate_texts(texts: Dict, default_lang: str = DEFAULT_LANG) -> None:
+    """Every language must define every key with the same placeholders"""
+    reference = texts[default_lang]
+    problems = []
+    for lang, table in texts.items():
+        for key, value in reference.items():
+            if key not in table:
+                problems.append(f"{lang}: missing '{key}'")
+            elif key in ANSWER_KEYS:
+                if not isinstance(table[key], list) or not all(isinstance(item, str) for item in table[key]):
+                    problems.append(f"{lang}: '{key}' must be a list of strings")
+            elif placeholders(table[key]) != placeholders(value):
+                problems.append(
+                    f"{lang}: '{key}' placeholders {sorted(placeholders(table[key]))} "
+                    f"!= {sorted(placeholders(value))}"
+                )
+        for key in table.keys() - reference.keys() - {"language_name"}:
+            problems.append(f"{lang}: unknown key '{key}'")
+    if problems:
+        raise ValueError("Invalid message catalog:\n" + "\n".join(problems))
+
+
+class MessageCatalog:
+    """Localized texts compiled once at startup.
+
+    Per-language tables are read-only mappings. Texts whose placeholders are
+    all ``constants`` (e.g. the configured age range) are rendered up front,
+    so most lookups return a finished string; the rest are formatted with the
+    caller's values. Answer lists become frozensets for O(1) matching.
+    """
+
+    def __init__(self, texts: Dict = None, constants: Optional[Dict] = None,
+                 default_lang: str = DEFAULT_LANG):
+        texts = TEXTS if texts is None else texts
+        validate_texts(texts, default_lang)
+        constants = constants or {}
+        self.default_lang = default_lang
+        self.constants = MappingProxyType(dict(constants))
+
+        tables = {}
+        answers = {}
+        for lang, table in texts.items():
+            rendered = {}
+            for key, value in table.items():
+                if key in ANSWER_KEYS:
+                    answers[(lang, key)] = frozenset(item.lower() for item in value)
+                elif key != "language_name":
+                    fields = placeholders(value)
+                    rendered[key] = value.format(**constants) if fields and fields <= constants.keys() else value
+            tables[lang] = MappingProxyType(rendered)
+        self._tables: Mapping[str, Mapping[str, str]] = MappingProxyType(tables)
+        self._answers: Mapping = MappingProxyType(answers)
+
+        names = dict(LANGUAGE_NAMES)
+        for lang, table in texts.items():
+            names.setdefault(lang, table.get("language_name", lang))
+            if "language_name" in table:
+                names[lang] = table["language_name"]
+        self.language_names = MappingProxyType({lang: names[lang] for lang in names if lang in tables})
+        self.language_keyboard = InlineKeyboardMarkup([[
+            InlineKeyboardButton(label, callback_data=lang)
+            for lang, label in self.language_names.items()
+        ]])
+
+    @property
+    def languages(self) -> List[str]:
+        return list(self._tables)
+
+    def table(self, lang: str) -> Mapping[str, str]:
+        return self._tables.get(lang) or self._tables[self.default_lang]
+
+    def text(self, lang: str, key: str, **kwargs) -> str:
+        text = self.table(lang)[key]
+        if kwargs:
+            return text.format(**self.constants, **kwargs)
+        return text
+
+    def answers(self, lang: str, key: str) -> FrozenSet[str]:
+        return self._answers.get((lang, key)) or self._answers[(self.default_lang, key)]
+
+
+# Fails at import if a built-in language is missing a key or a placeholder
+validate_texts(TEXTS)
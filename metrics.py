@@ -0,0 +1,227 @@
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyStats:
+    """Rolling latency samples per operation with percentile summaries"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._counts: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+
+    def observe(self, operation: str, seconds: float, error: bool = False):
+        samples = self._samples.get(operation)
+        if samples is None:
+            samples = self._samples[operation] = deque(maxlen=self.window)
+        samples.append(seconds)
+        self._counts[operation] = self._counts.get(operation, 0) + 1
+        if error:
+            self._errors[operation] = self._errors.get(operation, 0) + 1
+
+    def percentile(self, operation: str, q: float) -> float:
+        samples = self._samples.get(operation)
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self) -> Dict[str, Dict]:
+        return {
+            operation: {
+                'count': self._counts.get(operation, 0),
+                'errors': self._errors.get(operation, 0),
+                'p50_ms': round(self.percentile(operation, 0.50) * 1000, 2),
+                'p99_ms': round(self.percentile(operation, 0.99) * 1000, 2),
+            }
+            for operation in self._samples
+        }
+
+
+class StartupTimeline:
+    """Startup broken into consecutive phases, plus milestones since ``started``.
+
+    ``mark`` closes the current phase; ``milestone`` records something that
+    happens alongside the phases, e.g. the background Sheets warm-up or the
+    first reply to a user.
+    """
+
+    def __init__(self, started: Optional[float] = None):
+        self.started = time.perf_counter() if started is None else started
+        self._last = self.started
+        self.phases: Dict[str, float] = {}
+        self.milestones: Dict[str, float] = {}
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases[phase] = now - self._last
+        self._last = now
+
+    def milestone(self, name: str):
+        if name not in self.milestones:
+            self.milestones[name] = time.perf_counter() - self.started
+
+    @property
+    def total(self) -> float:
+        return self._last - self.started
+
+    def summary(self) -> str:
+        return ', '.join(f"{phase} {seconds:.3f}s" for phase, seconds in self.phases.items())
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class CounterMetric(Metric):
+    type = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+            for labels, value in self._values.items()
+        ]
+
+
+class GaugeMetric(Metric):
+    """Gauge set directly or read from ``callback`` at scrape time.
+
+    The callback returns a number, or a mapping of label tuples to numbers.
+    """
+    type = 'gauge'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable] = None):
+        super().__init__(name, help_text, labelnames)
+        self.callback = callback
+        self._values: Dict[Tuple, float] = {}
+
+    def set(self, value: float, *labels):
+        self._values[labels] = value
+
+    def samples(self) -> List[str]:
+        values = self._values
+        if self.callback is not None:
+            result = self.callback()
+            values = result if isinstance(result, dict) else {(): result}
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+            for labels, value in values.items()
+        ]
+
+
+class HistogramMetric(Metric):
+    """Fixed-bucket histogram; observe() is a bisect and two additions"""
+    type = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (last is +Inf), sum]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def count(self, *labels) -> int:
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def totals(self, labelname: Optional[str] = None) -> Dict[str, Tuple[int, float]]:
+        """(count, sum) per value of ``labelname``, or under '' for all label sets together"""
+        position = self.labelnames.index(labelname) if labelname else None
+        totals: Dict[str, Tuple[int, float]] = {}
+        for labels, (counts, total) in self._values.items():
+            key = labels[position] if position is not None else ''
+            count, seconds = totals.get(key, (0, 0.0))
+            totals[key] = (count + sum(counts), seconds + total)
+        return totals
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                label_text = _format_labels(self.labelnames, labels, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{label_text} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {total}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def _get_or_create(self, cls, name: str, help_text: str, labelnames: Sequence[str], **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> CounterMetric:
+        return self._get_or_create(CounterMetric, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+              callback: Optional[Callable] = None) -> GaugeMetric:
+        return self._get_or_create(GaugeMetric, name, help_text, labelnames, callback=callback)
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> HistogramMetric:
+        return self._get_or_create(HistogramMetric, name, help_text, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
@@ -0,0 +1,175 @@
+import asyncio
+import html
+import logging
+from typing import Dict, List, Optional, Set
+
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden
+
+from rate_limiter import PRIORITY_ADMIN
+
+logger = logging.getLogger(__name__)
+
+# Telegram rejects longer messages
+MESSAGE_LIMIT = 4096
+
+
+def format_registration(data: Dict) -> str:
+    return (
+        "🆕 <b>Новая регистрация сотрудника</b>\n\n"
+        f"👤 <b>Имя:</b> {html.escape(str(data['name']))}\n"
+        f"🎂 <b>Возраст:</b> {html.escape(str(data['age']))} лет\n"
+        f"📞 <b>Телефон:</b> {html.escape(str(data['phone']))}\n"
+        f"📱 <b>Telegram:</b> @{html.escape(str(data['telegram_username']))} (ID: {data['telegram_id']})\n"
+        f"📅 <b>Дата регистрации:</b> {data.get('registration_date') or 'Сейчас'}"
+    )
+
+
+def format_digest(batch: List[Dict], limit: int = MESSAGE_LIMIT) -> List[str]:
+    """Digest of ``batch`` as one or more messages, each at most ``limit`` characters"""
+    lines = [
+        f"{number}. {html.escape(str(data['name']))}, {html.escape(str(data['age']))} лет, "
+        f"{html.escape(str(data['phone']))}, @{html.escape(str(data['telegram_username']))} "
+        f"(ID: {data['telegram_id']}) — {data.get('registration_date') or 'сейчас'}"
+        for number, data in enumerate(batch, 1)
+    ]
+    header = f"🆕 <b>Новые регистрации: {len(batch)}</b>\n"
+    messages = []
+    current = [header]
+    size = len(header)
+    for line in lines:
+        if size + 1 + len(line) > limit and len(current) > 1:
+            messages.append("\n".join(current))
+            current = [f"🆕 <b>Новые регистрации ({len(messages) + 1})</b>\n"]
+            size = len(current[0])
+        current.append(line)
+        size += 1 + len(line)
+    messages.append("\n".join(current))
+    return messages
+
+
+def format_search_page(title: str, records: List[Dict], first_number: int, page: int, pages: int) -> str:
+    """One page of /find or /list results"""
+    if not records:
+        return f"🔎 <b>{html.escape(title)}</b>\n\nНичего не найдено."
+    lines = [f"🔎 <b>{html.escape(title)}</b> (стр. {page + 1}/{pages})\n"]
+    for number, data in enumerate(records, first_number):
+        lines.append(
+            f"{number}. {html.escape(str(data['name']))}, {html.escape(str(data['age']))} лет, "
+            f"{html.escape(str(data['phone']))}, @{html.escape(str(data['telegram_username']))} "
+            f"— {data.get('registration_date') or '?'}"
+        )
+    return "\n".join(lines)
+
+
+class AdminNotifier:
+    """Delivers registration notifications to every configured admin.
+
+    In ``immediate`` mode each registration is sent as soon as it arrives. In
+    ``digest`` mode registrations are collected and sent as one summary once
+    ``digest_size`` have accumulated or ``digest_interval`` seconds have passed
+    since the first one; a summary too long for one message is split. Sending
+    always happens in the background, so the user's success reply never
+    waits for it, and a failed send is retried ``retries`` times with backoff.
+    """
+
+    def __init__(self, admin_ids: List[int], mode: str = 'immediate',
+                 digest_size: int = 10, digest_interval: float = 300,
+                 retries: int = 3, retry_delay: float = 2.0):
+        self.admin_ids = admin_ids
+        self.mode = mode
+        self.digest_size = digest_size
+        self.digest_interval = digest_interval
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.bot: Optional[Bot] = None
+
+        self._pending: List[Dict] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.sent = 0
+        self.failed = 0
+
+    def start(self, bot: Bot):
+        self.bot = bot
+
+    def notify(self, data: Dict):
+        """Queue a notification about a new registration; returns immediately"""
+        if not self.admin_ids:
+            logger.warning("Admin chat IDs not configured")
+            return
+        if self.mode == 'digest':
+            self._pending.append(dict(data))
+            if len(self._pending) >= self.digest_size:
+                self._flush_digest()
+            elif self._timer is None or self._timer.done():
+                self._timer = asyncio.create_task(self._flush_later())
+        else:
+            self._spawn(self._broadcast(format_registration(data)))
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.digest_interval)
+        self._timer = None
+        self._flush_digest()
+
+    def _flush_digest(self):
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        texts = [format_registration(batch[0])] if len(batch) == 1 else format_digest(batch)
+        for text in texts:
+            self._spawn(self._broadcast(text))
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _broadcast(self, text: str):
+        results = await asyncio.gather(
+            *(self._send(chat_id, text) for chat_id in self.admin_ids),
+            return_exceptions=True
+        )
+        for chat_id, result in zip(self.admin_ids, results):
+            if isinstance(result, Exception):
+                self.failed += 1
+                logger.error("Failed to notify admin %s: %s", chat_id, result)
+            else:
+                self.sent += 1
+
+    async def _send(self, chat_id: int, text: str):
+        for attempt in range(self.retries + 1):
+            try:
+                await self.bot.send_message(
+                    chat_id=chat_id,
+                    text=text,
+                    parse_mode='HTML',
+                    rate_limit_args={'priority': PRIORITY_ADMIN}
+                )
+                return
+            except (BadRequest, Forbidden):
+                # Retrying cannot fix a rejected message or a blocked bot
+                raise
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.retry_delay * 2 ** attempt
+                logger.warning("Failed to notify admin %s, retrying in %ss: %s", chat_id, delay, e)
+                await asyncio.sleep(delay)
+
+    def stats(self) -> Dict:
+        return {
+            'mode': self.mode,
+            'pending': len(self._pending),
+            'sent': self.sent,
+            'failed': self.failed,
+        }
+
+    async def close(self):
+        """Send whatever is still waiting for a digest and finish in-flight sends"""
+        self._flush_digest()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,202 @@
+import asyncio
+import json
+import logging
+import pickle
+import sqlite3
+import threading
+from copy import deepcopy
+from typing import Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput, PicklePersistence
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_data (
+    user_id INTEGER PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    state BLOB NOT NULL,
+    PRIMARY KEY (name, key)
+);
+"""
+
+_DROPPED = object()
+
+
+class SQLitePersistence(BasePersistence):
+    """Stores user_data and ConversationHandler states in SQLite.
+
+    python-telegram-bot hands over changed entries every ``update_interval``
+    seconds. They are staged in memory and written in a single transaction,
+    so a burst of updates costs one commit instead of one per step.
+    """
+
+    def __init__(self, path: str = 'bot_state.db', update_interval: float = 5):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA busy_timeout=5000')
+        self._conn.executescript(SCHEMA)
+
+        self._user_data: Optional[Dict[int, dict]] = None
+        self._conversations: Dict[str, dict] = {}
+        self._dirty_users: Dict[int, object] = {}
+        self._dirty_conversations: Dict[Tuple[str, str], object] = {}
+        self._commit_task: Optional[asyncio.Task] = None
+
+    # --- Loading ------------------------------------------------------------
+
+    async def get_user_data(self) -> Dict[int, dict]:
+        if self._user_data is None:
+            with self._lock:
+                rows = self._conn.execute('SELECT user_id, data FROM user_data').fetchall()
+            self._user_data = {user_id: pickle.loads(data) for user_id, data in rows}
+        return deepcopy(self._user_data)
+
+    async def get_conversations(self, name: str) -> dict:
+        if name not in self._conversations:
+            with self._lock:
+                rows = self._conn.execute(
+                    'SELECT key, state FROM conversations WHERE name = ?', (name,)
+                ).fetchall()
+            self._conversations[name] = {
+                tuple(json.loads(key)): pickle.loads(state) for key, state in rows
+            }
+        return self._conversations[name].copy()
+
+    async def get_chat_data(self) -> Dict[int, dict]:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    # --- Staging changes ----------------------------------------------------
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        if self._user_data is None:
+            self._user_data = {}
+        if self._user_data.get(user_id) == data:
+            return
+        self._user_data[user_id] = data
+        self._dirty_users[user_id] = data
+        self._schedule_commit()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        if self._user_data is not None:
+            self._user_data.pop(user_id, None)
+        self._dirty_users[user_id] = _DROPPED
+        self._schedule_commit()
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]) -> None:
+        states = self._conversations.setdefault(name, {})
+        if states.get(key) == new_state:
+            return
+        if new_state is None:
+            states.pop(key, None)
+            self._dirty_conversations[(name, json.dumps(list(key)))] = _DROPPED
+        else:
+            states[key] = new_state
+            self._dirty_conversations[(name, json.dumps(list(key)))] = new_state
+        self._schedule_commit()
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    # --- Writing ------------------------------------------------------------
+
+    def _schedule_commit(self):
+        if self._commit_task is None or self._commit_task.done():
+            self._commit_task = asyncio.create_task(self._commit_soon())
+
+    def _take_dirty(self):
+        users, self._dirty_users = self._dirty_users, {}
+        conversations, self._dirty_conversations = self._dirty_conversations, {}
+        return users, conversations
+
+    async def _commit_soon(self):
+        # Let the rest of this persistence run stage its changes first
+        await asyncio.sleep(0)
+        users, conversations = self._take_dirty()
+        await asyncio.get_running_loop().run_in_executor(None, self._write, users, conversations)
+
+    def _write(self, users: dict, conversations: dict):
+        if not users and not conversations:
+            return
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                for user_id, data in users.items():
+                    if data is _DROPPED:
+                        self._conn.execute('DELETE FROM user_data WHERE user_id = ?', (user_id,))
+                    else:
+                        self._conn.execute(
+                            'INSERT OR REPLACE INTO user_data (user_id, data) VALUES (?, ?)',
+                            (user_id, pickle.dumps(data))
+                        )
+                for (name, key), state in conversations.items():
+                    if state is _DROPPED:
+                        self._conn.execute(
+                            'DELETE FROM conversations WHERE name = ? AND key = ?', (name, key)
+                        )
+                    else:
+                        self._conn.execute(
+                            'INSERT OR REPLACE INTO conversations (name, key, state) VALUES (?, ?, ?)',
+                            (name, key, pickle.dumps(state))
+                        )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    async def flush(self) -> None:
+        if self._commit_task is not None:
+            await self._commit_task
+        self._write(*self._take_dirty())
+        with self._lock:
+            self._conn.close()
+
+
+def create_persistence(backend: str, path: str, update_interval: float) -> Optional[BasePersistence]:
+    """Persistence for the configured backend, or None to keep state in memory only"""
+    if backend == 'memory':
+        return None
+    if backend == 'pickle':
+        return PicklePersistence(
+            filepath=path,
+            store_data=PersistenceInput(bot_data=False, chat_data=False, callback_data=False),
+            update_interval=update_interval
+        )
+    if backend == 'sqlite':
+        return SQLitePersistence(path, update_interval=update_interval)
+    raise ValueError(f"Unknown persistence backend: {backend}")
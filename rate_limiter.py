@@ -0,0 +1,173 @@
+import asyncio
+import itertools
+import logging
+import time
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Set, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from metrics import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+# Lower number goes first
+PRIORITY_USER = 0
+PRIORITY_ADMIN = 1
+PRIORITY_BULK = 2
+
+PRIORITY_NAMES = {PRIORITY_USER: 'user', PRIORITY_ADMIN: 'admin', PRIORITY_BULK: 'bulk'}
+
+# Methods that talk to Telegram about the bot itself rather than sending anything
+UNLIMITED_ENDPOINTS = {'getUpdates', 'getMe', 'setWebhook', 'deleteWebhook', 'getWebhookInfo'}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token and return how long to wait before using it"""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    @property
+    def idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class OutboundRateLimiter(BaseRateLimiter):
+    """Schedules every outgoing Bot API request under Telegram's flood limits.
+
+    Each chat has its own token bucket; after that, requests queue for the
+    global bucket in priority order, so user replies overtake admin
+    notifications, and both overtake bulk sends such as status updates. A
+    RetryAfter from Telegram pauses the whole queue for the requested time
+    and the request is retried.
+
+    Per-call priority is passed as ``rate_limit_args={'priority': PRIORITY_ADMIN}``.
+    """
+
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, chat_burst: float = 3,
+                 max_retries: int = 3, max_chat_buckets: int = 10000):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.max_chat_buckets = max_chat_buckets
+        self._chat_buckets: Dict[Any, TokenBucket] = {}
+
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._scheduler: Optional[asyncio.Task] = None
+        self._waiting: Set[asyncio.Future] = set()
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+
+        self.wait_times = LatencyStats()
+        self.retry_after_count = 0
+
+    async def initialize(self) -> None:
+        # Application and Updater both initialize the bot; a second scheduler
+        # would double the global rate
+        if self._scheduler is not None and not self._scheduler.done():
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._scheduler = asyncio.create_task(self._schedule())
+
+    async def shutdown(self) -> None:
+        if self._scheduler is not None:
+            self._scheduler.cancel()
+            await asyncio.gather(self._scheduler, return_exceptions=True)
+            self._scheduler = None
+        self._queue = None
+        # Nothing will release these any more; fail them rather than leave callers hanging
+        for ready in self._waiting:
+            if not ready.done():
+                ready.set_exception(RuntimeError("Rate limiter was shut down"))
+        self._waiting.clear()
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.max_chat_buckets:
+                # Forget chats whose bucket has refilled; they behave like new ones
+                self._chat_buckets = {key: value for key, value in self._chat_buckets.items() if not value.idle}
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def _schedule(self):
+        """Release queued requests one global token at a time, highest priority first"""
+        while True:
+            _, _, ready = await self._queue.get()
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            delay = self.global_bucket.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+            if not ready.done():
+                ready.set_result(None)
+
+    async def _acquire(self, chat_id, priority: int):
+        started = time.monotonic()
+        if chat_id is not None:
+            delay = self._chat_bucket(chat_id).reserve()
+            if delay:
+                await asyncio.sleep(delay)
+        if self._queue is None:
+            raise RuntimeError("Rate limiter was shut down")
+        ready = asyncio.get_running_loop().create_future()
+        self._waiting.add(ready)
+        try:
+            await self._queue.put((priority, next(self._sequence), ready))
+            await ready
+        finally:
+            self._waiting.discard(ready)
+        self.wait_times.observe(PRIORITY_NAMES.get(priority, str(priority)), time.monotonic() - started)
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict, List[Dict]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Dict],
+    ) -> Union[bool, Dict, List[Dict]]:
+        if endpoint in UNLIMITED_ENDPOINTS or self._queue is None:
+            return await callback(*args, **kwargs)
+
+        priority = (rate_limit_args or {}).get('priority', PRIORITY_USER)
+        chat_id = data.get('chat_id')
+
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(chat_id, priority)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                self.retry_after_count += 1
+                if attempt == self.max_retries:
+                    raise
+                retry_after = float(e.retry_after)
+                # Telegram applies flood waits bot-wide, so hold everything back
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                logger.warning("Flood limit hit on %s, retrying in %ss", endpoint, retry_after)
+                await asyncio.sleep(retry_after)
+
+    def stats(self) -> Dict:
+        waits = self.wait_times.summary()
+        return {
+            'queued': self._queue.qsize() if self._queue else 0,
+            'retry_after': self.retry_after_count,
+            'wait': waits,
+        }
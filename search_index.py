@@ -0,0 +1,184 @@
+import re
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from duplicates import phone_key
+
+WORD_PATTERN = re.compile(r"[^\W_]+(?:['\-][^\W_]+)*")
+DATE_QUERY_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}(?:\.\.\d{4}-\d{2}-\d{2})?$')
+PHONE_QUERY_PATTERN = re.compile(r'^\+?[\d\s()\-]{7,}$')
+
+# Stored per registration, in this order
+FIELDS = ('registration_date', 'name', 'age', 'phone', 'telegram_username', 'telegram_id')
+
+
+def name_tokens(name: str) -> List[str]:
+    """The full name and each of its words, case-folded, for prefix search"""
+    folded = ' '.join(str(name or '').split()).casefold()
+    tokens = {folded} if folded else set()
+    tokens.update(WORD_PATTERN.findall(folded))
+    return sorted(tokens)
+
+
+def parse_query(text: str) -> Tuple[str, str]:
+    """('date', '2024-05-01..2024-05-31'), ('phone', ...) or ('name', prefix)"""
+    text = ' '.join(text.split())
+    if DATE_QUERY_PATTERN.match(text):
+        return 'date', text
+    if PHONE_QUERY_PATTERN.match(text):
+        return 'phone', text
+    return 'name', text
+
+
+class RegistrationSearchIndex:
+    """Secondary indexes over journaled registrations for admin queries.
+
+    ``names`` is a sorted list of (token, row_id) pairs, so a name prefix is
+    a bisect plus a scan of the matches; ``phones`` maps each normalized
+    phone to its rows; ``dates`` keeps (registration_date, row_id) in date
+    order for ranges and "most recent" pages. Rows are added as they are
+    journaled and caught up by journal id, like ``DuplicateIndex``.
+
+    Rows that only exist in the sheet (older registrations, rows typed in
+    by HR) are seeded once under negative ids, so journal ids stay the
+    catch-up cursor; a row in both is indexed once, from the journal.
+    """
+
+    def __init__(self):
+        self.rows: Dict[int, Tuple[str, ...]] = {}
+        self.names: List[Tuple[str, int]] = []
+        self.phones: Dict[str, List[int]] = {}
+        self.dates: List[Tuple[str, int]] = []
+        self.last_row_id = 0
+        self.loaded = False
+        # (telegram_id, registration_date) of sheet-only rows -> their negative id
+        self.sheet_keys: Dict[Tuple[str, str], int] = {}
+        self.sheet_loaded = False
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def add(self, row_id: int, data: Dict):
+        self._drop_sheet_copy(row_id, data)
+        self._add(row_id, data, insort)
+
+    def add_many(self, entries: Iterable[Tuple[int, Dict]]):
+        """Bulk load: append everything, then sort each index once"""
+        entries = list(entries)
+        # Removal bisects, so it has to happen while the indexes are still sorted
+        for row_id, data in entries:
+            self._drop_sheet_copy(row_id, data)
+        for row_id, data in entries:
+            self._add(row_id, data, list.append)
+        self.names.sort()
+        self.dates.sort()
+
+    def add_sheet_rows(self, rows: Iterable[list]):
+        """Seed with the sheet's A-F rows that are not journaled"""
+        if self.sheet_loaded:
+            return
+        journaled = {(record[5], record[0]) for row_id, record in self.rows.items() if row_id > 0}
+        entries = []
+        for row in rows:
+            values = (list(row) + [''] * len(FIELDS))[:len(FIELDS)]
+            if not any(values):
+                continue
+            data = dict(zip(FIELDS, values))
+            key = (data['telegram_id'], data['registration_date'])
+            if key in journaled:
+                continue
+            row_id = -len(entries) - 1
+            if data['telegram_id']:
+                self.sheet_keys[key] = row_id
+            entries.append((row_id, data))
+        self.add_many(entries)
+        self.sheet_loaded = True
+
+    def _drop_sheet_copy(self, row_id: int, data: Dict):
+        if row_id < 0 or not self.sheet_keys:
+            return
+        key = (str(data.get('telegram_id') or ''), str(data.get('registration_date') or ''))
+        sheet_id = self.sheet_keys.pop(key, None)
+        if sheet_id is not None:
+            self.remove(sheet_id)
+
+    def _add(self, row_id: int, data: Dict, insert):
+        if row_id in self.rows:
+            self.remove(row_id)
+        record = tuple(str(data.get(field) or '') for field in FIELDS)
+        self.rows[row_id] = record
+        for token in name_tokens(record[1]):
+            insert(self.names, (token, row_id))
+        key = phone_key(record[3])
+        if key:
+            self.phones.setdefault(key, []).append(row_id)
+        # Registrations arrive in date order, so this is almost always an append
+        insert(self.dates, (record[0], row_id))
+        if row_id > self.last_row_id:
+            self.last_row_id = row_id
+
+    def remove(self, row_id: int):
+        record = self.rows.pop(row_id, None)
+        if record is None:
+            return
+        for token in name_tokens(record[1]):
+            index = bisect_left(self.names, (token, row_id))
+            if index < len(self.names) and self.names[index] == (token, row_id):
+                del self.names[index]
+        ids = self.phones.get(phone_key(record[3]))
+        if ids and row_id in ids:
+            ids.remove(row_id)
+            if not ids:
+                del self.phones[phone_key(record[3])]
+        index = bisect_left(self.dates, (record[0], row_id))
+        if index < len(self.dates) and self.dates[index] == (record[0], row_id):
+            del self.dates[index]
+
+    def record(self, row_id: int) -> Dict:
+        return dict(zip(FIELDS, self.rows[row_id]))
+
+    def by_name_prefix(self, prefix: str) -> List[int]:
+        """Rows whose name or any word of it starts with ``prefix``, newest first"""
+        prefix = ' '.join(prefix.split()).casefold()
+        if not prefix:
+            return []
+        matches = set()
+        index = bisect_left(self.names, (prefix,))
+        while index < len(self.names) and self.names[index][0].startswith(prefix):
+            matches.add(self.names[index][1])
+            index += 1
+        return self._newest_first(matches)
+
+    def by_phone(self, phone: str) -> List[int]:
+        return self._newest_first(self.phones.get(phone_key(phone), ()))
+
+    def by_date_range(self, start: str, end: str) -> List[int]:
+        """Rows registered on days ``start`` to ``end`` (YYYY-MM-DD, inclusive), newest first"""
+        low = bisect_left(self.dates, (start,))
+        # '~' sorts after the ' HH:MM:SS' part of every timestamp on the end day
+        high = bisect_right(self.dates, (end + '~',))
+        return [row_id for _, row_id in reversed(self.dates[low:high])]
+
+    def recent(self, offset: int = 0, limit: int = 10) -> List[int]:
+        end = len(self.dates) - offset
+        if end <= 0:
+            return []
+        return [row_id for _, row_id in reversed(self.dates[max(0, end - limit):end])]
+
+    def _newest_first(self, row_ids: Iterable[int]) -> List[int]:
+        return sorted(row_ids, key=lambda row_id: (self.rows[row_id][0], row_id), reverse=True)
+
+    def page(self, row_ids: List[int], page: int, page_size: int) -> List[Dict]:
+        """Records on ``page`` (0-based) of a query result"""
+        start = page * page_size
+        return [self.record(row_id) for row_id in row_ids[start:start + page_size]]
+
+    def query(self, kind: str, value: str) -> Optional[List[int]]:
+        if kind == 'name':
+            return self.by_name_prefix(value)
+        if kind == 'phone':
+            return self.by_phone(value)
+        if kind == 'date':
+            start, _, end = value.partition('..')
+            return self.by_date_range(start, end or start)
+        return None
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import sys
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from telegram.ext import Application, ConversationHandler
+
+logger = logging.getLogger(__name__)
+
+SessionKey = Tuple[int, int]
+
+
+def parse_state_timeouts(value: str) -> Dict[str, float]:
+    """'name=1800,age=900' -> {'name': 1800.0, 'age': 900.0}"""
+    timeouts = {}
+    for item in value.split(','):
+        state, _, seconds = item.partition('=')
+        if state.strip() and seconds.strip():
+            timeouts[state.strip().lower()] = float(seconds)
+    return timeouts
+
+
+def deep_sizeof(obj, _seen: Optional[set] = None) -> int:
+    """Approximate memory held by a small nest of dicts, lists and scalars"""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+class Session:
+    __slots__ = ('state', 'started', 'last_seen')
+
+    def __init__(self, state: str, now: float):
+        self.state = state
+        self.started = now
+        self.last_seen = now
+
+
+class SessionManager:
+    """Bounds the conversations and user_data a long-running bot keeps.
+
+    Handlers report each user's state through ``touch``. A periodic sweep
+    ends sessions idle longer than their state's timeout, and going over
+    ``max_sessions`` evicts the least recently active one. Ending a session
+    drops its ConversationHandler state and its user_data, and hands a
+    compact record to ``on_expired`` for funnel analytics.
+    """
+
+    def __init__(self, handler: ConversationHandler, default_timeout: float = 3600,
+                 state_timeouts: Optional[Dict[str, float]] = None, max_sessions: int = 10000,
+                 sweep_interval: float = 60,
+                 on_expired: Optional[Callable[[List[Dict]], Awaitable[None]]] = None,
+                 state_names: Optional[Dict[object, str]] = None):
+        self.handler = handler
+        self.default_timeout = default_timeout
+        self.state_timeouts = state_timeouts or {}
+        self.max_sessions = max_sessions
+        self.sweep_interval = sweep_interval
+        self.on_expired = on_expired
+        # Maps the handler's state values to the names touch() is given
+        self.state_names = state_names or {}
+        self.application: Optional[Application] = None
+
+        self._sessions: 'OrderedDict[SessionKey, Session]' = OrderedDict()
+        self._pending: List[Dict] = []
+        self._sweeper: Optional[asyncio.Task] = None
+        self.expired = 0
+        self.evicted = 0
+
+    def start(self, application: Application):
+        """Adopt conversations restored from persistence and start sweeping"""
+        self.application = application
+        now = time.monotonic()
+        # ConversationHandler keeps no public view of its conversations
+        for key, state in list(self.handler._conversations.items()):
+            if len(key) == 2 and key not in self._sessions:
+                self._sessions[key] = Session(self.state_names.get(state, str(state)), now)
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+        await self._emit()
+
+    def touch(self, key: SessionKey, state: str):
+        session = self._sessions.get(key)
+        now = time.monotonic()
+        if session is None:
+            session = self._sessions[key] = Session(state, now)
+        else:
+            session.state = state
+            session.last_seen = now
+            self._sessions.move_to_end(key)
+        while len(self._sessions) > self.max_sessions:
+            oldest = next(iter(self._sessions))
+            self._end(oldest, 'evicted')
+            self.evicted += 1
+
+    def state_of(self, key: SessionKey) -> Optional[str]:
+        session = self._sessions.get(key)
+        return session.state if session is not None else None
+
+    def finish(self, key: SessionKey):
+        """The conversation ended normally; stop tracking it"""
+        self._sessions.pop(key, None)
+
+    def sweep(self) -> int:
+        """End every session idle past its state's timeout"""
+        now = time.monotonic()
+        # Sessions are kept in last-activity order, so the scan stops at the
+        # first one that has not yet been idle for the shortest timeout
+        shortest = min([self.default_timeout, *self.state_timeouts.values()])
+        idle = []
+        for key, session in self._sessions.items():
+            idle_for = now - session.last_seen
+            if idle_for < shortest:
+                break
+            if idle_for >= self._timeout(session.state):
+                idle.append(key)
+        for key in idle:
+            self._end(key, 'idle')
+        self.expired += len(idle)
+        return len(idle)
+
+    def _timeout(self, state: str) -> float:
+        return self.state_timeouts.get(state, self.default_timeout)
+
+    def _end(self, key: SessionKey, reason: str):
+        session = self._sessions.pop(key)
+        chat_id, user_id = key
+        conversations = self.handler._conversations
+        if key in conversations:
+            del conversations[key]
+        if self.application is not None:
+            self.application.drop_user_data(user_id)
+        self._pending.append({
+            'telegram_id': user_id,
+            'state': session.state,
+            'reason': reason,
+            'duration': round(session.last_seen - session.started, 1),
+            'idle': round(time.monotonic() - session.last_seen, 1),
+        })
+
+    async def _emit(self):
+        if not self._pending or self.on_expired is None:
+            self._pending.clear()
+            return
+        records, self._pending = self._pending, []
+        try:
+            await self.on_expired(records)
+        except Exception as e:
+            logger.error("Failed to record %s expired sessions: %s", len(records), e)
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                ended = self.sweep()
+                if ended:
+                    logger.info("Ended %s idle conversations", ended)
+                await self._emit()
+            except Exception as e:
+                logger.error("Session sweep failed: %s", e)
+
+    @property
+    def live(self) -> int:
+        return len(self._sessions)
+
+    def bytes_per_session(self, sample: int = 100) -> float:
+        """Average user_data plus conversation entry size over the newest sessions"""
+        if not self._sessions or self.application is None:
+            return 0.0
+        user_data = self.application.user_data
+        keys = list(islice(reversed(self._sessions), sample))
+        total = sum(
+            deep_sizeof(user_data.get(user_id, {})) + deep_sizeof((chat_id, user_id))
+            + sys.getsizeof(self._sessions[(chat_id, user_id)])
+            for chat_id, user_id in keys
+        )
+        return round(total / len(keys), 1)
@@ -0,0 +1,323 @@
+import logging
+import re
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sheets_connection import HEADERS, SheetsConnection
+
+logger = logging.getLogger(__name__)
+
+SHARDING_MODES = ('none', 'month')
+INDEX_TITLE = 'Shards'
+INDEX_HEADERS = ['Лист', 'С', 'По', 'Строк']
+LEGACY_TITLE = 'Registrations'
+# Telegram ID, Статус and Комментарии
+STATUS_RANGE = 'F2:H'
+# Телефон, Telegram Username and Telegram ID
+KEY_RANGE = 'D2:F'
+PERIOD_PATTERN = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+# Date, name, age, phone, username and Telegram ID
+REGISTRATION_RANGE = 'A2:F'
+
+
+def period_of(registration_date: str) -> str:
+    """'2024-05-17 10:00:00' -> '2024-05'"""
+    return registration_date[:7]
+
+
+def period_bounds(period: str) -> Tuple[str, str]:
+    first = date.fromisoformat(f"{period}-01")
+    last = (first.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return first.isoformat(), last.isoformat()
+
+
+def key_pairs(rows: List[list]) -> Tuple[List[str], List[str]]:
+    """Phones and Telegram ids from rows of KEY_RANGE, one of each per row"""
+    rows = [list(row) + ['', '', ''] for row in rows]
+    return [row[0] for row in rows], [row[2] for row in rows]
+
+
+class SingleSheetLayout:
+    """Every registration in one worksheet (the original layout)"""
+
+    def __init__(self, connection: SheetsConnection):
+        self.connection = connection
+
+    def current_partition(self) -> str:
+        return self.connection.worksheet_title
+
+    def prepare(self):
+        """Nothing beyond the connection's own worksheet to open"""
+
+    def worksheet(self, partition: str):
+        return self.connection.worksheet
+
+    def worksheets(self) -> List:
+        return [self.connection.worksheet]
+
+    def append_rows(self, rows: List[list]) -> Dict[str, int]:
+        self.connection.worksheet.append_rows(rows)
+        return {self.current_partition(): len(rows)}
+
+    def key_columns(self) -> Tuple[List[str], List[str]]:
+        """Phones and Telegram ids of every row, aligned"""
+        rows, = self.connection.worksheet.batch_get([KEY_RANGE])
+        return key_pairs(rows)
+
+    def registration_rows(self) -> List[list]:
+        """Columns A-F of every row"""
+        rows, = self.connection.worksheet.batch_get([REGISTRATION_RANGE])
+        return list(rows)
+
+    def status_columns(self) -> Dict[str, List[list]]:
+        """[telegram_id, status, comment] of every row, in one request"""
+        rows, = self.connection.worksheet.batch_get([STATUS_RANGE])
+        return {self.current_partition(): list(rows)}
+
+    def find_row(self, telegram_id: str, registration_date: Optional[str] = None):
+        worksheet = self.connection.worksheet
+        cell = worksheet.find(str(telegram_id), in_column=6)
+        return (worksheet, cell.row) if cell is not None else None
+
+    def load_dates(self, today: date) -> Tuple[str, List[str], int, int]:
+        """(partition, dates, rows read including the header, rows not read)"""
+        column = self.connection.worksheet.col_values(1)
+        return self.current_partition(), column[1:], len(column), 0
+
+
+class ShardInfo:
+    __slots__ = ('title', 'period', 'first', 'last', 'rows', 'index_row')
+
+    def __init__(self, title: str, period: str, first: str, last: str, rows: Optional[int], index_row: int):
+        self.title = title
+        self.period = period
+        self.first = first
+        self.last = last
+        self.rows = rows
+        self.index_row = index_row
+
+
+class MonthlyShardLayout:
+    """One worksheet per month, e.g. "Registrations 2024-05", plus an index.
+
+    The index worksheet (the connection's own worksheet) lists each shard
+    with its date range and, once the month is over, its row count. A new
+    month's shard is created on its first row. Stats read the current month
+    (and the previous one when the week started in it) and take older totals
+    from the index; lookups go to the shard a row's date points at. A
+    pre-existing single "Registrations" tab is kept as the oldest shard.
+    """
+
+    def __init__(self, connection: SheetsConnection, prefix: str = LEGACY_TITLE):
+        self.connection = connection
+        self.prefix = prefix
+        self.shards: Dict[str, ShardInfo] = {}
+        self._worksheets: Dict[str, object] = {}
+        self._spreadsheet = None
+        self._lock = threading.RLock()
+
+    def title_for(self, period: str) -> str:
+        return f"{self.prefix} {period}"
+
+    def current_partition(self) -> str:
+        return self.title_for(period_of(datetime.now().strftime('%Y-%m-%d')))
+
+    def _check_handles(self):
+        # Cached handles belong to the spreadsheet they were opened from
+        if self._spreadsheet is not self.connection.spreadsheet:
+            self._spreadsheet = self.connection.spreadsheet
+            self._worksheets.clear()
+            self.shards.clear()
+
+    def load_index(self):
+        with self._lock:
+            self._check_handles()
+            index = self.connection.worksheet
+            rows = index.get_all_values()[1:]
+            if not rows:
+                rows = self._adopt_legacy_tab(index)
+            self.shards.clear()
+            for index_row, row in enumerate(rows, start=2):
+                row = row + [''] * (len(INDEX_HEADERS) - len(row))
+                title, first, last, count = row[:4]
+                if not title:
+                    continue
+                period = period_of(first) if first else ''
+                self.shards[period] = ShardInfo(
+                    title, period, first, last, int(count) if count.isdigit() else None, index_row
+                )
+
+    def _adopt_legacy_tab(self, index) -> List[list]:
+        titles = {worksheet.title for worksheet in self.connection.spreadsheet.worksheets()}
+        if LEGACY_TITLE not in titles:
+            return []
+        row = [LEGACY_TITLE, '', '', '']
+        index.append_row(row)
+        logger.info("Keeping the existing %s worksheet as the oldest shard", LEGACY_TITLE)
+        return [row]
+
+    def _ensure_index(self):
+        self._check_handles()
+        if not self.shards:
+            self.load_index()
+
+    def _open(self, title: str):
+        worksheet = self._worksheets.get(title)
+        if worksheet is None:
+            worksheet = self._worksheets[title] = self.connection.spreadsheet.worksheet(title)
+        return worksheet
+
+    def shard(self, period: str):
+        """Worksheet for ``period``, created (and indexed) on first use"""
+        with self._lock:
+            self._ensure_index()
+            if period not in self.shards:
+                # Another process may have created it since the index was read
+                self.load_index()
+            if period not in self.shards:
+                self._create(period)
+            return self._open(self.shards[period].title)
+
+    def _create(self, period: str):
+        import gspread
+
+        title = self.title_for(period)
+        spreadsheet = self.connection.spreadsheet
+        try:
+            worksheet = spreadsheet.worksheet(title)
+        except gspread.WorksheetNotFound:
+            try:
+                worksheet = spreadsheet.add_worksheet(title=title, rows=1000, cols=10)
+                worksheet.append_row(HEADERS)
+            except gspread.exceptions.APIError:
+                # Lost a race with another process creating the same tab
+                worksheet = spreadsheet.worksheet(title)
+        self._worksheets[title] = worksheet
+        first, last = period_bounds(period)
+        self.connection.worksheet.append_row([title, first, last, ''])
+        logger.info("Created worksheet %s", title)
+        self.load_index()
+
+    def prepare(self):
+        """Load the index and open (or create) the current month's shard"""
+        self.shard(period_of(datetime.now().strftime('%Y-%m-%d')))
+
+    def worksheet(self, partition: str):
+        with self._lock:
+            self._ensure_index()
+            return self._open(partition)
+
+    def worksheets(self) -> List:
+        """Shards from oldest to newest"""
+        with self._lock:
+            self._ensure_index()
+            return [self._open(info.title) for _, info in sorted(self.shards.items())]
+
+    def append_rows(self, rows: List[list]) -> Dict[str, int]:
+        by_period: Dict[str, List[list]] = {}
+        current = period_of(datetime.now().strftime('%Y-%m-%d'))
+        for row in rows:
+            period = period_of(str(row[0]))
+            # A row without a usable date would otherwise fail its whole batch on every retry
+            if not PERIOD_PATTERN.match(period):
+                period = current
+            by_period.setdefault(period, []).append(row)
+        appended = {}
+        for period, period_rows in sorted(by_period.items()):
+            self.shard(period).append_rows(period_rows)
+            info = self.shards[period]
+            appended[info.title] = len(period_rows)
+            if period < current and info.rows is not None:
+                # A late row for a closed month keeps its recorded count right
+                info.rows += len(period_rows)
+                self.connection.worksheet.update_cell(info.index_row, 4, info.rows)
+        return appended
+
+    def key_columns(self) -> Tuple[List[str], List[str]]:
+        """Phones and Telegram ids of every shard in one request"""
+        with self._lock:
+            self._ensure_index()
+            titles = [info.title for info in self.shards.values()]
+        if not titles:
+            return [], []
+        response = self.connection.spreadsheet.values_batch_get([f"'{title}'!{KEY_RANGE}" for title in titles])
+        return key_pairs([row for value_range in response.get('valueRanges', [])
+                          for row in value_range.get('values', [])])
+
+    def registration_rows(self) -> List[list]:
+        """Columns A-F of every row of every shard in one request"""
+        with self._lock:
+            self._ensure_index()
+            titles = [info.title for info in self.shards.values()]
+        if not titles:
+            return []
+        response = self.connection.spreadsheet.values_batch_get(
+            [f"'{title}'!{REGISTRATION_RANGE}" for title in titles]
+        )
+        return [row for value_range in response.get('valueRanges', []) for row in value_range.get('values', [])]
+
+    def status_columns(self) -> Dict[str, List[list]]:
+        """[telegram_id, status, comment] of every row per shard, in one request"""
+        with self._lock:
+            self._ensure_index()
+            titles = [info.title for info in self.shards.values()]
+        if not titles:
+            return {}
+        response = self.connection.spreadsheet.values_batch_get([f"'{title}'!{STATUS_RANGE}" for title in titles])
+        value_ranges = response.get('valueRanges', [])
+        return {title: value_range.get('values', []) for title, value_range in zip(titles, value_ranges)}
+
+    def find_row(self, telegram_id: str, registration_date: Optional[str] = None):
+        """Search the shard of ``registration_date`` first, then the rest newest first"""
+        with self._lock:
+            self._ensure_index()
+            periods = sorted(self.shards, reverse=True)
+        if registration_date and period_of(registration_date) in periods:
+            periods.remove(period_of(registration_date))
+            periods.insert(0, period_of(registration_date))
+        for period in periods:
+            worksheet = self.worksheet(self.shards[period].title)
+            cell = worksheet.find(str(telegram_id), in_column=6)
+            if cell is not None:
+                return worksheet, cell.row
+        return None
+
+    def load_dates(self, today: date) -> Tuple[str, List[str], int, int]:
+        """(partition, dates, rows read including the header, rows not read)"""
+        period = period_of(today.isoformat())
+        column = self.shard(period).col_values(1)
+        dates = column[1:]
+        read = {period}
+
+        week_period = period_of((today - timedelta(days=today.weekday())).isoformat())
+        if week_period != period and week_period in self.shards:
+            dates = self.worksheet(self.shards[week_period].title).col_values(1)[1:] + dates
+            read.add(week_period)
+
+        return self.title_for(period), dates, len(column), self._rows_outside(read, period)
+
+    def _rows_outside(self, read: set, current: str) -> int:
+        """Rows of every shard not in ``read``, counting and recording closed ones once"""
+        total = 0
+        with self._lock:
+            for period, info in sorted(self.shards.items()):
+                if period in read:
+                    continue
+                if info.rows is None:
+                    rows = len(self._open(info.title).col_values(1)) - 1
+                    if period >= current:
+                        total += rows
+                        continue
+                    info.rows = rows
+                    self.connection.worksheet.update_cell(info.index_row, 4, rows)
+                total += info.rows
+        return total
+
+
+def create_layout(mode: str, connection: SheetsConnection):
+    if mode == 'month':
+        return MonthlyShardLayout(connection)
+    if mode == 'none':
+        return SingleSheetLayout(connection)
+    raise ValueError("SHEETS_SHARDING must be 'none' or 'month'")
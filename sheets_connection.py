@@ -0,0 +1,201 @@
+import importlib.util
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+# gspread and google-auth take a large share of startup to import, so they
+# are only looked up here and imported on the first connect, which runs in
+# an executor thread in the background
+GSPREAD_AVAILABLE = importlib.util.find_spec('gspread') is not None
+if not GSPREAD_AVAILABLE:
+    logging.warning("gspread not available - Google Sheets integration disabled")
+
+logger = logging.getLogger(__name__)
+
+SCOPES = [
+    'https://spreadsheets.google.com/feeds',
+    'https://www.googleapis.com/auth/drive'
+]
+
+HEADERS = [
+    'Дата регистрации', 'Имя', 'Возраст', 'Телефон',
+    'Telegram Username', 'Telegram ID', 'Статус', 'Комментарии'
+]
+
+
+class CircuitBreaker:
+    """Stops calling Sheets after repeated failures, retrying with exponential backoff.
+
+    closed    - calls go through
+    open      - calls are refused until the backoff delay has passed
+    half_open - one trial call is allowed; success closes, failure reopens
+    """
+
+    def __init__(self, failure_threshold: int = 3, base_delay: float = 5.0, max_delay: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failures = 0
+        self.opened_count = 0
+        self.retry_at = 0.0
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.failure_threshold:
+            return 'closed'
+        if time.monotonic() < self.retry_at:
+            return 'open'
+        return 'half_open'
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half_open' and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_count = 0
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_running = False
+        if self.failures >= self.failure_threshold:
+            delay = min(self.max_delay, self.base_delay * (2 ** self.opened_count))
+            self.opened_count += 1
+            self.retry_at = time.monotonic() + delay
+            logger.warning("Google Sheets circuit open, next attempt in %.0fs", delay)
+
+
+def load_credentials(credentials_json: str):
+    from google.oauth2.service_account import Credentials
+
+    try:
+        info = json.loads(credentials_json)
+    except (TypeError, json.JSONDecodeError):
+        raise ValueError("Invalid JSON in GOOGLE_SHEETS_CREDENTIALS")
+    return Credentials.from_service_account_info(info, scopes=SCOPES)
+
+
+class SheetsClientPool:
+    """Authorized gspread clients shared by every connection with the same credentials.
+
+    In multi-tenant mode each tenant opens its own spreadsheet, but tenants
+    under one service account share a client: one HTTP connection pool and
+    one access token instead of one per tenant.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, Tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, credentials_json: str) -> Tuple:
+        """(credentials, client) for ``credentials_json``, authorized on first use"""
+        import gspread
+
+        with self._lock:
+            entry = self._clients.get(credentials_json)
+            if entry is None:
+                credentials = load_credentials(credentials_json)
+                entry = self._clients[credentials_json] = (credentials, gspread.authorize(credentials))
+            return entry
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+
+class SheetsConnection:
+    """Cached gspread session, spreadsheet and worksheet handles.
+
+    Credentials are parsed once and the authorized client is reused for every
+    call; the access token is refreshed ahead of expiry instead of on the
+    request that happens to hit it.
+    """
+
+    def __init__(self, credentials_json: Optional[str], sheet_name: str,
+                 admin_email: Optional[str] = None, worksheet_title: str = 'Registrations',
+                 refresh_margin: float = 300.0, headers: Optional[List[str]] = None,
+                 clients: Optional[SheetsClientPool] = None):
+        self.credentials_json = credentials_json
+        self.sheet_name = sheet_name
+        self.admin_email = admin_email
+        self.worksheet_title = worksheet_title
+        self.headers = headers or HEADERS
+        self.refresh_margin = refresh_margin
+        self.clients = clients
+
+        self.credentials = None
+        self.client = None
+        self.spreadsheet = None
+        self.worksheet = None
+        self._lock = threading.Lock()
+
+    @property
+    def configured(self) -> bool:
+        return GSPREAD_AVAILABLE and bool(self.credentials_json)
+
+    @property
+    def ready(self) -> bool:
+        return self.worksheet is not None
+
+    def connect(self):
+        """Open (or reuse) the worksheet; raises on failure"""
+        with self._lock:
+            if self.worksheet is not None:
+                return self.worksheet
+
+            import gspread
+
+            if self.client is None and self.clients is not None:
+                self.credentials, self.client = self.clients.get(self.credentials_json)
+
+            if self.credentials is None:
+                self.credentials = load_credentials(self.credentials_json)
+
+            if self.client is None:
+                self.client = gspread.authorize(self.credentials)
+
+            if self.spreadsheet is None:
+                try:
+                    self.spreadsheet = self.client.open(self.sheet_name)
+                except gspread.SpreadsheetNotFound:
+                    self.spreadsheet = self.client.create(self.sheet_name)
+                    if self.admin_email:
+                        self.spreadsheet.share(self.admin_email, perm_type='user', role='writer')
+
+            try:
+                worksheet = self.spreadsheet.worksheet(self.worksheet_title)
+            except gspread.WorksheetNotFound:
+                worksheet = self.spreadsheet.add_worksheet(title=self.worksheet_title, rows=1000, cols=10)
+                worksheet.append_row(self.headers)
+
+            self.worksheet = worksheet
+            logger.info("Google Sheets integration initialized successfully")
+            return worksheet
+
+    def refresh_if_needed(self) -> bool:
+        """Refresh the access token if it expires within ``refresh_margin`` seconds"""
+        credentials = self.credentials
+        if credentials is None:
+            return False
+        expiry = getattr(credentials, 'expiry', None)
+        # google-auth keeps expiry as naive UTC
+        if expiry is not None and expiry - datetime.utcnow() > timedelta(seconds=self.refresh_margin):
+            return False
+        from google.auth.transport.requests import Request
+        credentials.refresh(Request())
+        return True
+
+    def reset(self):
+        """Forget cached handles so the next call reopens them"""
+        with self._lock:
+            self.spreadsheet = None
+            self.worksheet = None
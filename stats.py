@@ -0,0 +1,95 @@
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+
+def parse_day(value: str) -> Optional[date]:
+    """Day part of a 'YYYY-MM-DD HH:MM:SS' timestamp, or None if malformed"""
+    try:
+        return date.fromisoformat(value[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+class RegistrationStatsIndex:
+    """Per-day registration counters maintained incrementally.
+
+    The index is loaded once from a date column, then updated on every new
+    registration, so answering /stats never rescans the whole history.
+    ``offset`` is the number of sheet rows already counted, which lets a
+    refresh read only rows appended since. With monthly shards the counters
+    cover ``partition`` (and the shard before it when the week started
+    there); older shards only contribute ``base_total``.
+    """
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self.per_day: Counter = Counter()
+        self.total = 0
+        self.offset = 0
+        self.source: Optional[str] = None
+        self.partition: Optional[str] = None
+        self.loaded = False
+        self._cached: Optional[Dict] = None
+        self._cached_at = 0.0
+
+    def load(self, dates: Iterable[str], source: str, offset: int = 0,
+             partition: Optional[str] = None, base_total: int = 0):
+        self.per_day = Counter()
+        self.total = base_total
+        self.add_many(dates)
+        self.source = source
+        self.offset = offset
+        self.partition = partition
+        self.loaded = True
+
+    def add(self, value: str):
+        day = parse_day(value)
+        if day is None:
+            return
+        self.per_day[day] += 1
+        self.total += 1
+        self._cached = None
+
+    def add_many(self, dates: Iterable[str]):
+        for value in dates:
+            self.add(value)
+
+    @property
+    def expired(self) -> bool:
+        return self._cached is None or time.monotonic() - self._cached_at > self.ttl
+
+    def invalidate(self, full: bool = False):
+        """Drop the cached answer; ``full`` also forces a cold reload"""
+        self._cached = None
+        if full:
+            self.loaded = False
+
+    def snapshot(self) -> Dict:
+        if not self.expired:
+            return self._cached
+
+        today = datetime.now().date()
+        week_start = today - timedelta(days=today.weekday())
+        month_start = today.replace(day=1)
+
+        this_week = 0
+        this_month = 0
+        day = month_start if month_start < week_start else week_start
+        while day <= today:
+            count = self.per_day.get(day, 0)
+            if day >= week_start:
+                this_week += count
+            if day >= month_start:
+                this_month += count
+            day += timedelta(days=1)
+
+        self._cached = {
+            'total': self.total,
+            'today': self.per_day.get(today, 0),
+            'this_week': this_week,
+            'this_month': this_month,
+        }
+        self._cached_at = time.monotonic()
+        return self._cached
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import logging
+import os
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from telegram import Bot
+
+from rate_limiter import PRIORITY_BULK
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 2
+# Rows hashed together; only blocks whose hash changed are compared row by row
+BLOCK_ROWS = 256
+
+# (telegram_id, status, comment)
+StatusChange = Tuple[str, str, str]
+
+
+def block_digest(rows: List[list]) -> int:
+    return zlib.crc32('\x1e'.join('\x1f'.join(row) for row in rows).encode('utf-8'))
+
+
+class StatusSnapshot:
+    """Last seen [telegram_id, status, comment] of every row, plus per-block hashes, per worksheet.
+
+    Rows are tracked by position rather than by Telegram id: one candidate
+    may own several rows, and each row's status is its own.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.rows: Dict[str, List[List[str]]] = {}
+        self.blocks: Dict[str, List[int]] = {}
+        self.loaded = False
+        self.compared = 0
+
+    def apply(self, columns: Dict[str, List[list]]) -> List[StatusChange]:
+        """Take in freshly read columns and return the known rows whose status or comment changed"""
+        changes = []
+        self.compared = 0
+        for partition, rows in columns.items():
+            previous = self.blocks.get(partition, [])
+            seen = self.rows.get(partition, [])
+            current: List[List[str]] = []
+            digests = []
+            for number, start in enumerate(range(0, len(rows), BLOCK_ROWS)):
+                block = rows[start:start + BLOCK_ROWS]
+                digest = block_digest(block)
+                digests.append(digest)
+                if number < len(previous) and previous[number] == digest:
+                    current.extend(seen[start:start + len(block)])
+                    continue
+                self.compared += len(block)
+                for offset, row in enumerate(block):
+                    row = (list(row) + ['', '', ''])[:3]
+                    current.append(row)
+                    telegram_id, status, comment = row
+                    index = start + offset
+                    old = seen[index] if index < len(seen) else None
+                    # New rows are only recorded; candidates hear about changes HR makes later.
+                    # A different id in this position means rows moved, not that a status changed
+                    if (old is None or old[0] != telegram_id or not telegram_id.isdigit()
+                            or old[1:] == [status, comment] or not status):
+                        continue
+                    changes.append((telegram_id, status, comment))
+            self.rows[partition] = current
+            self.blocks[partition] = digests
+        for partition in self.blocks.keys() - columns.keys():
+            del self.blocks[partition]
+            self.rows.pop(partition, None)
+        return changes
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self.rows.values())
+
+    def load(self) -> bool:
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if snapshot.get('version') != SNAPSHOT_VERSION:
+                return False
+            self.rows = snapshot['rows']
+            self.blocks = snapshot['blocks']
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable status snapshot %s: %s", self.path, e)
+            return False
+        self.loaded = True
+        return True
+
+    def save(self):
+        if not self.path or not self.loaded:
+            return
+        snapshot = {'version': SNAPSHOT_VERSION, 'rows': self.rows, 'blocks': self.blocks}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+
+class StatusSync:
+    """Tells candidates when HR changes their status or comment in the sheet.
+
+    Every ``interval`` seconds the Telegram id, status and comment columns
+    of all worksheets are read in one batched request and diffed against
+    a ``StatusSnapshot``, so an unchanged sheet costs one read and a hash
+    per block. The first cycle without a snapshot only records a baseline.
+    Changed rows are messaged in the language the candidate registered in,
+    ``concurrency`` at a time, at the rate limiter's bulk priority.
+    """
+
+    def __init__(self, sheets, messages, interval: float = 300, concurrency: int = 10,
+                 snapshot_path: Optional[str] = None):
+        self.sheets = sheets
+        self.messages = messages
+        self.interval = interval
+        self.concurrency = concurrency
+        self.snapshot = StatusSnapshot(snapshot_path)
+        self.bot: Optional[Bot] = None
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.failed = 0
+
+    def start(self, bot: Bot):
+        self.bot = bot
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.snapshot.load)
+        while True:
+            try:
+                await self.sync_once()
+            except Exception as e:
+                logger.error("Status sync failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def sync_once(self) -> int:
+        """One read-diff-notify cycle; returns the number of changed rows"""
+        columns = await self.sheets.read_statuses()
+        if columns is None:
+            return 0
+        loop = asyncio.get_running_loop()
+        changes = await loop.run_in_executor(None, self.snapshot.apply, columns)
+        if not self.snapshot.loaded:
+            self.snapshot.loaded = True
+            logger.info("Recorded baseline statuses of %s rows", len(self.snapshot))
+        elif changes:
+            logger.info("%s statuses changed (%s rows compared)", len(changes), self.snapshot.compared)
+            await self._notify(changes)
+        if self.snapshot.compared:
+            await loop.run_in_executor(None, self.snapshot.save)
+        return len(changes)
+
+    async def _notify(self, changes: List[StatusChange]):
+        languages = await self.sheets.get_languages([telegram_id for telegram_id, _, _ in changes])
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send(telegram_id: str, status: str, comment: str):
+            lang = languages.get(telegram_id, self.messages.default_lang)
+            text = self.messages.text(lang, "status_changed", status=status)
+            if comment:
+                text += "\n" + self.messages.text(lang, "status_comment", comment=comment)
+            async with semaphore:
+                await self.bot.send_message(
+                    chat_id=int(telegram_id),
+                    text=text,
+                    rate_limit_args={'priority': PRIORITY_BULK}
+                )
+
+        results = await asyncio.gather(*(send(*change) for change in changes), return_exceptions=True)
+        for (telegram_id, _, _), result in zip(changes, results):
+            if isinstance(result, Exception):
+                self.failed += 1
+                logger.warning("Failed to send a status update to %s: %s", telegram_id, result)
+            else:
+                self.sent += 1
@@ -0,0 +1,252 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from telegram import Update
+
+from config import Config
+from logging_setup import setup_logging, tenant_var
+from metrics import MetricsRegistry
+from sheets_connection import SheetsClientPool
+from web_server import Request, WebServer
+
+logger = logging.getLogger(__name__)
+
+TENANT_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+# Files each tenant keeps under TENANTS_DATA_DIR/<name>/ unless its settings say otherwise
+STORAGE_FILES = {
+    'JOURNAL_PATH': 'registrations.db',
+    'PERSISTENCE_PATH': 'bot_state.db',
+    'DUPLICATES_SNAPSHOT': 'duplicates.json',
+    'STATUS_SNAPSHOT': 'status_snapshot.json',
+}
+
+
+def rss_bytes() -> int:
+    """Resident memory of this process"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        # Peak rather than current, where /proc is not available
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def load_tenants(path: str) -> Dict[str, Dict[str, str]]:
+    """{"acme": {"BOT_TOKEN": "...", "GOOGLE_SHEET_NAME": "Acme"}, ...} from a JSON file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        tenants = json.load(f)
+    if not isinstance(tenants, dict) or not tenants:
+        raise ValueError(f"{path} must map tenant names to their settings")
+    for name, settings in tenants.items():
+        if not TENANT_NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid tenant name {name!r}: use letters, digits, '-' and '_'")
+        if not isinstance(settings, dict):
+            raise ValueError(f"Settings of tenant {name!r} must be an object")
+        if not settings.get('BOT_TOKEN'):
+            # Falling back to the process's BOT_TOKEN would run two tenants as one bot
+            raise ValueError(f"Tenant {name!r} has no BOT_TOKEN")
+    return {
+        name: {key: str(value) for key, value in settings.items()}
+        for name, settings in tenants.items()
+    }
+
+
+def tenant_settings(name: str, settings: Dict[str, str], data_dir: str) -> Dict[str, str]:
+    """A tenant's settings over per-tenant defaults for everything it must not share"""
+    directory = os.path.join(data_dir, name)
+    defaults = {key: os.path.join(directory, filename) for key, filename in STORAGE_FILES.items()}
+    defaults['WEBHOOK_PATH'] = f"{name}/telegram"
+    # The legacy CSV fallback belongs to the single-bot deployment
+    defaults['LEGACY_CSV'] = ''
+    # Tenants always run inside this one process
+    return {**defaults, **settings, 'WORKERS': '1'}
+
+
+class Tenant:
+    def __init__(self, name: str, bot, app, startup_bytes: int, startup_seconds: float):
+        self.name = name
+        self.bot = bot
+        self.app = app
+        self.startup_bytes = startup_bytes
+        self.startup_seconds = startup_seconds
+
+    def usage(self) -> Dict:
+        usage = self.bot.usage()
+        usage['startup_bytes'] = self.startup_bytes
+        usage['startup_seconds'] = round(self.startup_seconds, 3)
+        return usage
+
+
+class TenantRunner:
+    """Runs many bots, each with its own token, settings and storage, in one process.
+
+    Every tenant gets its own Config (its settings over the process
+    environment), message catalog, journal, persistence, rate limiter and
+    Sheets circuit breaker, so one tenant's outage or flood stays its own.
+    The event loop, the Sheets executor, gspread clients (one per service
+    account) and the web server for health checks, metrics and webhooks are
+    shared. Per-tenant work and memory are reported by ``accounting`` at
+    /tenants and as ``tenant_usage`` in /metrics.
+    """
+
+    def __init__(self, tenants: Dict[str, Dict[str, str]], data_dir: str = 'tenants',
+                 port: int = 8080, sheets_workers: int = 4):
+        self.settings = tenants
+        self.data_dir = data_dir
+        self.sheets_workers = sheets_workers
+        self.sheets_executor = ThreadPoolExecutor(max_workers=sheets_workers, thread_name_prefix='sheets')
+        self.sheets_clients = SheetsClientPool()
+        self.tenants: Dict[str, Tenant] = {}
+        self.failed: Dict[str, str] = {}
+
+        self.metrics = MetricsRegistry()
+        self.metrics.gauge("tenant_usage", "Per-tenant work and memory, see /tenants", ("tenant", "resource"),
+                           callback=self._usage_samples)
+        self.metrics.gauge("tenants_running", "Tenants serving updates", callback=lambda: len(self.tenants))
+        self.metrics.gauge("process_resident_bytes", "Resident memory of the whole process", callback=rss_bytes)
+        self.web_server = WebServer(port=port)
+        self.web_server.route("GET", "/", self.health)
+        self.web_server.route("GET", "/health", self.health)
+        self.web_server.route("GET", "/metrics", self.metrics_endpoint)
+        self.web_server.route("GET", "/tenants", self.tenants_endpoint)
+
+    async def start(self):
+        await self.web_server.start()
+        # One at a time, so each tenant's memory is what the process grew by while it started
+        for name in self.settings:
+            await asyncio.create_task(self._start_tenant(name))
+        logger.info("Serving %s of %s tenants in one process (%.1f MB resident)",
+                    len(self.tenants), len(self.settings), rss_bytes() / 1e6)
+
+    async def _start_tenant(self, name: str):
+        # Runs in its own task: every task the tenant's bot starts inherits
+        # the tenant name for its log records
+        tenant_var.set(name)
+        from main import WorkerRegistrationBot
+
+        started = time.perf_counter()
+        before = rss_bytes()
+        bot = app = None
+        try:
+            os.makedirs(os.path.join(self.data_dir, name), exist_ok=True)
+            config = Config(tenant_settings(name, self.settings[name], self.data_dir))
+            bot = WorkerRegistrationBot(
+                serve_http=False, config=config,
+                sheets_executor=self.sheets_executor, sheets_clients=self.sheets_clients
+            )
+            app = bot.build_application()
+            await app.initialize()
+            await bot.post_init(app)
+            if config.RUN_MODE == "webhook":
+                self.web_server.route("POST", config.WEBHOOK_PATH, bot.telegram_webhook)
+                await app.bot.set_webhook(
+                    url=config.WEBHOOK_URL + config.WEBHOOK_PATH,
+                    secret_token=config.WEBHOOK_SECRET,
+                    allowed_updates=Update.ALL_TYPES
+                )
+            else:
+                await app.updater.start_polling(drop_pending_updates=True)
+            await app.start()
+        except Exception as e:
+            # A bad token or setting takes out its own tenant only
+            self.failed[name] = str(e)
+            logger.error("Failed to start tenant %s: %s", name, e)
+            if bot is not None:
+                await self._close(name, bot, app)
+            return
+        tenant = self.tenants[name] = Tenant(name, bot, app, rss_bytes() - before, time.perf_counter() - started)
+        self.web_server.route("GET", f"/metrics/{name}", bot.metrics_endpoint)
+        self.web_server.route("GET", f"/healthz/{name}", bot.health)
+        self.web_server.route("GET", f"/readyz/{name}", bot.ready)
+        logger.info("Tenant %s started in %.3fs (+%.1f MB)", name, tenant.startup_seconds, tenant.startup_bytes / 1e6)
+
+    async def stop(self):
+        for tenant in list(self.tenants.values()):
+            await self._close(tenant.name, tenant.bot, tenant.app)
+        self.tenants.clear()
+        await self.web_server.stop()
+        self.sheets_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _close(self, name: str, bot, app):
+        try:
+            if app is not None:
+                if app.updater is not None and app.updater.running:
+                    await app.updater.stop()
+                if app.running:
+                    await app.stop()
+            await bot.post_stop(app)
+            await bot.shutdown(app)
+            if app is not None:
+                await app.shutdown()
+            # Also covers a tenant that failed after its rate limiter started
+            await bot.rate_limiter.shutdown()
+        except Exception as e:
+            logger.error("Failed to stop tenant %s: %s", name, e)
+
+    async def serve(self):
+        """Run every tenant until SIGINT/SIGTERM"""
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError:
+                pass
+        try:
+            await self.start()
+            await stop.wait()
+        finally:
+            await self.stop()
+
+    def accounting(self) -> Dict:
+        return {
+            'tenants': {name: tenant.usage() for name, tenant in self.tenants.items()},
+            'failed': self.failed,
+            'shared': {
+                'resident_bytes': rss_bytes(),
+                'sheets_workers': self.sheets_workers,
+                'sheets_clients': len(self.sheets_clients),
+            },
+        }
+
+    def _usage_samples(self) -> Dict:
+        return {
+            (name, resource): value
+            for name, tenant in self.tenants.items()
+            for resource, value in tenant.usage().items()
+        }
+
+    async def health(self, request: Request):
+        status = 200 if self.tenants else 503
+        return status, "text/plain; charset=utf-8", f"{len(self.tenants)}/{len(self.settings)} tenants".encode()
+
+    async def metrics_endpoint(self, request: Request):
+        return 200, "text/plain; version=0.0.4; charset=utf-8", self.metrics.render().encode()
+
+    async def tenants_endpoint(self, request: Request):
+        return 200, "application/json", json.dumps(self.accounting()).encode()
+
+
+def run_tenants(path: str, port: Optional[int] = None):
+    """Serve every tenant listed in ``path`` from this process"""
+    setup_logging(
+        os.getenv("LOG_LEVEL", "INFO").upper(),
+        os.getenv("LOG_FORMAT", "json").lower(),
+        float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+    )
+    runner = TenantRunner(
+        load_tenants(path),
+        data_dir=os.getenv("TENANTS_DATA_DIR", "tenants"),
+        port=port or int(os.getenv("PORT", "8080")),
+        sheets_workers=int(os.getenv("SHEETS_MAX_WORKERS", "4"))
+    )
+    asyncio.run(runner.serve())
@@ -0,0 +1,75 @@
+import time
+from array import array
+from typing import Dict, Optional
+
+
+def parse_state_limits(value: str) -> Dict[str, int]:
+    """'idle=5,confirm=10' -> {'idle': 5, 'confirm': 10}"""
+    limits = {}
+    for item in value.split(','):
+        state, _, limit = item.partition('=')
+        if state.strip() and limit.strip():
+            limits[state.strip().lower()] = int(limit)
+    return limits
+
+
+class SlidingWindowThrottle:
+    """Per-user update limits in a fixed amount of memory.
+
+    Each user hashes to one of ``slots`` entries holding the counts of the
+    current and previous fixed window; the sliding-window rate is the
+    previous count weighted by how much of it still overlaps, plus the
+    current count. The arrays are allocated once (32 bytes per slot),
+    so memory does not grow with the number of users. A user landing on a
+    slot held by someone else takes it over with fresh counts, which can
+    only let an update through, never throttle one wrongly.
+    """
+
+    def __init__(self, window: float = 60.0, default_limit: int = 20,
+                 state_limits: Optional[Dict[str, int]] = None, slots: int = 65536):
+        self.window = window
+        self.default_limit = default_limit
+        self.state_limits = state_limits or {}
+        self.slots = slots
+        self._owners = array('q', [0]) * slots
+        self._windows = array('q', [0]) * slots
+        self._notified = array('q', [-1]) * slots
+        self._current = array('I', [0]) * slots
+        self._previous = array('I', [0]) * slots
+
+    def limit_for(self, state: str) -> int:
+        return self.state_limits.get(state, self.default_limit)
+
+    def _slot(self, user_id: int, window: int) -> int:
+        slot = user_id % self.slots
+        if self._owners[slot] != user_id:
+            self._owners[slot] = user_id
+            self._windows[slot] = window
+            self._current[slot] = 0
+            self._previous[slot] = 0
+            self._notified[slot] = -1
+        elif self._windows[slot] != window:
+            # Roll over: the last window becomes "previous" only if adjacent
+            self._previous[slot] = self._current[slot] if self._windows[slot] == window - 1 else 0
+            self._current[slot] = 0
+            self._windows[slot] = window
+        return slot
+
+    def allow(self, user_id: int, state: str, now: Optional[float] = None) -> bool:
+        """Count an update from ``user_id``; False if it is over the state's limit"""
+        position = (time.monotonic() if now is None else now) / self.window
+        window = int(position)
+        slot = self._slot(user_id, window)
+        overlap = 1.0 - (position - window)
+        if self._previous[slot] * overlap + self._current[slot] >= self.limit_for(state):
+            return False
+        self._current[slot] += 1
+        return True
+
+    def first_rejection(self, user_id: int) -> bool:
+        """True once per window, so a flooding user gets one cooldown reply, not one per message"""
+        slot = user_id % self.slots
+        if self._owners[slot] != user_id or self._notified[slot] == self._windows[slot]:
+            return False
+        self._notified[slot] = self._windows[slot]
+        return True
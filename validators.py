@@ -1,14 +1,111 @@
 import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Compiled once at import; every check below reuses these objects
+NAME_PATTERN = re.compile(r"[a-zA-Zа-яА-ЯёЁіІїЇєЄ\s\-']+")
+PHONE_INTERNATIONAL_PATTERN = re.compile(r"\+380\d{9}")
+PHONE_LOCAL_PATTERN = re.compile(r"0\d{9}")
+UNSAFE_CHARS_PATTERN = re.compile(r'[<>"\']')
+
+# Characters dropped from phone input in a single str.translate pass
+_PHONE_STRIP = str.maketrans("", "", " -")
+
+
+def normalize_phone(phone: str) -> Tuple[bool, str]:
+    """
+    Normalize a phone number in one pass.
+    Returns (valid, number) where a valid number is in +380XXXXXXXXX form
+    and an invalid one is returned stripped but otherwise unchanged.
+    """
+    phone = phone.strip().translate(_PHONE_STRIP)
+
+    # Reject Russian numbers
+    if phone.startswith("+7") or phone.startswith("8"):
+        return False, phone
+
+    if PHONE_INTERNATIONAL_PATTERN.fullmatch(phone):
+        return True, phone
+
+    if PHONE_LOCAL_PATTERN.fullmatch(phone):
+        return True, "+38" + phone
+
+    return False, phone
+
+
+class ValidatorEngine:
+    """Registration field validators built once from Config.
+
+    Each ``check_*`` method returns ``(valid, normalized_value)`` so handlers
+    validate and normalize input in the same call.
+    """
+
+    FIELDS = ('name', 'age', 'phone')
+
+    def __init__(self, min_age: int = 16, max_age: int = 40, max_name_length: int = 100):
+        self.min_age = min_age
+        self.max_age = max_age
+        self.max_name_length = max_name_length
+        self._checks = {
+            'name': self.check_name,
+            'age': self.check_age,
+            'phone': self.check_phone,
+        }
+
+    @classmethod
+    def from_config(cls, config) -> 'ValidatorEngine':
+        return cls(min_age=config.MIN_AGE, max_age=config.MAX_AGE,
+                   max_name_length=config.MAX_NAME_LENGTH)
+
+    def check_name(self, name: str) -> Tuple[bool, str]:
+        name = name.strip()
+        if not 2 <= len(name) <= self.max_name_length:
+            return False, name
+        return NAME_PATTERN.fullmatch(name) is not None, name
+
+    def check_age(self, age_text: str) -> Tuple[bool, Optional[int]]:
+        try:
+            age = int(age_text)
+        except (TypeError, ValueError):
+            return False, None
+        return self.min_age <= age <= self.max_age, age
+
+    check_phone = staticmethod(normalize_phone)
+
+    def check(self, field: str, value: str) -> Tuple[bool, object]:
+        return self._checks[field](value)
+
+    def validate_column(self, field: str, values: Iterable[str]) -> List[Tuple[bool, object]]:
+        """Validate every value of one field, e.g. a column read from a sheet"""
+        check = self._checks[field]
+        return [check(value if isinstance(value, str) else str(value)) for value in values]
+
+    def validate_records(self, records: Iterable[Dict]) -> List[Dict[str, List[str]]]:
+        """
+        Re-check whole registrations, e.g. rows about to be imported.
+        Returns one entry per record with the normalized values and the
+        names of the fields that failed.
+        """
+        results = []
+        for record in records:
+            normalized = {}
+            errors = []
+            for field in self.FIELDS:
+                valid, value = self._checks[field](str(record.get(field, '')))
+                normalized[field] = value
+                if not valid:
+                    errors.append(field)
+            results.append({'normalized': normalized, 'errors': errors})
+        return results
+
+
+_default_engine = ValidatorEngine()
+
 
 def validate_age(age_text: str) -> bool:
     """
     Validate age input from 16 to 40
     """
-    try:
-        age = int(age_text)
-        return 16 <= age <= 40
-    except ValueError:
-        return False
+    return _default_engine.check_age(age_text)[0]
 
 def validate_phone(phone: str) -> bool:
     """
@@ -17,21 +114,7 @@ def validate_phone(phone: str) -> bool:
     - 0XXXXXXXXX
     Reject Russian numbers: +7, 8
     """
-    phone = phone.strip().replace(" ", "").replace("-", "")
-
-    # Reject Russian numbers
-    if phone.startswith("+7") or phone.startswith("8"):
-        return False
-
-    # Ukrainian international
-    if re.fullmatch(r"\+380\d{9}", phone):
-        return True
-
-    # Ukrainian local
-    if re.fullmatch(r"0\d{9}", phone):
-        return True
-
-    return False
+    return normalize_phone(phone)[0]
 
 def format_phone_variants(phone: str) -> dict:
     """
@@ -41,17 +124,17 @@ def format_phone_variants(phone: str) -> dict:
     Returns:
         dict: {"international": "+380...", "local": "0..."}
     """
-    phone = phone.strip().replace(" ", "").replace("-", "")
+    phone = phone.strip().translate(_PHONE_STRIP)
 
     # If local, convert to international
-    if re.fullmatch(r"0\d{9}", phone):
+    if PHONE_LOCAL_PATTERN.fullmatch(phone):
         return {
             "international": "+38" + phone,
             "local": phone
         }
 
     # If international, convert to local
-    if re.fullmatch(r"\+380\d{9}", phone):
+    if PHONE_INTERNATIONAL_PATTERN.fullmatch(phone):
         return {
             "international": phone,
             "local": "0" + phone[4:]
@@ -70,7 +153,7 @@ def validate_name(name: str) -> bool:
     name = name.strip()
     if len(name) < 2:
         return False
-    return bool(re.fullmatch(r"[a-zA-Zа-яА-ЯёЁіІїЇєЄ\s\-']+", name))
+    return NAME_PATTERN.fullmatch(name) is not None
 
 def sanitize_input(text: str, max_length: int = 100) -> str:
     """
@@ -79,5 +162,5 @@ def sanitize_input(text: str, max_length: int = 100) -> str:
     sanitized = text.strip()
     if len(sanitized) > max_length:
         sanitized = sanitized[:max_length]
-    sanitized = re.sub(r'[<>"\']', '', sanitized)
+    sanitized = UNSAFE_CHARS_PATTERN.sub('', sanitized)
     return sanitized
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+Response = Tuple[int, str, bytes]
+Handler = Callable[['Request'], Awaitable[Response]]
+
+REASONS = {
+    200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found',
+    405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+MAX_BODY_SIZE = 1024 * 1024
+MAX_HEADERS = 100
+
+
+class Request:
+    def __init__(self, method: str, path: str, headers: Dict[str, str], body: bytes):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+
+class WebServer:
+    """Small HTTP/1.1 server running on the bot's own event loop.
+
+    Serves the health check and, in webhook mode, Telegram updates, so no
+    separate web framework or thread is needed.
+    """
+
+    def __init__(self, host: str = '0.0.0.0', port: int = 8080, max_body_size: int = MAX_BODY_SIZE):
+        self.host = host
+        self.port = port
+        self.max_body_size = max_body_size
+        self._routes: Dict[Tuple[str, str], Handler] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.Task] = set()
+
+    def route(self, method: str, path: str, handler: Handler):
+        self._routes[(method.upper(), path)] = handler
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        sockets = self._server.sockets or []
+        if sockets:
+            self.port = sockets[0].getsockname()[1]
+        logger.info("Web server listening on %s:%s", self.host, self.port)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                if isinstance(request, int):
+                    await self._write_response(writer, (request, 'text/plain', b''), close=True)
+                    break
+                keep_alive = request.headers.get('connection', '').lower() != 'close'
+                response = await self._dispatch(request)
+                if request.method == 'HEAD':
+                    response = (response[0], response[1], b'')
+                await self._write_response(writer, response, close=not keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Cancelled by stop(); finishing normally keeps asyncio's stream
+            # callback from logging the cancellation as an error
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """Parse one request; returns None at end of stream or a status code for bad input"""
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return None
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+
+            headers = {}
+            for _ in range(MAX_HEADERS + 1):
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            else:
+                return 400
+        except ValueError:
+            # Also raised by readline() for a line longer than the stream limit
+            return 400
+
+        length = headers.get('content-length') or '0'
+        if not (length.isascii() and length.isdigit()):
+            return 400
+        length = int(length)
+        if length > self.max_body_size:
+            return 413
+        body = await reader.readexactly(length) if length else b''
+        return Request(method.upper(), target.split('?', 1)[0], headers, body)
+
+    async def _dispatch(self, request: Request) -> Response:
+        handler = self._routes.get((request.method, request.path))
+        if handler is None:
+            if request.method == 'HEAD':
+                handler = self._routes.get(('GET', request.path))
+            if handler is None:
+                known_path = any(path == request.path for _, path in self._routes)
+                return (405 if known_path else 404), 'text/plain', b''
+        try:
+            return await handler(request)
+        except Exception as e:
+            logger.error("Error handling %s %s: %s", request.method, request.path, e)
+            return 500, 'text/plain', b''
+
+    async def _write_response(self, writer: asyncio.StreamWriter, response: Response, close: bool):
+        status, content_type, body = response
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
@@ -0,0 +1,311 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import signal
+import time
+from typing import List, Optional
+
+from telegram import Bot, Update
+from telegram.error import RetryAfter, TelegramError
+
+from config import Config
+from health import CachedProbe, LoopLagMonitor, seconds_since
+from logging_setup import setup_logging
+from web_server import Request, WebServer
+
+logger = logging.getLogger(__name__)
+
+_STOP = None
+
+
+def partition_key(update: dict) -> int:
+    """Telegram user id an update belongs to (chat id or update id as fallback)"""
+    for key, value in update.items():
+        if key == 'update_id' or not isinstance(value, dict):
+            continue
+        sender = value.get('from') or value.get('user')
+        if isinstance(sender, dict) and 'id' in sender:
+            return int(sender['id'])
+        chat = value.get('chat') or (value.get('message') or {}).get('chat')
+        if isinstance(chat, dict) and 'id' in chat:
+            return int(chat['id'])
+    return int(update.get('update_id', 0))
+
+
+class RoutingBot(Bot):
+    """Bot that fetches updates as plain dicts.
+
+    The dispatcher only reads the sender id and forwards the update, so
+    building Update objects here and serializing them again would cost it
+    more CPU than routing does.
+    """
+
+    async def get_update_dicts(self, offset: int, timeout: int) -> List[dict]:
+        return await self._post(
+            "getUpdates",
+            {"offset": offset, "timeout": timeout, "allowed_updates": Update.ALL_TYPES},
+            read_timeout=timeout + 5,
+        )
+
+
+class WorkerSupervisor:
+    """Starts the worker processes and restarts any that exit while the bot runs.
+
+    A worker that dies more than ``max_restarts`` times stops the whole bot
+    rather than leaving its share of users unanswered.
+    """
+
+    def __init__(self, queues: List[multiprocessing.Queue], max_restarts: int = 5,
+                 check_interval: float = 1.0):
+        self.queues = queues
+        self.max_restarts = max_restarts
+        self.check_interval = check_interval
+        self.context = multiprocessing.get_context('spawn')
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * len(queues)
+        self.restarts = [0] * len(queues)
+
+    def start(self):
+        for index in range(len(self.queues)):
+            self._spawn(index)
+
+    def _spawn(self, index: int):
+        process = self.context.Process(target=run_worker, args=(index, self.queues[index]), name=f'worker{index}')
+        process.start()
+        self.processes[index] = process
+
+    @property
+    def alive(self) -> List[bool]:
+        return [process is not None and process.is_alive() for process in self.processes]
+
+    async def watch(self):
+        """Restart dead workers; raises once one has used up its restarts"""
+        while True:
+            await asyncio.sleep(self.check_interval)
+            for index, process in enumerate(self.processes):
+                if process.is_alive():
+                    continue
+                if self.restarts[index] >= self.max_restarts:
+                    raise RuntimeError(
+                        f"Worker {index} exited with code {process.exitcode} after {self.restarts[index]} restarts"
+                    )
+                self.restarts[index] += 1
+                logger.error("Worker %s exited with code %s, restarting (%s/%s); updates queued for it are lost",
+                             index, process.exitcode, self.restarts[index], self.max_restarts)
+                # A worker killed inside get() leaves the queue's read lock held
+                self.queues[index] = self.context.Queue()
+                self._spawn(index)
+
+    def stop(self):
+        for updates in self.queues:
+            updates.put(_STOP)
+        for process in self.processes:
+            if process is None:
+                continue
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+
+
+class UpdateDispatcher:
+    """Receives updates in the parent process and routes each user to one worker.
+
+    Partitioning by telegram_id keeps every step of a user's conversation on
+    the same worker, so workers never contend for the same conversation.
+    """
+
+    def __init__(self, config: Config, queues: List[multiprocessing.Queue],
+                 supervisor: Optional[WorkerSupervisor] = None):
+        self.config = config
+        self.queues = queues
+        self.supervisor = supervisor
+        self.failed = False
+        self.routed = [0] * len(queues)
+        self.web_server = WebServer(port=config.PORT)
+        self.loop_lag = LoopLagMonitor()
+        self.last_contact: Optional[float] = None
+        self._liveness = CachedProbe(self.check_liveness, ttl=config.HEALTH_CACHE_TTL)
+        self._readiness = CachedProbe(self.check_readiness, ttl=config.HEALTH_CACHE_TTL)
+        self.web_server.route("GET", "/", self.health)
+        self.web_server.route("GET", "/health", self.health)
+        self.web_server.route("GET", "/healthz", self.health)
+        self.web_server.route("GET", "/readyz", self.ready)
+        self._stop = asyncio.Event()
+
+    def dispatch(self, updates: List[dict]):
+        """Hand each worker its share of ``updates`` in a single queue put"""
+        batches = {}
+        for update in updates:
+            batches.setdefault(abs(partition_key(update)) % len(self.queues), []).append(update)
+        for index, batch in batches.items():
+            self.queues[index].put(batch)
+            self.routed[index] += len(batch)
+
+    async def health(self, request: Request):
+        status, body = await self._liveness.get()
+        return status, "application/json", json.dumps(body).encode()
+
+    async def ready(self, request: Request):
+        status, body = await self._readiness.get()
+        return status, "application/json", json.dumps(body).encode()
+
+    async def check_liveness(self):
+        lag = self.loop_lag.lag
+        alive = lag < self.config.HEALTH_MAX_LOOP_LAG
+        return (200 if alive else 503), {"status": "ok" if alive else "stalled", "loop_lag_seconds": round(lag, 3)}
+
+    async def check_readiness(self):
+        """Telegram side only; Sheets and the journal are the workers' business"""
+        polling = self.config.RUN_MODE == "polling"
+        age = seconds_since(self.last_contact)
+        stalled = polling and (age is None or age > self.config.READY_MAX_POLL_AGE)
+        alive = self.supervisor.alive if self.supervisor is not None else []
+        ready = not stalled and all(alive)
+        return (200 if ready else 503), {
+            "status": "ready" if ready else "not_ready",
+            "telegram": {"mode": self.config.RUN_MODE, "last_success_seconds_ago": age},
+            "workers_alive": alive,
+            "routed": self.routed,
+            "loop_lag_seconds": round(self.loop_lag.lag, 3),
+        }
+
+    async def webhook(self, request: Request):
+        secret = self.config.WEBHOOK_SECRET
+        if secret and request.headers.get("x-telegram-bot-api-secret-token") != secret:
+            return 403, "text/plain", b""
+        try:
+            self.dispatch([json.loads(request.body)])
+        except ValueError:
+            return 400, "text/plain", b""
+        self.last_contact = time.monotonic()
+        return 200, "text/plain", b""
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self._stop.set)
+            except NotImplementedError:
+                pass
+
+        self.loop_lag.start()
+        bot = RoutingBot(self.config.BOT_TOKEN, base_url=self.config.TELEGRAM_API_URL or "https://api.telegram.org/bot")
+        async with bot:
+            await self.web_server.start()
+            if self.config.RUN_MODE == "webhook":
+                self.web_server.route("POST", self.config.WEBHOOK_PATH, self.webhook)
+                await bot.set_webhook(
+                    url=self.config.WEBHOOK_URL + self.config.WEBHOOK_PATH,
+                    secret_token=self.config.WEBHOOK_SECRET,
+                    allowed_updates=Update.ALL_TYPES
+                )
+                poller = None
+            else:
+                await bot.delete_webhook(drop_pending_updates=True)
+                poller = asyncio.create_task(self._poll(bot))
+            watcher = asyncio.create_task(self.supervisor.watch()) if self.supervisor is not None else None
+            stop = asyncio.create_task(self._stop.wait())
+            try:
+                await self._supervise(bot, stop, poller, watcher)
+            finally:
+                for task in (stop, poller, watcher):
+                    if task is not None:
+                        task.cancel()
+                await asyncio.gather(*(task for task in (stop, poller, watcher) if task is not None),
+                                     return_exceptions=True)
+        await self.web_server.stop()
+        await self.loop_lag.stop()
+
+    async def _supervise(self, bot: RoutingBot, stop: asyncio.Task, poller: Optional[asyncio.Task],
+                         watcher: Optional[asyncio.Task]):
+        """Wait for a stop signal, restarting the poller if it dies and failing if workers do"""
+        while True:
+            tasks = {task for task in (stop, poller, watcher) if task is not None}
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            if stop.done():
+                return
+            if watcher is not None and watcher.done():
+                self.failed = True
+                logger.critical("Stopping: %s", watcher.exception())
+                return
+            if poller is not None and poller.done():
+                logger.error("Polling stopped unexpectedly, restarting: %r", poller.exception())
+                await asyncio.sleep(1)
+                poller = asyncio.create_task(self._poll(bot))
+
+    async def _poll(self, bot: RoutingBot):
+        offset = 0
+        failures = 0
+        while True:
+            try:
+                updates = await bot.get_update_dicts(offset, timeout=30)
+            except RetryAfter as e:
+                logger.warning("Polling flood limited, retrying in %ss", e.retry_after)
+                await asyncio.sleep(float(e.retry_after))
+                continue
+            except TelegramError as e:
+                # Conflict, Forbidden and network errors alike: keep trying, less often
+                failures += 1
+                delay = min(30, 2 ** (failures - 1))
+                logger.error("Polling failed (%s in a row), retrying in %ss: %s", failures, delay, e)
+                await asyncio.sleep(delay)
+                continue
+            failures = 0
+            self.last_contact = time.monotonic()
+            if updates:
+                offset = updates[-1]['update_id'] + 1
+                self.dispatch(updates)
+
+
+def run_worker(index: int, updates: multiprocessing.Queue):
+    """Entry point of a worker process"""
+    # The parent handles Ctrl+C and tells workers to stop through the queue
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    config = Config()
+    setup_logging(config.LOG_LEVEL, config.LOG_FORMAT, config.LOG_SAMPLE_RATE, worker=index)
+    asyncio.run(_worker_main(index, updates))
+
+
+async def _worker_main(index: int, updates: multiprocessing.Queue):
+    from main import WorkerRegistrationBot
+
+    bot = WorkerRegistrationBot(serve_http=False, sync_statuses=index == 0)
+    app = bot.build_application(external_updates=True)
+    loop = asyncio.get_running_loop()
+
+    await app.initialize()
+    try:
+        await bot.post_init(app)
+        await app.start()
+        logger.info("Worker %s started", index)
+        while True:
+            batch = await loop.run_in_executor(None, updates.get)
+            if batch is _STOP:
+                break
+            for data in batch:
+                await app.update_queue.put(Update.de_json(data, app.bot))
+    finally:
+        if app.running:
+            await app.stop()
+        await bot.post_stop(app)
+        await bot.shutdown(app)
+        await app.shutdown()
+
+
+def run_workers(config: Config, workers: Optional[int] = None):
+    """Run the dispatcher here and ``workers`` bot processes sharing the SQLite stores"""
+    workers = workers or config.WORKERS
+    context = multiprocessing.get_context('spawn')
+    queues = [context.Queue() for _ in range(workers)]
+    supervisor = WorkerSupervisor(queues)
+    supervisor.start()
+    logger.info("Started %s worker processes", workers)
+
+    dispatcher = UpdateDispatcher(config, queues, supervisor)
+    try:
+        asyncio.run(dispatcher.run())
+    finally:
+        supervisor.stop()
+        logger.info("Updates routed per worker: %s", dispatcher.routed)
+    if dispatcher.failed:
+        raise SystemExit(1)